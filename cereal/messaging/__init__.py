@@ -2,6 +2,7 @@
 from .messaging_pyx import Context, Poller, SubSocket, PubSocket  # pylint: disable=no-name-in-module, import-error
 from .messaging_pyx import MultiplePublishersError, MessagingError  # pylint: disable=no-name-in-module, import-error
 import os
+import struct
 import capnp
 
 from typing import Optional, List, Union
@@ -9,6 +10,7 @@ from collections import deque
 
 from cereal import log
 from cereal.services import service_list
+from cereal.messaging.trace import get_tracer
 
 assert MultiplePublishersError
 assert MessagingError
@@ -16,6 +18,7 @@ assert MessagingError
 NO_TRAVERSAL_LIMIT = 2**64-1
 AVG_FREQ_HISTORY = 100
 SIMULATION = "SIMULATION" in os.environ
+TRACE_LATENCY = "TRACE_LATENCY" in os.environ
 
 # sec_since_boot is faster, but allow to run standalone too
 try:
@@ -30,6 +33,78 @@ context = Context()
 def log_from_bytes(dat: bytes) -> capnp.lib.capnp._DynamicStructReader:
   return log.Event.from_bytes(dat, traversal_limit_in_words=NO_TRAVERSAL_LIMIT)
 
+def _event_header_layout():
+  """Provides the byte offsets of logMonoTime, valid and the union discriminant in the data section of the Event
+  struct, along the union member names by discriminant value."""
+  node = log.Event.schema.node
+  fields = {f.name: f for f in node.struct.fields}
+  names = {f.discriminantValue: f.name for f in node.struct.fields if f.discriminantValue != 0xffff}
+  valid_default = fields['valid'].slot.defaultValue.bool
+  return (fields['logMonoTime'].slot.offset * 8, fields['valid'].slot.offset, valid_default,
+          node.struct.discriminantOffset * 2, names)
+
+_MONO_TIME_OFFSET, _VALID_BIT_OFFSET, _VALID_DEFAULT, _DISCRIMINANT_OFFSET, _EVENT_NAMES = _event_header_layout()
+
+
+class LazyEvent():
+  """An Event message that keeps the raw bytes and is only decoded when a field is accessed. `which()`,
+  `logMonoTime` and `valid` are read from the message header without decoding."""
+  __slots__ = ('_dat', '_msg', '_which', 'logMonoTime', 'valid')
+
+  def __init__(self, dat: bytes):
+    self._dat = dat
+    self._msg = None
+    if not self._read_header():
+      msg = self.msg
+      self._which, self.logMonoTime, self.valid = msg.which(), msg.logMonoTime, msg.valid
+
+  def _read_header(self) -> bool:
+    # Unpacked capnp message. A segment table followed by the root struct pointer at the start of the first segment.
+    dat = self._dat
+    root = ((struct.unpack_from('<I', dat, 0)[0] + 3) // 2) * 8
+    pointer = struct.unpack_from('<Q', dat, root)[0]
+    if pointer & 3 != 0:
+      return False  # Not a struct pointer, i.e. a far pointer.
+
+    offset = (pointer >> 2) & 0x3fffffff
+    offset -= (offset & 0x20000000) << 1
+    data = root + 8 + offset * 8
+    data_size = ((pointer >> 32) & 0xffff) * 8
+    if _DISCRIMINANT_OFFSET + 2 > data_size:
+      return False
+
+    self._which = _EVENT_NAMES.get(struct.unpack_from('<H', dat, data + _DISCRIMINANT_OFFSET)[0])
+    if self._which is None:
+      return False  # Unknown union member. Written with a newer schema.
+
+    self.logMonoTime = struct.unpack_from('<Q', dat, data + _MONO_TIME_OFFSET)[0] \
+      if _MONO_TIME_OFFSET + 8 <= data_size else 0
+    valid = _VALID_DEFAULT
+    if _VALID_BIT_OFFSET // 8 < data_size:
+      valid ^= bool(dat[data + _VALID_BIT_OFFSET // 8] >> (_VALID_BIT_OFFSET % 8) & 1)
+    self.valid = valid
+    return True
+
+  @property
+  def msg(self) -> capnp.lib.capnp._DynamicStructReader:
+    if self._msg is None:
+      self._msg = log_from_bytes(self._dat)
+    return self._msg
+
+  @property
+  def decoded(self) -> bool:
+    return self._msg is not None
+
+  def which(self) -> str:
+    return self._which
+
+  def to_bytes(self) -> bytes:
+    return self._dat
+
+  def __getattr__(self, name):
+    return getattr(self.msg, name)
+
+
 def new_message(service: Optional[str] = None, size: Optional[int] = None) -> capnp.lib.capnp._DynamicStructBuilder:
   dat = log.Event.new_message()
   dat.logMonoTime = int(sec_since_boot() * 1e9)
@@ -41,6 +116,46 @@ def new_message(service: Optional[str] = None, size: Optional[int] = None) -> ca
       dat.init(service, size)
   return dat
 
+class MessageBuilder():
+  """Pooled builder of `service` messages for publishers sending one message per loop.
+
+  A new capnp message allocates a 8 KiB first segment whatever its size. The builder keeps the largest serialized
+  size of its messages and allocates arenas that fit them in a single segment. With `reuse`, `new` hands out the same
+  message again, so only its scalar fields may be set: setting text, struct or list fields again leaks arena space into
+  the serialized message. The builder resets to a fresh arena once that happens.
+  """
+  def __init__(self, service: str, reuse: bool = False):
+    self.service = service
+    self.reuse = reuse
+    self._msg = None
+    self._words = None  # First segment size in words. capnp default until a message is serialized.
+    self._reset_size = None  # Serialized size after the last reset. Larger sizes mean leaked arena space.
+
+  def new(self, size: Optional[int] = None) -> capnp.lib.capnp._DynamicStructBuilder:
+    """Provides the message to fill, with logMonoTime set. `size` is the length of list services."""
+    if self._msg is None or not self.reuse:
+      arena = capnp._MallocMessageBuilder() if self._words is None else capnp._MallocMessageBuilder(self._words)
+      self._msg = arena.init_root(log.Event)
+      self._msg.valid = True
+      if size is None:
+        self._msg.init(self.service)
+      else:
+        self._msg.init(self.service, size)
+      self._reset_size = None
+    self._msg.logMonoTime = int(sec_since_boot() * 1e9)
+    return self._msg
+
+  def to_bytes(self) -> bytes:
+    dat = self._msg.to_bytes()
+    self._words = max(self._words or 0, len(dat) // 8)
+    if self.reuse:
+      self._msg.clear_write_flag()
+      if self._reset_size is None:
+        self._reset_size = len(dat)
+      elif len(dat) > self._reset_size:
+        self._msg = None
+    return dat
+
 def pub_sock(endpoint: str) -> PubSocket:
   sock = PubSocket()
   sock.connect(context, endpoint)
@@ -75,40 +190,17 @@ def drain_sock_raw(sock: SubSocket, wait_for_one: bool = False) -> List[bytes]:
 
   return ret
 
-def drain_sock(sock: SubSocket, wait_for_one: bool = False) -> List[capnp.lib.capnp._DynamicStructReader]:
-  """Receive all message currently available on the queue"""
-  ret: List[capnp.lib.capnp._DynamicStructReader] = []
-  while 1:
-    if wait_for_one and len(ret) == 0:
-      dat = sock.receive()
-    else:
-      dat = sock.receive(non_blocking=True)
-
-    if dat is None:  # Timeout hit
-      break
-
-    dat = log_from_bytes(dat)
-    ret.append(dat)
-
-  return ret
+def drain_sock(sock: SubSocket, wait_for_one: bool = False,
+               lazy: bool = False) -> List[Union[capnp.lib.capnp._DynamicStructReader, LazyEvent]]:
+  """Receive all message currently available on the queue. With `lazy`, messages are decoded on first access."""
+  decode = LazyEvent if lazy else log_from_bytes
+  return [decode(dat) for dat in drain_sock_raw(sock, wait_for_one)]
 
 
 # TODO: print when we drop packets?
 def recv_sock(sock: SubSocket, wait: bool = False) -> Union[None, capnp.lib.capnp._DynamicStructReader]:
   """Same as drain sock, but only returns latest message. Consider using conflate instead."""
-  dat = None
-
-  while 1:
-    if wait and dat is None:
-      rcv = sock.receive()
-    else:
-      rcv = sock.receive(non_blocking=True)
-
-    if rcv is None:  # Timeout hit
-      break
-
-    dat = rcv
-
+  dat = sock.receive_last(wait)
   if dat is not None:
     dat = log_from_bytes(dat)
 
@@ -120,10 +212,11 @@ def recv_one(sock: SubSocket) -> Union[None, capnp.lib.capnp._DynamicStructReade
     dat = log_from_bytes(dat)
   return dat
 
-def recv_one_or_none(sock: SubSocket) -> Union[None, capnp.lib.capnp._DynamicStructReader]:
+def recv_one_or_none(sock: SubSocket, lazy: bool = False) -> Union[None, capnp.lib.capnp._DynamicStructReader,
+                                                                   LazyEvent]:
   dat = sock.receive(non_blocking=True)
   if dat is not None:
-    dat = log_from_bytes(dat)
+    dat = LazyEvent(dat) if lazy else log_from_bytes(dat)
   return dat
 
 def recv_one_retry(sock: SubSocket) -> capnp.lib.capnp._DynamicStructReader:
@@ -136,13 +229,19 @@ def recv_one_retry(sock: SubSocket) -> capnp.lib.capnp._DynamicStructReader:
 class SubMaster():
   def __init__(self, services: List[str], poll: Optional[List[str]] = None,
                ignore_alive: Optional[List[str]] = None, ignore_avg_freq: Optional[List[str]] = None,
-               addr: str = "127.0.0.1"):
+               addr: str = "127.0.0.1", lazy: bool = True):
     self.frame = -1
+    self.lazy = lazy  # Decode received messages only once accessed through `sm[s]`.
+    self._lazy_data = {}  # Received messages not decoded yet. Newer than the ones in `data`.
     self.updated = {s: False for s in services}
     self.rcv_time = {s: 0. for s in services}
     self.rcv_frame = {s: 0 for s in services}
     self.alive = {s: False for s in services}
     self.recv_dts = {s: deque([0.0] * AVG_FREQ_HISTORY, maxlen=AVG_FREQ_HISTORY) for s in services}
+    self.recv_dts_sum = {s: 0. for s in services}  # Running sum of recv_dts.
+    self._recv_dts_count = 0  # Appends since the running sums were last recomputed.
+    self._updated_services = []
+    self._tracer = get_tracer() if TRACE_LATENCY else None
     self.sock = {}
     self.freq = {}
     self.data = {}
@@ -156,12 +255,25 @@ class SubMaster():
     self.ignore_average_freq = [] if ignore_avg_freq is None else ignore_avg_freq
     self.ignore_alive = [] if ignore_alive is None else ignore_alive
 
+    # Liveness thresholds per service, for services with an expected frequency.
+    self._max_delay = {}  # alive if delay is within 10x the expected frequency
+    self._max_dts_sum = {}  # alive if average frequency is higher than 90% of expected frequency
+    self._avg_freq_services = {s for s in services if s not in self.non_polled_services and
+                               s not in self.ignore_average_freq and service_list[s].frequency > 1e-5}
+
     for s in services:
       if addr is not None:
         p = self.poller if s not in self.non_polled_services else None
         self.sock[s] = sub_sock(s, poller=p, addr=addr, conflate=True)
       self.freq[s] = service_list[s].frequency
 
+      # arbitrary small number to avoid float comparison. If freq is 0, we can skip the check
+      if self.freq[s] > 1e-5:
+        self._max_delay[s] = 10. / self.freq[s]
+        self._max_dts_sum[s] = AVG_FREQ_HISTORY / (self.freq[s] * 0.90)
+      elif not SIMULATION:
+        self.alive[s] = True
+
       try:
         data = new_message(s)
       except capnp.lib.capnp.KjException:  # pylint: disable=c-extension-no-member
@@ -172,54 +284,70 @@ class SubMaster():
       self.valid[s] = data.valid
 
   def __getitem__(self, s: str) -> capnp.lib.capnp._DynamicStructReader:
+    if s in self._lazy_data:
+      self.data[s] = getattr(self._lazy_data.pop(s).msg, s)
     return self.data[s]
 
   def update(self, timeout: int = 1000) -> None:
     msgs = []
     for sock in self.poller.poll(timeout):
-      msgs.append(recv_one_or_none(sock))
+      msgs.append(recv_one_or_none(sock, self.lazy))
 
     # non-blocking receive for non-polled sockets
     for s in self.non_polled_services:
-      msgs.append(recv_one_or_none(self.sock[s]))
+      msgs.append(recv_one_or_none(self.sock[s], self.lazy))
     self.update_msgs(sec_since_boot(), msgs)
 
   def update_msgs(self, cur_time: float, msgs: List[capnp.lib.capnp._DynamicStructReader]) -> None:
     self.frame += 1
-    self.updated = dict.fromkeys(self.updated, False)
+    # Only reset the services updated on last frame, instead of rebuilding the dict.
+    for s in self._updated_services:
+      self.updated[s] = False
+    self._updated_services = []
+
     for msg in msgs:
       if msg is None:
         continue
 
       s = msg.which()
       self.updated[s] = True
-
-      if self.rcv_time[s] > 1e-5 and self.freq[s] > 1e-5 and (s not in self.non_polled_services) \
-        and (s not in self.ignore_average_freq):
-        self.recv_dts[s].append(cur_time - self.rcv_time[s])
+      self._updated_services.append(s)
+      if self._tracer is not None:
+        self._tracer.receive(s, msg.logMonoTime, cur_time)
+
+      if self.rcv_time[s] > 1e-5 and s in self._avg_freq_services:
+        # Keep a running sum of the receive intervals over the history.
+        dt = cur_time - self.rcv_time[s]
+        recv_dts = self.recv_dts[s]
+        self.recv_dts_sum[s] += dt - recv_dts[0]
+        recv_dts.append(dt)
+        self._recv_dts_count += 1
 
       self.rcv_time[s] = cur_time
       self.rcv_frame[s] = self.frame
-      self.data[s] = getattr(msg, s)
+      if isinstance(msg, LazyEvent) and not msg.decoded:
+        self._lazy_data[s] = msg
+      else:
+        self._lazy_data.pop(s, None)
+        self.data[s] = getattr(msg, s)
       self.logMonoTime[s] = msg.logMonoTime
       self.valid[s] = msg.valid
 
       if SIMULATION:
         self.alive[s] = True
 
+    # Recompute the running sums once in a while so float errors do not accumulate.
+    if self._recv_dts_count > AVG_FREQ_HISTORY * len(self.recv_dts):
+      self._recv_dts_count = 0
+      for s, recv_dts in self.recv_dts.items():
+        self.recv_dts_sum[s] = sum(recv_dts)
+
     if not SIMULATION:
-      for s in self.data:
-        # arbitrary small number to avoid float comparison. If freq is 0, we can skip the check
-        if self.freq[s] > 1e-5:
-          # alive if delay is within 10x the expected frequency
-          self.alive[s] = (cur_time - self.rcv_time[s]) < (10. / self.freq[s])
-
-          # alive if average frequency is higher than 90% of expected frequency
-          avg_dt = sum(self.recv_dts[s]) / AVG_FREQ_HISTORY
-          expected_dt = 1 / (self.freq[s] * 0.90)
-          self.alive[s] = self.alive[s] and (avg_dt < expected_dt)
-        else:
-          self.alive[s] = True
+      rcv_time = self.rcv_time
+      recv_dts_sum = self.recv_dts_sum
+      max_dts_sum = self._max_dts_sum
+      for s, max_delay in self._max_delay.items():
+        self.alive[s] = (cur_time - rcv_time[s]) < max_delay and recv_dts_sum[s] < max_dts_sum[s]
 
   def all_alive(self, service_list=None) -> bool:
     if service_list is None:  # check all
@@ -239,12 +367,15 @@ class SubMaster():
 class PubMaster():
   def __init__(self, services: List[str]):
     self.sock = {}
+    self._tracer = get_tracer() if TRACE_LATENCY else None
     for s in services:
       self.sock[s] = pub_sock(s)
 
-  def send(self, s: str, dat: Union[bytes, capnp.lib.capnp._DynamicStructBuilder]) -> None:
+  def send(self, s: str, dat: Union[bytes, capnp.lib.capnp._DynamicStructBuilder, MessageBuilder]) -> None:
     if not isinstance(dat, bytes):
       dat = dat.to_bytes()
+    if self._tracer is not None:
+      self._tracer.publish(s, LazyEvent(dat).logMonoTime, sec_since_boot())
     self.sock[s].send(dat)
 
   def all_readers_updated(self, s: str) -> bool:
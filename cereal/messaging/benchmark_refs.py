@@ -0,0 +1,120 @@
+"""Reference implementations and inputs of the messaging optimizations, shared by their unit tests and
+selfdrive/debug/benchmark.py."""
+from collections import deque
+
+import capnp
+import cereal.messaging as messaging
+from cereal.messaging import SubMaster, AVG_FREQ_HISTORY
+from cereal import car, log
+from cereal.services import service_list
+
+
+def frequent_services(count):
+  ret = []
+  for s in sorted(s for s, v in service_list.items() if v.frequency > 1e-5):
+    if s in log.Event.schema.fields:
+      ret.append(s)
+  return ret[:count]
+
+
+class RecomputingSubMaster(SubMaster):
+  """SubMaster summing the whole receive interval history of every service on every update."""
+  def update_msgs(self, cur_time, msgs):
+    self.frame += 1
+    self.updated = dict.fromkeys(self.updated, False)
+    for msg in msgs:
+      if msg is None:
+        continue
+
+      s = msg.which()
+      self.updated[s] = True
+
+      if self.rcv_time[s] > 1e-5 and self.freq[s] > 1e-5 and (s not in self.non_polled_services) \
+        and (s not in self.ignore_average_freq):
+        self.recv_dts[s].append(cur_time - self.rcv_time[s])
+
+      self.rcv_time[s] = cur_time
+      self.rcv_frame[s] = self.frame
+      self.data[s] = getattr(msg, s)
+      self.logMonoTime[s] = msg.logMonoTime
+      self.valid[s] = msg.valid
+
+    for s in self.data:
+      if self.freq[s] > 1e-5:
+        self.alive[s] = (cur_time - self.rcv_time[s]) < (10. / self.freq[s])
+        avg_dt = sum(self.recv_dts[s]) / AVG_FREQ_HISTORY
+        expected_dt = 1 / (self.freq[s] * 0.90)
+        self.alive[s] = self.alive[s] and (avg_dt < expected_dt)
+      else:
+        self.alive[s] = True
+
+
+def frames(services, count):
+  """Provides `count` frames of (time, msgs) for `services` published at their expected frequency, with a gap of
+  a few seconds in the middle."""
+  msgs = {}
+  for s in services:
+    try:
+      msg = messaging.new_message(s)
+    except capnp.lib.capnp.KjException:  # pylint: disable=c-extension-no-member
+      msg = messaging.new_message(s, 0)  # lists
+    msgs[s] = msg.as_reader()
+  next_time = {s: 0. for s in services}
+  ret = deque()
+  for frame in range(count):
+    t = frame * 0.01 + (3. if frame > count // 2 else 0.)
+    frame_msgs = []
+    for s in services:
+      if t >= next_time[s]:
+        frame_msgs.append(msgs[s])
+        next_time[s] = t + 1. / service_list[s].frequency
+    ret.append((t, frame_msgs))
+  return ret
+
+
+def random_message(s, valid=True):
+  try:
+    msg = messaging.new_message(s)
+  except capnp.lib.capnp.KjException:  # pylint: disable=c-extension-no-member
+    msg = messaging.new_message(s, 0)  # lists
+  msg.valid = valid
+  return msg
+
+
+_PID_STATE = log.ControlsState.LateralPIDState.new_message(active=True, steeringAngleDeg=1., p=0.1, i=0.2, f=0.3)
+
+def fill_controls_state(dat):
+  dat.valid = True
+  cs = dat.controlsState
+  cs.alertText1 = 'openpilot Unavailable'
+  cs.alertText2 = 'Waiting for controls to start'
+  cs.canMonoTimes = [1, 2, 3]
+  cs.enabled = True
+  cs.vCruise = 100.
+  cs.lateralControlState.pidState = _PID_STATE
+
+
+_CAR_STATE = car.CarState.new_message(vEgo=20., aEgo=0.5, steeringAngleDeg=2., gas=0.1, canValid=True,
+                                      cruiseState={'enabled': True, 'speed': 25.})
+
+def fill_car_state(dat):
+  dat.carState = _CAR_STATE
+  dat.carState.events = [{'name': 'pcmEnable', 'enable': True}]
+
+
+def fill_radar_state(dat):
+  rs = dat.radarState
+  rs.mdMonoTime = 1
+  rs.canMonoTimes = [1, 2]
+  rs.leadOne = {'dRel': 30., 'yRel': 0.5, 'vRel': -1., 'aRel': 0., 'vLead': 19., 'status': True, 'radar': True}
+  rs.leadTwo = {'dRel': 60., 'yRel': 0.5, 'vRel': -2., 'aRel': 0., 'vLead': 18., 'status': True, 'radar': True}
+
+
+def fill_live_tracks(dat):
+  for i in range(len(dat.liveTracks)):
+    dat.liveTracks[i] = {'trackId': i, 'dRel': float(i), 'yRel': 0., 'vRel': 1.}
+
+
+# Services published by controlsd and radard, with the list size to allocate and their fill function.
+POOLED_MESSAGES = [('controlsState', None, fill_controls_state), ('carState', None, fill_car_state),
+                   ('radarState', None, fill_radar_state), ('liveTracks', 16, fill_live_tracks)]
@@ -119,6 +119,33 @@ cdef class SubSocket:
 
       return m
 
+  def receive_last(self, bool wait=False):
+    """Receives all the messages available and returns only the last one. Older messages are dropped without
+    copying them. With `wait`, blocks until at least one message is received."""
+    cdef cppMessage * last = NULL
+    cdef cppMessage * msg
+
+    while True:
+      msg = self.socket.receive(not (wait and last == NULL))
+      if msg == NULL:
+        break
+      if last != NULL:
+        del last
+      last = msg
+
+    if last == NULL:
+      if wait and errno.errno == errno.EINTR:
+        print("SIGINT received, exiting")
+        sys.exit(1)
+
+      return None
+
+    sz = last.getSize()
+    m = last.getData()[:sz]
+    del last
+
+    return m
+
 
 cdef class PubSocket:
   cdef cppPubSocket * socket
@@ -0,0 +1,94 @@
+import unittest
+
+import cereal.messaging as messaging
+from cereal.messaging import SubMaster, LazyEvent, MessageBuilder, SIMULATION
+from cereal.messaging.benchmark_refs import POOLED_MESSAGES, RecomputingSubMaster, fill_controls_state, frames, \
+  frequent_services, random_message
+
+
+class TestLazyEvent(unittest.TestCase):
+  def test_header(self):
+    for i, s in enumerate(frequent_services(100)):
+      msg = random_message(s, valid=i % 2 == 0)
+      msg.logMonoTime = 2**40 + i
+      lazy = LazyEvent(msg.to_bytes())
+
+      self.assertEqual((lazy.which(), lazy.logMonoTime, lazy.valid), (s, 2**40 + i, i % 2 == 0))
+      self.assertFalse(lazy.decoded)
+
+  def test_decode_on_access(self):
+    msg = random_message('carState')
+    msg.carState.vEgo = 12.5
+    lazy = LazyEvent(msg.to_bytes())
+
+    self.assertEqual(lazy.carState.vEgo, 12.5)
+    self.assertTrue(lazy.decoded)
+
+  def test_submaster_decodes_on_access(self):
+    sm = SubMaster(['carState', 'controlsState'], addr=None)
+    msg = random_message('carState')
+    msg.carState.vEgo = 3.
+    lazy = LazyEvent(msg.to_bytes())
+
+    sm.update_msgs(1., [lazy])
+    self.assertTrue(sm.updated['carState'])
+    self.assertEqual(sm.logMonoTime['carState'], msg.logMonoTime)
+    self.assertFalse(lazy.decoded)
+    self.assertEqual(sm['carState'].vEgo, 3.)
+    self.assertTrue(lazy.decoded)
+
+
+@unittest.skipIf(SIMULATION, "liveness is not tracked in simulation")
+class TestSubMaster(unittest.TestCase):
+  def test_alive_matches_full_recompute(self):
+    services = frequent_services(20)
+    sm = SubMaster(services, addr=None)
+    sm_reference = RecomputingSubMaster(services, addr=None)
+
+    for t, msgs in frames(services, 3000):
+      sm.update_msgs(t, msgs)
+      sm_reference.update_msgs(t, msgs)
+      self.assertEqual(sm.alive, sm_reference.alive)
+      self.assertEqual(sm.updated, sm_reference.updated)
+
+
+class TestMessageBuilder(unittest.TestCase):
+  def test_matches_new_message(self):
+    builder = MessageBuilder('controlsState')
+    for _ in range(3):
+      dat = builder.new()
+      fill_controls_state(dat)
+      b = builder.to_bytes()
+      # Single segment once the size is learned.
+      self.assertEqual(int.from_bytes(b[:4], 'little'), 0)
+
+    msg = messaging.new_message('controlsState')
+    fill_controls_state(msg)
+    self.assertEqual(LazyEvent(b).controlsState.to_dict(), msg.as_reader().controlsState.to_dict())
+
+  def test_reuse(self):
+    builder = MessageBuilder('carState', reuse=True)
+    dat = builder.new()
+    dat.carState.vEgo = 1.
+    size = len(builder.to_bytes())
+    dat.carState.vEgo = 2.
+    self.assertIs(builder.new(), dat)
+    self.assertEqual(len(builder.to_bytes()), size)
+
+    # Setting a struct field again leaks arena space. The builder resets.
+    dat.carState.cruiseState = {'speed': 1.}
+    builder.to_bytes()
+    self.assertIsNot(builder.new(), dat)
+
+  def test_pooled_size(self):
+    default_arena = 1024 * 8  # capnp first segment size of new messages.
+    for s, size, fill in POOLED_MESSAGES:
+      builder = MessageBuilder(s)
+      new_message = messaging.new_message(s) if size is None else messaging.new_message(s, size)
+      fill(new_message)
+      fill(builder.new(size))
+      self.assertEqual(len(new_message.to_bytes()), len(builder.to_bytes()))
+      self.assertLess(builder._words * 8, default_arena)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+
+from cereal.messaging.trace import PUBLISH, RECEIVE, SERVICE_IDS, TraceRing, Tracer, read_traces
+
+
+class TestTrace(unittest.TestCase):
+  def test_ring_wraps(self):
+    with tempfile.TemporaryDirectory() as d:
+      ring = TraceRing(os.path.join(d, 'ring'), size=16, create=True)
+      for i in range(40):
+        ring.write(PUBLISH, i % 3, 1000 + i, 2000 + i)
+
+      records = TraceRing(ring.path).records()
+      # The oldest slot may be being overwritten by the writer, only the last 15 records are read.
+      self.assertEqual(len(records), 15)
+      self.assertEqual(records[0], (PUBLISH, 25 % 3, 1025, 2025))
+      self.assertEqual(records[-1], (PUBLISH, 39 % 3, 1039, 2039))
+
+  def test_read_traces(self):
+    with tempfile.TemporaryDirectory() as d:
+      Tracer(d, 'plannerd').receive('carState', 10, 1.)
+      tracer = Tracer(d, 'controlsd')
+      tracer.publish('carState', 10, 0.5)
+      tracer.publish('carControl', 20, 1.5)
+
+      traces = read_traces(d)
+      self.assertEqual(sorted(traces), sorted([f'plannerd.{os.getpid()}', f'controlsd.{os.getpid()}']))
+      self.assertEqual(traces[f'plannerd.{os.getpid()}'], [(RECEIVE, SERVICE_IDS['carState'], 10, int(1e9))])
+      self.assertEqual(len(traces[f'controlsd.{os.getpid()}']), 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,109 @@
+"""Opt-in latency tracing of published and received messages.
+
+With TRACE_LATENCY set in the environment, every PubMaster.send and every message received by a SubMaster is recorded
+as (kind, service, logMonoTime, time) on a per-process ring in shared memory. Rings are files under TRACE_DIR named
+`<process>.<pid>`, written by a single process without locks and read by selfdrive/debug/trace_latency.py.
+"""
+import os
+import sys
+import mmap
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from cereal import log
+
+TRACE_DIR = os.getenv("TRACE_DIR", "/dev/shm/msgq_trace")
+TRACE_RING_SIZE = 2**15  # Records per process. About 30 s of controlsd traffic.
+
+PUBLISH = 0
+RECEIVE = 1
+
+# Header: total count of records written and ring capacity. Records: kind, service, logMonoTime (ns), time (ns).
+_HEADER = struct.Struct('<QQ')
+_RECORD = struct.Struct('<BxH4xQQ')
+
+SERVICE_IDS = {f.name: f.discriminantValue for f in log.Event.schema.node.struct.fields
+               if f.discriminantValue != 0xffff}
+SERVICE_NAMES = {idx: name for name, idx in SERVICE_IDS.items()}
+
+
+def _process_name() -> str:
+  try:
+    from setproctitle import getproctitle  # pylint: disable=no-name-in-module, import-outside-toplevel
+    name = getproctitle()
+  except ImportError:
+    name = sys.argv[0]
+  return os.path.basename(name.split(' ')[0]) or 'python'
+
+
+class TraceRing():
+  """Fixed size ring of trace records in a memory mapped file. A single process writes, any process can read."""
+  def __init__(self, path: str, size: int = TRACE_RING_SIZE, create: bool = False):
+    self.path = path
+    if create:
+      with open(path, 'wb') as f:
+        f.write(_HEADER.pack(0, size))
+        f.truncate(_HEADER.size + size * _RECORD.size)
+
+    with open(path, 'r+b' if create else 'rb') as f:
+      self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+    self.count, self.size = _HEADER.unpack_from(self._buf, 0)
+
+  def write(self, kind: int, service: int, log_mono_time: int, t: int) -> None:
+    _RECORD.pack_into(self._buf, _HEADER.size + (self.count % self.size) * _RECORD.size, kind, service,
+                      log_mono_time, t)
+    # Publish the record only once fully written.
+    self.count += 1
+    _HEADER.pack_into(self._buf, 0, self.count, self.size)
+
+  def records(self) -> List[Tuple[int, int, int, int]]:
+    """Provides up to `size - 1` records, oldest first. The oldest slot may be being written."""
+    count = _HEADER.unpack_from(self._buf, 0)[0]
+    dat = bytes(self._buf[_HEADER.size:])
+    # The writer may be overwriting the oldest record while copying, skip it and any overwritten since.
+    end = _HEADER.unpack_from(self._buf, 0)[0]
+    start = max(count - self.size, end - self.size + 1, 0)
+    return [_RECORD.unpack_from(dat, (i % self.size) * _RECORD.size) for i in range(start, count)]
+
+  def close(self) -> None:
+    self._buf.close()
+
+
+class Tracer():
+  def __init__(self, trace_dir: str = TRACE_DIR, name: Optional[str] = None, size: int = TRACE_RING_SIZE):
+    os.makedirs(trace_dir, exist_ok=True)
+    name = _process_name() if name is None else name
+    self.pid = os.getpid()
+    self.ring = TraceRing(os.path.join(trace_dir, f'{name}.{self.pid}'), size, create=True)
+
+  def publish(self, service: str, log_mono_time: int, t: float) -> None:
+    self.ring.write(PUBLISH, SERVICE_IDS[service], log_mono_time, int(t * 1e9))
+
+  def receive(self, service: str, log_mono_time: int, t: float) -> None:
+    self.ring.write(RECEIVE, SERVICE_IDS[service], log_mono_time, int(t * 1e9))
+
+
+_tracer: Optional[Tracer] = None
+
+def get_tracer() -> Tracer:
+  """Provides the tracer of the current process. A new ring is created after a fork."""
+  global _tracer
+  if _tracer is None or _tracer.pid != os.getpid():
+    _tracer = Tracer()
+  return _tracer
+
+
+def read_traces(trace_dir: str = TRACE_DIR) -> Dict[str, List[Tuple[int, int, int, int]]]:
+  """Provides the records of every ring in `trace_dir` by ring name."""
+  traces = {}
+  if not os.path.isdir(trace_dir):
+    return traces
+
+  for name in sorted(os.listdir(trace_dir)):
+    try:
+      ring = TraceRing(os.path.join(trace_dir, name))
+    except (OSError, ValueError, struct.error):
+      continue  # Being created or not a ring.
+    traces[name] = ring.records()
+    ring.close()
+  return traces
@@ -67,6 +67,9 @@ services = {
 
   # debug
   "testJoystick": (False, 0.),
+  "controlsdProfile": (True, 1.),
+  "plannerdProfile": (True, 1.),
+  "radardProfile": (True, 1.),
 
   # dp
   "thermal": (True, 2., 1),
@@ -3,6 +3,7 @@ import sys
 import fcntl
 import hashlib
 import platform
+import numpy as np
 from cffi import FFI
 
 def suffix():
@@ -11,6 +12,15 @@ def suffix():
   else:
     return ".so"
 
+def numpy_buffer(ffi, size):
+  """Zeroed float64 array and a double * to its data, passed to C functions instead of converting lists on each call."""
+  buf = np.zeros(size)
+  return buf, ffi.from_buffer("double[]", buf)
+
+def numpy_view(ffi, cdata):
+  """Float64 array sharing the memory of a C double array, e.g. a field of a struct from ffi.new."""
+  return np.frombuffer(ffi.buffer(cdata), dtype=np.float64)
+
 def ffi_wrap(name, c_code, c_header, tmpdir="/tmp/ccache", cflags="", libraries=None):
   if libraries is None:
     libraries = []
@@ -1,5 +1,10 @@
+import math
 import time
 
+from cereal import log
+import cereal.messaging as messaging
+
+
 class Profiler():
   def __init__(self, enabled=False):
     self.enabled = enabled
@@ -43,3 +48,137 @@ class Profiler():
       else:
         print("%30s: %9.2f  avg: %7.2f  percent: %3.0f" % (n, ms*1000.0, ms*1000.0/self.iter, ms/self.tot*100))
     print("Iter clock: %2.6f   TOTAL: %2.2f" % (self.tot/self.iter, self.tot))
+
+
+# Histogram bins, log spaced: HIST_BINS_PER_DECADE per decade from HIST_MIN, i.e. 12% wide, up to 1 s. The last bin
+# holds everything slower.
+HIST_MIN = 1e-5
+HIST_BINS_PER_DECADE = 20
+HIST_BINS = 5 * HIST_BINS_PER_DECADE + 1
+HIST_UPPER = [HIST_MIN * 10 ** ((i + 1) / HIST_BINS_PER_DECADE) for i in range(HIST_BINS)]
+
+MISS_PUBLISH_INTERVAL = 0.1  # s. Between profiles published on deadline misses.
+
+
+def _bin(dt):
+  if dt <= HIST_MIN:
+    return 0
+  return min(int(math.log10(dt / HIST_MIN) * HIST_BINS_PER_DECADE), HIST_BINS - 1)
+
+
+def _percentile(counts, count, q):
+  """Upper edge of the bin holding the `q` quantile."""
+  target = q * count
+  cum = 0
+  for i, c in enumerate(counts):
+    cum += c
+    if cum >= target and c > 0:
+      return HIST_UPPER[i]
+  return 0.
+
+
+class LatencyProfiler():
+  """Always-on profiler of a loop. The time between checkpoints is binned in per stage latency histograms of fixed size,
+  and the time of each iteration, without the ignored stages, in the "total" one. Histograms are published as a
+  ProcessProfile on `service` every `publish_interval`, and right away when an iteration misses `deadline`."""
+  def __init__(self, service, deadline, publish_interval=1.):
+    self.service = service
+    self.deadline = deadline
+    self.publish_interval = publish_interval
+    self.names = []
+    self.ignored = []
+    self._index = {}
+    self.total_misses = 0
+    self._add_stage("total", False)
+    self._reset_window()
+
+    self.last_time = time.perf_counter()
+    self._busy = 0.
+    self._last_publish = self.last_time
+    self._last_miss_publish = 0.
+
+  def _add_stage(self, name, ignore):
+    self._index[name] = len(self.names)
+    self.names.append(name)
+    self.ignored.append(ignore)
+
+  def _reset_window(self):
+    n = len(self.names)
+    self.counts = [[0] * HIST_BINS for _ in range(n)]
+    self.count = [0] * n
+    self.max = [0.] * n
+    self.last = [0.] * n
+    self.frames = 0
+    self.misses = 0
+
+  def checkpoint(self, name, ignore=False):
+    # ignore flag needed when benchmarking threads with ratekeeper
+    tt = time.perf_counter()
+    dt = tt - self.last_time
+    self.last_time = tt
+
+    self._record(self._stage(name, ignore), dt)
+    if not ignore:
+      self._busy += dt
+
+  def record(self, name, dt):
+    """Records `dt` of a sub-stage timed by the caller, within a stage, so ignored for the iteration time."""
+    self._record(self._stage(name, True), dt)
+
+  def _stage(self, name, ignore):
+    idx = self._index.get(name)
+    if idx is None:
+      self._add_stage(name, ignore)
+      idx = len(self.names) - 1
+      self.counts.append([0] * HIST_BINS)
+      self.count.append(0)
+      self.max.append(0.)
+      self.last.append(0.)
+    return idx
+
+  def _record(self, idx, dt):
+    self.counts[idx][_bin(dt)] += 1
+    self.count[idx] += 1
+    self.last[idx] = dt
+    if dt > self.max[idx]:
+      self.max[idx] = dt
+
+  def frame_done(self, pm=None):
+    """Ends a loop iteration, publishing the profile with `pm` when due. Returns whether it missed the deadline."""
+    busy, self._busy = self._busy, 0.
+    self._record(0, busy)
+    self.frames += 1
+    missed = busy > self.deadline
+    if missed:
+      self.misses += 1
+      self.total_misses += 1
+
+    if pm is not None:
+      t = self.last_time
+      if missed and t - self._last_miss_publish >= MISS_PUBLISH_INTERVAL:
+        self._last_miss_publish = t
+        pm.send(self.service, self.to_msg(log.ProcessProfile.Trigger.deadlineMiss))
+      if t - self._last_publish >= self.publish_interval:
+        self._last_publish = t
+        pm.send(self.service, self.to_msg(log.ProcessProfile.Trigger.periodic))
+        self._reset_window()
+    return missed
+
+  def to_msg(self, trigger):
+    dat = messaging.new_message(self.service)
+    profile = getattr(dat, self.service)
+    profile.trigger = trigger
+    profile.frames = self.frames
+    profile.deadlineMs = self.deadline * 1e3
+    profile.deadlineMisses = self.misses
+    profile.totalDeadlineMisses = self.total_misses
+    stages = profile.init('stages', len(self.names))
+    for i, stage in enumerate(stages):
+      stage.name = self.names[i]
+      stage.ignored = self.ignored[i]
+      stage.count = self.count[i]
+      stage.p50Ms = min(_percentile(self.counts[i], self.count[i], 0.5), self.max[i]) * 1e3
+      stage.p99Ms = min(_percentile(self.counts[i], self.count[i], 0.99), self.max[i]) * 1e3
+      stage.maxMs = self.max[i] * 1e3
+      stage.lastMs = self.last[i] * 1e3
+    return dat
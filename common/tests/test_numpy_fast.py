@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import math
+import random
+import unittest
+import numpy as np
+
+from common.numpy_fast import interp, InterpTable
+
+
+class TestInterpTable(unittest.TestCase):
+  def test_matches_interp(self):
+    random.seed(0)
+    for _ in range(200):
+      n = random.randint(1, 8)
+      xp = sorted(random.choice([random.uniform(-10., 10.), 0., 1.]) for _ in range(n))
+      fp = [random.uniform(-5., 5.) for _ in range(n)]
+      table = InterpTable(xp, fp)
+      xs = [random.uniform(-12., 12.) for _ in range(20)] + xp + [math.nan, -math.inf, math.inf]
+      for x in xs:
+        self.assertEqual(repr(table(x)), repr(interp(x, xp, fp)), (x, xp, fp))
+      self.assertEqual(repr(table(xs)), repr(interp(xs, xp, fp)))
+
+  def test_batch(self):
+    xp, fp = [0., 5., 10., 20., 55.], [1.6, 1.4, 1.0, 0.6, 0.3]
+    x = np.linspace(-5., 60., 101)
+    np.testing.assert_allclose(InterpTable(xp, fp).batch(x), interp(x, xp, fp))
+
+  def test_invalid(self):
+    for xp, fp in [([], []), ([0., 1.], [1.]), ([1., 0.], [0., 1.])]:
+      with self.assertRaises(ValueError):
+        InterpTable(xp, fp)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -6,7 +6,7 @@ from numbers import Number
 from cereal import car, log
 from common.numpy_fast import clip
 from common.realtime import sec_since_boot, config_realtime_process, Priority, Ratekeeper, DT_CTRL
-from common.profiler import Profiler
+from common.profiler import LatencyProfiler
 from common.params import Params, put_nonblocking
 import cereal.messaging as messaging
 from selfdrive.config import Conversions as CV
@@ -61,7 +61,9 @@ class Controls:
     self.pm = pm
     if self.pm is None:
       self.pm = messaging.PubMaster(['sendcan', 'controlsState', 'carState',
-                                     'carControl', 'carEvents', 'carParams'])
+                                     'carControl', 'carEvents', 'carParams', 'controlsdProfile'])
+    # Pooled builders of the 100 Hz outputs
+    self.msg_builders = {s: messaging.MessageBuilder(s) for s in ['controlsState', 'carState', 'carControl']}
 
     self.camera_packets = ["roadCameraState", "driverCameraState"]
     if TICI:
@@ -182,7 +184,7 @@ class Controls:
 
     # controlsd is driven by can recv, expected at 100Hz
     self.rk = Ratekeeper(100, print_delay_threshold=None)
-    self.prof = Profiler(False)  # off by default
+    self.prof = LatencyProfiler('controlsdProfile', DT_CTRL)
 
     # dp
     self.sm['dragonConf'].dpAtl = False
@@ -624,7 +626,7 @@ class Controls:
     curvature = -self.VM.calc_curvature(steer_angle_without_offset, CS.vEgo)
 
     # controlsState
-    dat = messaging.new_message('controlsState')
+    dat = self.msg_builders['controlsState'].new()
     dat.valid = CS.canValid
     controlsState = dat.controlsState
     controlsState.alertText1 = self.AM.alert_text_1
@@ -673,15 +675,15 @@ class Controls:
       controlsState.lateralControlState.lqrState = lac_log
     elif self.CP.lateralTuning.which() == 'indi':
       controlsState.lateralControlState.indiState = lac_log
-    self.pm.send('controlsState', dat)
+    self.pm.send('controlsState', self.msg_builders['controlsState'])
 
     # carState
     car_events = self.events.to_msg()
-    cs_send = messaging.new_message('carState')
+    cs_send = self.msg_builders['carState'].new()
     cs_send.valid = CS.canValid
     cs_send.carState = CS
     cs_send.carState.events = car_events
-    self.pm.send('carState', cs_send)
+    self.pm.send('carState', self.msg_builders['carState'])
 
     # carEvents - logged every second or on change
     if (self.sm.frame % int(1. / DT_CTRL) == 0) or (self.events.names != self.events_prev):
@@ -697,10 +699,10 @@ class Controls:
       self.pm.send('carParams', cp_send)
 
     # carControl
-    cc_send = messaging.new_message('carControl')
+    cc_send = self.msg_builders['carControl'].new()
     cc_send.valid = CS.canValid
     cc_send.carControl = CC
-    self.pm.send('carControl', cc_send)
+    self.pm.send('carControl', self.msg_builders['carControl'])
 
     # copy CarControl to pass to CarInterface on the next iteration
     self.CC = CC
@@ -733,7 +735,7 @@ class Controls:
     while True:
       self.step()
       self.rk.monitor_time()
-      self.prof.display()
+      self.prof.frame_done(self.pm)
 
 def main(sm=None, pm=None, logcan=None):
   controls = Controls(sm, pm, logcan)
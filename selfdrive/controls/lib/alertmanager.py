@@ -1,7 +1,8 @@
 import os
 import copy
 import json
-from typing import List, Optional
+import heapq
+from typing import Dict, List, Optional, Tuple
 
 from cereal import car, log
 from common.basedir import BASEDIR
@@ -27,9 +28,19 @@ def set_offroad_alert(alert: str, show_alert: bool, extra_text: Optional[str] =
 
 
 class AlertManager:
+  """Active alerts on a heap ordered by priority, then newest first, then in the order they were added. Alerts are
+  pushed when added and only looked at when reaching the top, where expired ones, the ones of a cleared event type and
+  the ones superseded by a newer add of the same alert type are popped. Alerts are not copied, so the static alerts of
+  events.ALERTS are shared with their start time on the heap entry."""
+
+  COMPACT_SIZE = 64  # Heap entries over the active alert types before dropping the dead ones.
 
   def __init__(self):
-    self.activealerts: List[Alert] = []
+    self._heap: List[Tuple[int, float, int, float, Alert]] = []  # -priority, -start time, order, end time, alert
+    self._latest: Dict[str, Tuple[int, float, int, float, Alert]] = {}  # Latest heap entry of each alert type.
+    self._cleared: Dict[str, float] = {}  # Last time each event type was cleared.
+    self._order = 0
+    self._top_priority: Optional[int] = None
     self.clear_current_alert()
 
   def clear_current_alert(self) -> None:
@@ -43,41 +54,63 @@ class AlertManager:
     self.alert_rate: float = 0.
 
   def add_many(self, frame: int, alerts: List[Alert], enabled: bool = True) -> None:
+    start_time = frame * DT_CTRL
     for alert in alerts:
-      added_alert = copy.copy(alert)
-      added_alert.start_time = frame * DT_CTRL
-
       # if new alert is higher priority, log it
-      if not len(self.activealerts) or added_alert.alert_priority > self.activealerts[0].alert_priority:
-        cloudlog.event('alert_add', alert_type=added_alert.alert_type, enabled=enabled)
-
-      self.activealerts.append(added_alert)
+      if self._top_priority is None or alert.alert_priority > self._top_priority:
+        cloudlog.event('alert_add', alert_type=alert.alert_type, enabled=enabled)
+        if self._top_priority is None:
+          self._top_priority = alert.alert_priority
+
+      end_time = start_time + max(alert.duration_sound, alert.duration_hud_alert, alert.duration_text)
+      entry = (-alert.alert_priority, -start_time, self._order, end_time, alert)
+      self._order += 1
+      self._latest[alert.alert_type] = entry
+      heapq.heappush(self._heap, entry)
+
+    if len(self._heap) > len(self._latest) + self.COMPACT_SIZE:
+      self._compact(start_time)
+
+  def _alive(self, entry, cur_time: float) -> bool:
+    alert = entry[4]
+    return entry[3] > cur_time and self._latest.get(alert.alert_type) is entry and \
+      -entry[1] > self._cleared.get(alert.event_type, -1.)
+
+  def _compact(self, cur_time: float) -> None:
+    self._heap = [entry for entry in self._heap if self._alive(entry, cur_time)]
+    heapq.heapify(self._heap)
+    self._latest = {entry[4].alert_type: entry for entry in self._heap}
 
   def process_alerts(self, frame: int, clear_event_type=None) -> None:
     cur_time = frame * DT_CTRL
+    if clear_event_type is not None:
+      self._cleared[clear_event_type] = cur_time
 
-    # first get rid of all the expired alerts
-    self.activealerts = [a for a in self.activealerts if a.event_type != clear_event_type and
-                         a.start_time + max(a.duration_sound, a.duration_hud_alert, a.duration_text) > cur_time]
-
-    # sort by priority first and then by start_time
-    self.activealerts.sort(key=lambda k: (k.alert_priority, k.start_time), reverse=True)
+    # get rid of the expired, cleared and superseded alerts on top
+    heap = self._heap
+    while len(heap) and not self._alive(heap[0], cur_time):
+      entry = heapq.heappop(heap)
+      if self._latest.get(entry[4].alert_type) is entry:
+        del self._latest[entry[4].alert_type]
 
     # start with assuming no alerts
     self.clear_current_alert()
+    self._top_priority = None
 
-    if len(self.activealerts):
-      current_alert = self.activealerts[0]
+    if len(heap):
+      _, neg_start_time, _, _, current_alert = heap[0]
+      start_time = -neg_start_time
+      self._top_priority = current_alert.alert_priority
 
       self.alert_type = current_alert.alert_type
 
-      if current_alert.start_time + current_alert.duration_sound > cur_time:
+      if start_time + current_alert.duration_sound > cur_time:
         self.audible_alert = current_alert.audible_alert
 
-      if current_alert.start_time + current_alert.duration_hud_alert > cur_time:
+      if start_time + current_alert.duration_hud_alert > cur_time:
         self.visual_alert = current_alert.visual_alert
 
-      if current_alert.start_time + current_alert.duration_text > cur_time:
+      if start_time + current_alert.duration_text > cur_time:
         self.alert_text_1 = current_alert.alert_text_1
         self.alert_text_2 = current_alert.alert_text_2
         self.alert_status = current_alert.alert_status
@@ -1,5 +1,7 @@
 # This Python file uses the following encoding: utf-8
 # -*- coding: utf-8 -*-
+import sys
+import copy
 from enum import IntEnum
 from typing import Dict, Union, Callable, Any
 
@@ -45,10 +47,14 @@ EVENT_NAME = {v: k for k, v in EventName.schema.enumerants.items()}
 
 
 class Events:
+  """Active events, in the order they were added, along an integer bitset of them indexed by EventName. The event
+  type masks in ET_MASKS make `any` a single AND, and `clear` and `create_alerts` only visit the active events."""
   def __init__(self):
     self.events = []
     self.static_events = []
-    self.events_prev = dict.fromkeys(EVENTS.keys(), 0)
+    self.mask = 0  # Bit `e` set when event `e` is active.
+    self.static_mask = 0
+    self.events_prev = {}  # Consecutive cycles each active event has been active for. Absent when not active.
 
   @property
   def names(self):
@@ -60,40 +66,49 @@ class Events:
   def add(self, event_name, static=False):
     if static:
       self.static_events.append(event_name)
+      self.static_mask |= 1 << event_name
     self.events.append(event_name)
+    self.mask |= 1 << event_name
 
   def clear(self):
-    self.events_prev = {k: (v + 1 if k in self.events else 0) for k, v in self.events_prev.items()}
+    events_prev = self.events_prev
+    self.events_prev = {e: events_prev.get(e, 0) + 1 for e in self.events}
     self.events = self.static_events.copy()
+    self.mask = self.static_mask
 
   def any(self, event_type):
-    for e in self.events:
-      if event_type in EVENTS.get(e, {}).keys():
-        return True
-    return False
+    return self.mask & ET_MASKS[event_type] != 0
 
   def create_alerts(self, event_types, callback_args=None):
     if callback_args is None:
       callback_args = []
 
+    types_mask = 0
+    for et in event_types:
+      types_mask |= ET_MASKS[et]
+    if self.mask & types_mask == 0:
+      return []
+
     ret = []
     for e in self.events:
-      types = EVENTS[e].keys()
+      if not (types_mask >> e) & 1:
+        continue
       for et in event_types:
-        if et in types:
-          alert = EVENTS[e][et]
-          if not isinstance(alert, Alert):
-            alert = alert(*callback_args)
-
-          if DT_CTRL * (self.events_prev[e] + 1) >= alert.creation_delay:
-            alert.alert_type = f"{EVENT_NAME[e]}/{et}"
-            alert.event_type = et
-            ret.append(alert)
+        alert = ALERTS.get((e, et))
+        if alert is None:
+          continue
+        if not isinstance(alert, Alert):
+          alert = alert(*callback_args)
+          alert.alert_type = ALERT_TYPES[(e, et)]
+          alert.event_type = et
+
+        if DT_CTRL * (self.events_prev.get(e, 0) + 1) >= alert.creation_delay:
+          ret.append(alert)
     return ret
 
   def add_from_msg(self, events):
     for e in events:
-      self.events.append(e.name.raw)
+      self.add(e.name.raw)
 
   def to_msg(self):
     ret = []
@@ -953,3 +968,23 @@ EVENTS: Dict[int, Dict[str, Union[Alert, Callable[[Any, messaging.SubMaster, boo
       Priority.LOW, VisualAlert.steerRequired, AudibleAlert.chimeWarning1, 3., 2., 3.),
   },
 }
+
+# Bitset of the events having an alert of each event type.
+ET_MASKS = {et: sum(1 << e for e, alerts in EVENTS.items() if et in alerts)
+            for et in [v for k, v in vars(ET).items() if not k.startswith('_')]}
+
+# Alert type of each (event, event type), interned once.
+ALERT_TYPES = {(e, et): sys.intern(f"{EVENT_NAME[e]}/{et}") for e, alerts in EVENTS.items() for et in alerts}
+
+
+def _compile_alert(e, et, alert):
+  if not isinstance(alert, Alert):
+    return alert
+  alert = copy.copy(alert)
+  alert.alert_type = ALERT_TYPES[(e, et)]
+  alert.event_type = et
+  return alert
+
+# Alert of each (event, event type). Static alerts are instantiated with their type, the callbacks are called on
+# create_alerts. Alerts are shared, they must not be modified.
+ALERTS = {(e, et): _compile_alert(e, et, alert) for e, alerts in EVENTS.items() for et, alert in alerts.items()}
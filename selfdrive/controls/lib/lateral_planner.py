@@ -1,7 +1,7 @@
-import math
 import numpy as np
 from common.realtime import sec_since_boot, DT_MDL
 from common.numpy_fast import interp
+from common.ffi_wrapper import numpy_buffer, numpy_view
 from selfdrive.swaglog import cloudlog
 from selfdrive.controls.lib.lateral_mpc import libmpc_py
 from selfdrive.controls.lib.drive_helpers import CONTROL_N, MPC_COST_LAT, LAT_MPC_N, CAR_ROTATION_RADIUS
@@ -80,6 +80,13 @@ class LateralPlanner():
 
     self.mpc_solution = libmpc_py.ffi.new("log_t *")
     self.cur_state = libmpc_py.ffi.new("state_t *")
+
+    # Targets are written into these buffers and the solution read from views of the C struct, without copies
+    self.y_target, self._y_target_ptr = numpy_buffer(libmpc_py.ffi, LAT_MPC_N + 1)
+    self.psi_target, self._psi_target_ptr = numpy_buffer(libmpc_py.ffi, LAT_MPC_N + 1)
+    self.psi_solution = numpy_view(libmpc_py.ffi, self.mpc_solution.psi)
+    self.curvature_solution = numpy_view(libmpc_py.ffi, self.mpc_solution.curvature)
+    self.curvature_rate_solution = numpy_view(libmpc_py.ffi, self.mpc_solution.curvature_rate)
     self.cur_state[0].x = 0.0
     self.cur_state[0].y = 0.0
     self.cur_state[0].psi = 0.0
@@ -263,19 +270,21 @@ class LateralPlanner():
     # for now CAR_ROTATION_RADIUS is disabled
     # to use it, enable it in the MPC
     assert abs(CAR_ROTATION_RADIUS) < 1e-3
+    self.y_target[:] = y_pts
+    self.psi_target[:] = heading_pts
     self.libmpc.run_mpc(self.cur_state, self.mpc_solution,
                         float(v_ego),
                         CAR_ROTATION_RADIUS,
-                        list(y_pts),
-                        list(heading_pts))
+                        self._y_target_ptr,
+                        self._psi_target_ptr)
     # init state for next
     self.cur_state.x = 0.0
     self.cur_state.y = 0.0
     self.cur_state.psi = 0.0
-    self.cur_state.curvature = interp(DT_MDL, self.t_idxs[:LAT_MPC_N + 1], self.mpc_solution.curvature)
+    self.cur_state.curvature = interp(DT_MDL, self.t_idxs[:LAT_MPC_N + 1], self.curvature_solution)
 
     #  Check for infeasable MPC solution
-    mpc_nans = any(math.isnan(x) for x in self.mpc_solution.curvature)
+    mpc_nans = np.isnan(self.curvature_solution).any()
     t = sec_since_boot()
     if mpc_nans:
       self.libmpc.init()
@@ -296,9 +305,9 @@ class LateralPlanner():
     plan_send.valid = sm.all_alive_and_valid(service_list=['carState', 'controlsState', 'modelV2', 'dragonConf'])
     plan_send.lateralPlan.laneWidth = float(self.LP.lane_width)
     plan_send.lateralPlan.dPathPoints = [float(x) for x in self.y_pts]
-    plan_send.lateralPlan.psis = [float(x) for x in self.mpc_solution.psi[0:CONTROL_N]]
-    plan_send.lateralPlan.curvatures = [float(x) for x in self.mpc_solution.curvature[0:CONTROL_N]]
-    plan_send.lateralPlan.curvatureRates = [float(x) for x in self.mpc_solution.curvature_rate[0:CONTROL_N-1]] +[0.0]
+    plan_send.lateralPlan.psis = self.psi_solution[0:CONTROL_N].tolist()
+    plan_send.lateralPlan.curvatures = self.curvature_solution[0:CONTROL_N].tolist()
+    plan_send.lateralPlan.curvatureRates = self.curvature_rate_solution[0:CONTROL_N-1].tolist() + [0.0]
     plan_send.lateralPlan.lProb = float(self.LP.lll_prob)
     plan_send.lateralPlan.rProb = float(self.LP.rll_prob)
     plan_send.lateralPlan.dProb = float(self.LP.d_prob)
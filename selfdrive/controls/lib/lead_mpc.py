@@ -1,16 +1,26 @@
-import math
 import numpy as np
-from common.numpy_fast import interp
+from common.ffi_wrapper import numpy_view
 from common.realtime import sec_since_boot
 from selfdrive.modeld.constants import T_IDXS
 from selfdrive.controls.lib.radar_helpers import _LEAD_ACCEL_TAU
 from selfdrive.controls.lib.lead_mpc_lib import libmpc_py
 from selfdrive.controls.lib.drive_helpers import MPC_COST_LONG, CONTROL_N
+from selfdrive.controls.lib.mpc_stats import MpcStats
 from selfdrive.swaglog import cloudlog
 
 MPC_T = list(np.arange(0,1.,.2)) + list(np.arange(1.,10.6,.6))
 
 
+def _interp_weights(x, xp):
+  """Matrix W of the linear interpolation at x, W @ fp == interp(x, xp, fp)."""
+  return np.array([np.interp(x, xp, e) for e in np.eye(len(xp))]).T
+
+
+# The solutions are interpolated to T_IDXS[:CONTROL_N] by products with these into preallocated arrays
+_INTERP_VA = _interp_weights(T_IDXS[:CONTROL_N], MPC_T)
+_INTERP_J = _interp_weights(T_IDXS[:CONTROL_N], MPC_T[:-1])
+
+
 class LeadMpc():
   def __init__(self, mpc_id):
     self.lead_id = mpc_id
@@ -24,6 +34,7 @@ class LeadMpc():
     self.n_its = 0
     self.duration = 0
     self.status = False
+    self.stats = MpcStats()
 
     self.v_solution = np.zeros(CONTROL_N)
     self.a_solution = np.zeros(CONTROL_N)
@@ -45,6 +56,11 @@ class LeadMpc():
                      MPC_COST_LONG.ACCELERATION, MPC_COST_LONG.JERK)
 
     self.mpc_solution = ffi.new("log_t *")
+    self._v_ego = numpy_view(ffi, self.mpc_solution.v_ego)
+    self._a_ego = numpy_view(ffi, self.mpc_solution.a_ego)
+    self._j_ego = numpy_view(ffi, self.mpc_solution.j_ego)
+    self._x_ego = numpy_view(ffi, self.mpc_solution.x_ego)
+    self._x_l = numpy_view(ffi, self.mpc_solution.x_l)
     self.cur_state = ffi.new("state_t *")
     self.cur_state[0].v_ego = 0
     self.cur_state[0].a_ego = 0
@@ -96,16 +112,18 @@ class LeadMpc():
 
     # Calculate mpc
     t = sec_since_boot()
+    self.stats.start()
     self.n_its = self.libmpc.run_mpc(self.cur_state, self.mpc_solution, self.a_lead_tau, a_lead, self.following_distance)
-    self.v_solution = interp(T_IDXS[:CONTROL_N], MPC_T, self.mpc_solution.v_ego)
-    self.a_solution = interp(T_IDXS[:CONTROL_N], MPC_T, self.mpc_solution.a_ego)
-    self.j_solution = interp(T_IDXS[:CONTROL_N], MPC_T[:-1], self.mpc_solution.j_ego)
+    self.stats.solved()
+    np.dot(_INTERP_VA, self._v_ego, out=self.v_solution)
+    np.dot(_INTERP_VA, self._a_ego, out=self.a_solution)
+    np.dot(_INTERP_J, self._j_ego, out=self.j_solution)
     self.duration = int((sec_since_boot() - t) * 1e9)
 
     # Reset if NaN or goes through lead car
-    crashing = any(lead - ego < -50 for (lead, ego) in zip(self.mpc_solution[0].x_l, self.mpc_solution[0].x_ego))
-    nans = any(math.isnan(x) for x in self.mpc_solution[0].v_ego)
-    backwards = min(self.mpc_solution[0].v_ego) < -0.15
+    crashing = (self._x_l - self._x_ego).min() < -50
+    nans = np.isnan(self._v_ego).any()
+    backwards = self._v_ego.min() < -0.15
 
     if ((backwards or crashing) and self.prev_lead_status) or nans:
       if t > self.last_cloudlog_t + 5.0:
@@ -1,15 +1,27 @@
 import numpy as np
-import math
 
+from common.ffi_wrapper import numpy_buffer, numpy_view
+from common.numpy_fast import clip
 from selfdrive.swaglog import cloudlog
 from common.realtime import sec_since_boot
 from selfdrive.controls.lib.longitudinal_mpc_lib import libmpc_py
 from selfdrive.controls.lib.drive_helpers import LON_MPC_N
+from selfdrive.controls.lib.mpc_stats import MpcStats
 from selfdrive.modeld.constants import T_IDXS
 
 
+_T = np.array(T_IDXS[:LON_MPC_N+1])
+
+
 class LongitudinalMpc():
   def __init__(self):
+    self.stats = MpcStats()
+
+    # Targets are written into these buffers and the solution read from views of the C struct, without copies
+    self.poss, self._poss_ptr = numpy_buffer(libmpc_py.ffi, LON_MPC_N+1)
+    self.speeds, self._speeds_ptr = numpy_buffer(libmpc_py.ffi, LON_MPC_N+1)
+    self.accels, self._accels_ptr = numpy_buffer(libmpc_py.ffi, LON_MPC_N+1)
+
     self.reset_mpc()
     self.last_cloudlog_t = 0.0
     self.ts = list(range(10))
@@ -29,9 +41,9 @@ class LongitudinalMpc():
     self.cur_state[0].v_ego = 0
     self.cur_state[0].a_ego = 0
 
-    self.v_solution = [0.0 for i in range(len(T_IDXS))]
-    self.a_solution = [0.0 for i in range(len(T_IDXS))]
-    self.j_solution = [0.0 for i in range(len(T_IDXS)-1)]
+    self.v_solution = numpy_view(libmpc_py.ffi, self.mpc_solution.v_ego)
+    self.a_solution = numpy_view(libmpc_py.ffi, self.mpc_solution.a_ego)
+    self.j_solution = numpy_view(libmpc_py.ffi, self.mpc_solution.j_ego)
 
   def set_accel_limits(self, min_a, max_a):
     self.min_a = min_a
@@ -46,24 +58,29 @@ class LongitudinalMpc():
     self.cur_state[0].a_ego = a_safe
 
   def update(self, carstate, radarstate, v_cruise, a_target, active):
-    v_cruise_clipped = np.clip(v_cruise, self.cur_state[0].v_ego - 10., self.cur_state[0].v_ego + 10.0)
-    poss = v_cruise_clipped * np.array(T_IDXS[:LON_MPC_N+1])
-    speeds = v_cruise_clipped * np.ones(LON_MPC_N+1)
-    accels = np.zeros(LON_MPC_N+1)
-    self.update_with_xva(poss, speeds, accels)
+    v_cruise_clipped = clip(v_cruise, self.cur_state[0].v_ego - 10., self.cur_state[0].v_ego + 10.0)
+
+    np.multiply(v_cruise_clipped, _T, out=self.poss)
+    self.speeds.fill(v_cruise_clipped)
+    self.accels.fill(0.)
+    self._run_mpc()
 
   def update_with_xva(self, poss, speeds, accels):
+    self.poss[:] = poss
+    self.speeds[:] = speeds
+    self.accels[:] = accels
+    self._run_mpc()
+
+  def _run_mpc(self):
     # Calculate mpc
+    self.stats.start()
     self.libmpc.run_mpc(self.cur_state, self.mpc_solution,
-                        list(poss), list(speeds), list(accels),
+                        self._poss_ptr, self._speeds_ptr, self._accels_ptr,
                         self.min_a, self.max_a)
-
-    self.v_solution = list(self.mpc_solution.v_ego)
-    self.a_solution = list(self.mpc_solution.a_ego)
-    self.j_solution = list(self.mpc_solution.j_ego)
+    self.stats.solved()
 
     # Reset if NaN or goes through lead car
-    nans = any(math.isnan(x) for x in self.mpc_solution[0].v_ego)
+    nans = np.isnan(self.v_solution).any()
 
     t = sec_since_boot()
     if nans:
@@ -1,5 +1,5 @@
 from cereal import car
-from common.numpy_fast import clip, interp
+from common.numpy_fast import clip, interp, InterpTable
 from selfdrive.controls.lib.pid import PIController
 from selfdrive.controls.lib.drive_helpers import CONTROL_N
 from selfdrive.modeld.constants import T_IDXS
@@ -64,6 +64,7 @@ class LongControl():
                             (CP.longitudinalTuning.kiBP, CP.longitudinalTuning.kiV),
                             rate=RATE,
                             sat_limit=0.8)
+    self.deadzone = InterpTable(CP.longitudinalTuning.deadzoneBP, CP.longitudinalTuning.deadzoneV)
     self.v_pid = 0.0
     self.last_output_accel = 0.0
 
@@ -110,7 +111,7 @@ class LongControl():
       # Toyota starts braking more when it thinks you want to stop
       # Freeze the integrator so we don't accelerate to compensate, and don't allow positive acceleration
       prevent_overshoot = not CP.stoppingControl and CS.vEgo < 1.5 and v_target_future < 0.7
-      deadzone = interp(v_ego_pid, CP.longitudinalTuning.deadzoneBP, CP.longitudinalTuning.deadzoneV)
+      deadzone = self.deadzone(v_ego_pid)
       freeze_integrator = prevent_overshoot
 
       output_accel = self.pid.update(self.v_pid, v_ego_pid, speed=v_ego_pid, deadzone=deadzone, feedforward=a_target, freeze_integrator=freeze_integrator)
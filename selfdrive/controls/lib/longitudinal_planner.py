@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import math
 import numpy as np
-from common.numpy_fast import interp
+from common.numpy_fast import interp, InterpTable
 
 import cereal.messaging as messaging
 from cereal import log
@@ -53,20 +53,24 @@ _DP_CRUISE_MAX_V_ECO = [1.5, 1.3, 0.8, 0.4, 0.2]
 _DP_CRUISE_MAX_V_SPORT = [3.0, 3.5, 3.0, 2.0, 2.0]
 _DP_CRUISE_MAX_BP = [0., 5., 10., 20., 55.]
 
+# min and max accel tables by accel profile
+_DP_CRUISE_LIMITS = {
+  DP_ACCEL_ECO: (InterpTable(_DP_CRUISE_MIN_BP, _DP_CRUISE_MIN_V_ECO),
+                 InterpTable(_DP_CRUISE_MAX_BP, _DP_CRUISE_MAX_V_ECO)),
+  DP_ACCEL_NORMAL: (InterpTable(_DP_CRUISE_MIN_BP, _DP_CRUISE_MIN_V),
+                    InterpTable(_DP_CRUISE_MAX_BP, _DP_CRUISE_MAX_V)),
+  DP_ACCEL_SPORT: (InterpTable(_DP_CRUISE_MIN_BP, _DP_CRUISE_MIN_V_SPORT),
+                   InterpTable(_DP_CRUISE_MAX_BP, _DP_CRUISE_MAX_V_SPORT)),
+}
+_A_CRUISE_MAX = InterpTable(A_CRUISE_MAX_BP, A_CRUISE_MAX_VALS)
+_A_TOTAL_MAX = InterpTable(_A_TOTAL_MAX_BP, _A_TOTAL_MAX_V)
+
 def dp_calc_cruise_accel_limits(v_ego, dp_profile):
-  if dp_profile == DP_ACCEL_ECO:
-    a_cruise_min = interp(v_ego, _DP_CRUISE_MIN_BP, _DP_CRUISE_MIN_V_ECO)
-    a_cruise_max = interp(v_ego, _DP_CRUISE_MAX_BP, _DP_CRUISE_MAX_V_ECO)
-  elif dp_profile == DP_ACCEL_SPORT:
-    a_cruise_min = interp(v_ego, _DP_CRUISE_MIN_BP, _DP_CRUISE_MIN_V_SPORT)
-    a_cruise_max = interp(v_ego, _DP_CRUISE_MAX_BP, _DP_CRUISE_MAX_V_SPORT)
-  else:
-    a_cruise_min = interp(v_ego, _DP_CRUISE_MIN_BP, _DP_CRUISE_MIN_V)
-    a_cruise_max = interp(v_ego, _DP_CRUISE_MAX_BP, _DP_CRUISE_MAX_V)
-  return a_cruise_min, a_cruise_max
+  a_cruise_min, a_cruise_max = _DP_CRUISE_LIMITS.get(dp_profile, _DP_CRUISE_LIMITS[DP_ACCEL_NORMAL])
+  return a_cruise_min(v_ego), a_cruise_max(v_ego)
 
 def get_max_accel(v_ego):
-  return interp(v_ego, A_CRUISE_MAX_BP, A_CRUISE_MAX_VALS)
+  return _A_CRUISE_MAX(v_ego)
 
 
 def limit_accel_in_turns(v_ego, angle_steers, a_target, CP):
@@ -75,7 +79,7 @@ def limit_accel_in_turns(v_ego, angle_steers, a_target, CP):
   this should avoid accelerating when losing the target in turns
   """
 
-  a_total_max = interp(v_ego, _A_TOTAL_MAX_BP, _A_TOTAL_MAX_V)
+  a_total_max = _A_TOTAL_MAX(v_ego)
   a_y = v_ego**2 * angle_steers * CV.DEG_TO_RAD / (CP.steerRatio * CP.wheelbase)
   a_x_allowed = math.sqrt(max(a_total_max**2 - a_y**2, 0.))
 
@@ -90,6 +94,7 @@ class Planner():
     self.mpcs['lead1'] = LeadMpc(1)
     self.mpcs['cruise'] = LongitudinalMpc()
     self.mpcs['custom'] = LimitsLongitudinalMpc()
+    self.mpc_stats = {key: mpc.stats for key, mpc in self.mpcs.items()}
 
     self.fcw = False
     self.fcw_checker = FCWChecker()
@@ -103,6 +108,7 @@ class Planner():
 
     self.v_desired_trajectory = np.zeros(CONTROL_N)
     self.a_desired_trajectory = np.zeros(CONTROL_N)
+    self.j_desired_trajectory = np.zeros(CONTROL_N)
 
     # dp
     self.dp_accel_profile_ctrl = False
@@ -178,9 +184,10 @@ class Planner():
       # picks slowest solution from accel in ~0.2 seconds
       if self.mpcs[key].status and active_mpc[key] and self.mpcs[key].a_solution[5] < next_a:
         self.longitudinalPlanSource = c_source if key == 'custom' else key
-        self.v_desired_trajectory = self.mpcs[key].v_solution[:CONTROL_N]
-        self.a_desired_trajectory = self.mpcs[key].a_solution[:CONTROL_N]
-        self.j_desired_trajectory = self.mpcs[key].j_solution[:CONTROL_N]
+        # The solutions are views of the MPC buffers, overwritten by their next solve
+        self.v_desired_trajectory[:] = self.mpcs[key].v_solution[:CONTROL_N]
+        self.a_desired_trajectory[:] = self.mpcs[key].a_solution[:CONTROL_N]
+        self.j_desired_trajectory[:] = self.mpcs[key].j_solution[:CONTROL_N]
         next_a = self.mpcs[key].a_solution[5]
 
     # determine fcw
@@ -0,0 +1,18 @@
+import time
+
+
+class MpcStats():
+  """Count and times of the solves of an MPC."""
+  def __init__(self):
+    self.solves = 0
+    self.solve_time = 0.  # s. Of all the solves.
+    self.last_solve_time = None  # s. Of the last solve.
+    self._t = 0.
+
+  def start(self):
+    self._t = time.perf_counter()
+
+  def solved(self):
+    self.last_solve_time = time.perf_counter() - self._t
+    self.solves += 1
+    self.solve_time += self.last_solve_time
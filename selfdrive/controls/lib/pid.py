@@ -1,7 +1,7 @@
 import numpy as np
 from numbers import Number
 
-from common.numpy_fast import clip, interp
+from common.numpy_fast import clip, InterpTable
 
 def apply_deadzone(error, deadzone):
   if error > deadzone:
@@ -21,6 +21,8 @@ class PIController():
       self._k_p = [[0], [self._k_p]]
     if isinstance(self._k_i, Number):
       self._k_i = [[0], [self._k_i]]
+    self._k_p = InterpTable(*self._k_p)
+    self._k_i = InterpTable(*self._k_i)
 
     self.pos_limit = pos_limit
     self.neg_limit = neg_limit
@@ -34,11 +36,11 @@ class PIController():
 
   @property
   def k_p(self):
-    return interp(self.speed, self._k_p[0], self._k_p[1])
+    return self._k_p(self.speed)
 
   @property
   def k_i(self):
-    return interp(self.speed, self._k_i[0], self._k_i[1])
+    return self._k_i(self.speed)
 
   def _check_saturation(self, control, check_saturation, error):
     saturated = (control < self.neg_limit) or (control > self.pos_limit)
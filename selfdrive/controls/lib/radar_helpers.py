@@ -1,5 +1,5 @@
-from common.numpy_fast import mean
-from common.kalman.simple_kalman import KF1D
+import numpy as np
+
 from selfdrive.config import RADAR_TO_CAMERA
 
 
@@ -7,113 +7,155 @@ from selfdrive.config import RADAR_TO_CAMERA
 # TODO is this a good default?
 _LEAD_ACCEL_TAU = 1.5
 
-# radar tracks
-SPEED, ACCEL = 0, 1   # Kalman filter states enum
-
 # stationary qualification parameters
 v_ego_stationary = 4.   # no stationary object flag below this speed
 
+# radar points, as read from car.RadarData
+POINT_DTYPE = np.dtype([('trackId', np.uint64), ('dRel', np.float64), ('yRel', np.float64), ('vRel', np.float64),
+                        ('measured', bool)])
+
+
+# rows of RadarTracks.values
+D_REL, Y_REL, V_REL, V_LEAD, V_LEAD_K, A_LEAD_K, A_LEAD_TAU = range(7)
+# and of the sums by cluster in RadarTracks.get_clusters
+_COUNT, _UPDATED_COUNT, _MEASURED_COUNT = range(7, 10)
+_SUMS = 10
+_SUM_OFFSETS = np.arange(_SUMS)[:, None]
+# cluster accelerations without tracks updated at least once
+_A_DEFAULTS = np.array([[0.], [_LEAD_ACCEL_TAU]])
+
+
+def _row(i):
+  return property(lambda self: self.values[i])
+
+
+class RadarTracks():
+  """Radar tracks sorted by trackId, with their values as rows of an array. The lead Kalman filters of all the tracks
+  (vLeadK, aLeadK) are updated in one step, as in common.kalman.simple_kalman.KF1D."""
+  dRel = _row(D_REL)            # LONG_DIST
+  yRel = _row(Y_REL)            # -LAT_DIST
+  vRel = _row(V_REL)            # REL_SPEED
+  vLead = _row(V_LEAD)
+  vLeadK = _row(V_LEAD_K)
+  aLeadK = _row(A_LEAD_K)
+  aLeadTau = _row(A_LEAD_TAU)
+
+  def __init__(self, kalman_params):
+    self.K = np.array(kalman_params.K)
+    self.A_K = np.array(kalman_params.A) - self.K * np.array(kalman_params.C)
+
+    self.ids = np.zeros(0, dtype=np.uint64)
+    self.values = np.zeros((A_LEAD_TAU + 1, 0))
+    self.measured = np.zeros(0, dtype=bool)   # measured or estimate
+    self.cnt = np.zeros(0, dtype=np.int64)
+
+    # means of the values of the tracks of each cluster of the last get_clusters, up to V_LEAD_K
+    self.cluster_values = np.zeros((V_LEAD_K + 1, 0))
+
+    # trackIds of the points of the last update, and their order to the tracks
+    self._pts_ids = self.ids
+    self._order = np.zeros(0, dtype=np.int64)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def update(self, pts, v_ego):
+    """Updates the tracks with the radar points, a POINT_DTYPE array. The tracks of missing points are removed, and
+    new points get new tracks."""
+    ids = pts['trackId']
+    new = None
+    if len(ids) != len(self._pts_ids) or not (ids == self._pts_ids).all():
+      # The last point of each id, by id
+      order = np.argsort(ids, kind='stable')
+      sorted_ids = ids[order]
+      last = np.ones(len(ids), dtype=bool)
+      last[:-1] = sorted_ids[1:] != sorted_ids[:-1]
+      self._pts_ids, self._order, ids = ids, order[last], sorted_ids[last]
+
+      # Move the known tracks to their new slots
+      slots = np.searchsorted(self.ids, ids)
+      known = slots < len(self.ids)
+      known[known] = self.ids[slots[known]] == ids[known]
+      values = np.zeros((len(self.values), len(ids)))
+      values[:, known] = self.values[:, slots[known]]
+      values[A_LEAD_TAU, ~known] = _LEAD_ACCEL_TAU
+      cnt = np.zeros(len(ids), dtype=np.int64)
+      cnt[known] = self.cnt[slots[known]]
+      self.ids, self.values, self.cnt = ids, values, cnt
+      new = ~known
 
-class Track():
-  def __init__(self, v_lead, kalman_params):
-    self.cnt = 0
-    self.aLeadTau = _LEAD_ACCEL_TAU
-    self.K_A = kalman_params.A
-    self.K_C = kalman_params.C
-    self.K_K = kalman_params.K
-    self.kf = KF1D([[v_lead], [0.0]], self.K_A, self.K_C, self.K_K)
-
-  def update(self, d_rel, y_rel, v_rel, v_lead, measured):
     # relative values, copy
-    self.dRel = d_rel   # LONG_DIST
-    self.yRel = y_rel   # -LAT_DIST
-    self.vRel = v_rel   # REL_SPEED
-    self.vLead = v_lead
-    self.measured = measured   # measured or estimate
+    pts = pts[self._order]
+    values = self.values
+    values[D_REL] = pts['dRel']
+    values[Y_REL] = pts['yRel']
+    values[V_REL] = pts['vRel']
+    # align v_ego by a fixed time to align it with the radar measurement
+    np.add(pts['vRel'], v_ego, out=values[V_LEAD])
+    self.measured = pts['measured']
 
     # computed velocity and accelerations
-    if self.cnt > 0:
-      self.kf.update(self.vLead)
-
-    self.vLeadK = float(self.kf.x[SPEED][0])
-    self.aLeadK = float(self.kf.x[ACCEL][0])
+    values[V_LEAD_K:A_LEAD_K + 1] = self.A_K @ values[V_LEAD_K:A_LEAD_K + 1] + self.K * values[V_LEAD]
+    if new is not None:
+      values[V_LEAD_K, new] = values[V_LEAD, new]
+      values[A_LEAD_K, new] = 0.
 
     # Learn if constant acceleration
-    if abs(self.aLeadK) < 0.5:
-      self.aLeadTau = _LEAD_ACCEL_TAU
-    else:
-      self.aLeadTau *= 0.9
+    values[A_LEAD_TAU] *= 0.9
+    values[A_LEAD_TAU, np.abs(values[A_LEAD_K]) < 0.5] = _LEAD_ACCEL_TAU
 
     self.cnt += 1
 
-  def get_key_for_cluster(self):
+  def get_keys_for_cluster(self):
     # Weigh y higher since radar is inaccurate in this dimension
-    return [self.dRel, self.yRel*2, self.vRel]
-
-  def reset_a_lead(self, aLeadK, aLeadTau):
-    self.kf = KF1D([[self.vLead], [aLeadK]], self.K_A, self.K_C, self.K_K)
-    self.aLeadK = aLeadK
-    self.aLeadTau = aLeadTau
+    keys = self.values[D_REL:V_REL + 1].T.copy()
+    keys[:, 1] *= 2
+    return keys
+
+  def get_clusters(self, cluster_idxs):
+    """Clusters of the tracks by the cluster index of each track, with the means of their tracks. New tracks get the
+    acceleration of the rest of their cluster."""
+    if not len(self.ids):
+      self.cluster_values = np.zeros((V_LEAD_K + 1, 0))
+      return []
+    n = max(cluster_idxs) + 1
+    idxs = np.asarray(cluster_idxs)
+    updated = self.cnt > 1
+
+    # Sums by cluster of the values, the accelerations of the tracks updated at least once, and the counts, all
+    # in one bincount with an index range per row
+    weights = np.empty((_SUMS, len(idxs)))
+    weights[:A_LEAD_TAU + 1] = self.values
+    weights[A_LEAD_K:A_LEAD_TAU + 1] *= updated
+    weights[_COUNT] = 1.
+    weights[_UPDATED_COUNT] = updated
+    weights[_MEASURED_COUNT] = self.measured
+    sums = np.bincount((idxs + _SUM_OFFSETS * n).ravel(), weights.ravel(), _SUMS * n).reshape(_SUMS, n)
+
+    means = self.cluster_values = sums[:V_LEAD_K + 1] / sums[_COUNT]
+    has_updated = sums[_UPDATED_COUNT] > 0
+    a_means = np.where(has_updated, sums[A_LEAD_K:A_LEAD_TAU + 1] / np.maximum(sums[_UPDATED_COUNT], 1.),
+                       _A_DEFAULTS)
+
+    # if a new point, reset accel to the rest of the cluster
+    new = ~updated
+    self.values[A_LEAD_K:, new] = a_means[:, idxs[new]]
+
+    return [Cluster(*c) for c in zip(*means.tolist(), *a_means.tolist(), (sums[_MEASURED_COUNT] > 0).tolist())]
 
 
 class Cluster():
-  def __init__(self):
-    self.tracks = set()
-
-  def add(self, t):
-    # add the first track
-    self.tracks.add(t)
-
-  # TODO: make generic
-  @property
-  def dRel(self):
-    return mean([t.dRel for t in self.tracks])
-
-  @property
-  def yRel(self):
-    return mean([t.yRel for t in self.tracks])
-
-  @property
-  def vRel(self):
-    return mean([t.vRel for t in self.tracks])
-
-  @property
-  def aRel(self):
-    return mean([t.aRel for t in self.tracks])
-
-  @property
-  def vLead(self):
-    return mean([t.vLead for t in self.tracks])
-
-  @property
-  def dPath(self):
-    return mean([t.dPath for t in self.tracks])
-
-  @property
-  def vLat(self):
-    return mean([t.vLat for t in self.tracks])
-
-  @property
-  def vLeadK(self):
-    return mean([t.vLeadK for t in self.tracks])
-
-  @property
-  def aLeadK(self):
-    if all(t.cnt <= 1 for t in self.tracks):
-      return 0.
-    else:
-      return mean([t.aLeadK for t in self.tracks if t.cnt > 1])
-
-  @property
-  def aLeadTau(self):
-    if all(t.cnt <= 1 for t in self.tracks):
-      return _LEAD_ACCEL_TAU
-    else:
-      return mean([t.aLeadTau for t in self.tracks if t.cnt > 1])
-
-  @property
-  def measured(self):
-    return any(t.measured for t in self.tracks)
+  def __init__(self, dRel=0., yRel=0., vRel=0., vLead=0., vLeadK=0., aLeadK=0., aLeadTau=_LEAD_ACCEL_TAU,
+               measured=False):
+    # means of the tracks of the cluster
+    self.dRel = dRel
+    self.yRel = yRel
+    self.vRel = vRel
+    self.vLead = vLead
+    self.vLeadK = vLeadK
+    self.aLeadK = aLeadK
+    self.aLeadTau = aLeadTau
+    self.measured = measured
 
   def get_RadarState(self, model_prob=0.0):
     return {
@@ -155,3 +197,10 @@ class Cluster():
 
   def is_potential_fcw(self, model_prob):
     return model_prob > .9
+
+
+def potential_low_speed_leads(cluster_values, v_ego):
+  """Cluster.potential_low_speed_lead of all the clusters, by their RadarTracks.cluster_values."""
+  if v_ego >= v_ego_stationary:
+    return np.zeros(cluster_values.shape[1], dtype=bool)
+  return (np.abs(cluster_values[Y_REL]) < 1.5) & (cluster_values[D_REL] < 25)
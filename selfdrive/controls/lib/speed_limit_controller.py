@@ -1,6 +1,6 @@
 import numpy as np
 import time
-from common.numpy_fast import interp
+from common.numpy_fast import InterpTable
 from enum import IntEnum
 from cereal import log, car
 from common.params import Params
@@ -17,6 +17,7 @@ _TEMP_INACTIVE_GUARD_PERIOD = 1.  # secs. Time to wait after activation before c
 # Lookup table for speed limit percent offset depending on speed.
 _LIMIT_PERC_OFFSET_V = [0.0, 0.1, 0.125,  0.2, 0.21, 0.23]  # 25, 33, 45, 60, 67, 70 mph
 _LIMIT_PERC_OFFSET_BP = [11.0, 13.4, 20.1, 22.3, 24.58, 29.0]  # 25, 30, 40 50, 55, 65 mph
+_LIMIT_PERC_OFFSET = InterpTable(_LIMIT_PERC_OFFSET_BP, _LIMIT_PERC_OFFSET_V)
 
 #_LIMIT_PERC_OFFSET_V = [0.28, 0.038]  # 55, 105, 135 km/h 96, 129
 #_LIMIT_PERC_OFFSET_BP = [13.9, 36.1]  # 50, 100, 130 km/h
@@ -113,8 +114,10 @@ class SpeedLimitResolver():
       self._next_speed_limit_prev = 0.
       return
 
-    # Calculate the actual distance to the speed limit ahead corrected by gps_fix_age
-    distance_since_fix = self._v_ego * gps_fix_age
+    # Calculate the actual distance to the speed limit ahead corrected by the age of the distances. mapd dead reckons
+    # distances between gps fixes up to `distancesTimestamp`, fall back to the fix timestamp when not provided.
+    distances_age = time.time() - (map_data.distancesTimestamp or map_data.lastGpsTimestamp) * 1e-3
+    distance_since_fix = self._v_ego * distances_age
     distance_to_speed_limit_ahead = max(0., map_data.speedLimitAheadDistance - distance_since_fix)
 
     # When we have a next_speed_limit value that has not changed from a provided next speed limit value
@@ -250,7 +253,7 @@ class SpeedLimitController():
   @property
   def speed_limit_offset(self):
     if self._offset_enabled:
-      return interp(self._speed_limit, _LIMIT_PERC_OFFSET_BP, _LIMIT_PERC_OFFSET_V) * self._speed_limit
+      return _LIMIT_PERC_OFFSET(self._speed_limit) * self._speed_limit
     return 0.
 
   @property
@@ -114,15 +114,17 @@ class TurnSpeedController():
       _debug(f'TS: Ignoring map data as is too old. Age: {gps_fix_age}')
       return 0., 0., 0
 
-    # Load turn ahead sections info from map_data with distances corrected by gps_fix_age
-    distance_since_fix = self._v_ego * gps_fix_age
+    # Load turn ahead sections info from map_data with distances corrected by their age. mapd dead reckons distances
+    # between gps fixes up to `distancesTimestamp`, fall back to the fix timestamp when not provided.
+    distances_age = time.time() - (map_data.distancesTimestamp or map_data.lastGpsTimestamp) * 1e-3
+    distance_since_fix = self._v_ego * distances_age
     distances_to_sections_ahead = np.maximum(0., np.array(map_data.turnSpeedLimitsAheadDistances) - distance_since_fix)
     speed_limit_in_sections_ahead = map_data.turnSpeedLimitsAhead
     turn_sings_in_sections_ahead = map_data.turnSpeedLimitsAheadSigns
 
     # Ensure current speed limit is considered only if we are inside the section.
     if map_data.turnSpeedLimitValid and self._v_ego > 0.:
-      speed_limit_end_time = (map_data.turnSpeedLimitEndDistance / self._v_ego) - gps_fix_age
+      speed_limit_end_time = (map_data.turnSpeedLimitEndDistance / self._v_ego) - distances_age
       if speed_limit_end_time > 0.:
         speed_limit = map_data.turnSpeedLimit
 
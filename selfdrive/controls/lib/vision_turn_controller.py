@@ -1,7 +1,7 @@
 import numpy as np
 import math
 from cereal import log
-from common.numpy_fast import interp
+from common.numpy_fast import InterpTable
 from common.params import Params
 from common.realtime import sec_since_boot
 from selfdrive.config import Conversions as CV
@@ -23,6 +23,7 @@ _EVAL_STEP = 5.  # mts. Resolution of the curvature evaluation.
 _EVAL_START = 20.  # mts. Distance ahead where to start evaluating vision curvature.
 _EVAL_LENGHT = 150.  # mts. Distance ahead where to stop evaluating vision curvature.
 _EVAL_RANGE = np.arange(_EVAL_START, _EVAL_LENGHT, _EVAL_STEP)
+_EVAL_RANGE_SQ = _EVAL_RANGE**2
 
 _A_LAT_REG_MAX = 2.  # Maximum lateral acceleration
 
@@ -30,16 +31,23 @@ _A_LAT_REG_MAX = 2.  # Maximum lateral acceleration
 # depending on the actual maximum absolute lateral acceleration predicted on the turn ahead.
 _ENTERING_SMOOTH_DECEL_V = [-0.2, -1.]  # min decel value allowed on ENTERING state
 _ENTERING_SMOOTH_DECEL_BP = [1.3, 3]  # absolute value of lat acc ahead
+_ENTERING_SMOOTH_DECEL = InterpTable(_ENTERING_SMOOTH_DECEL_BP, _ENTERING_SMOOTH_DECEL_V)
 
 # Lookup table for the acceleration for the TURNING state
 # depending on the current lateral acceleration of the vehicle.
 _TURNING_ACC_V = [0.5, 0., -0.4]  # acc value
 _TURNING_ACC_BP = [1.5, 2.3, 3.]  # absolute value of current lat acc
+_TURNING_ACC = InterpTable(_TURNING_ACC_BP, _TURNING_ACC_V)
 
 _LEAVING_ACC = 0.5  # Confortble acceleration to regain speed while leaving a turn.
 
 _MIN_LANE_PROB = 0.6  # Minimum lanes probability to allow curvature prediction based on lanes.
 
+# Lane lines probability modifiers, as in lane_planner.
+_WIDTH_CHECK_T = np.array([0.0, 1.5, 3.0])  # secs. Times ahead where to check the lane width.
+_WIDTH_PROB_MOD = InterpTable([4.0, 5.0], [1.0, 0.0])
+_STD_PROB_MOD = InterpTable([.15, .3], [1.0, 0.0])
+
 _DEBUG = False
 
 
@@ -52,17 +60,18 @@ def _debug(msg):
 VisionTurnControllerState = log.LongitudinalPlan.VisionTurnControllerState
 
 
-def eval_curvature(poly, x_vals):
+def eval_curvature(poly, x_vals, x_vals_sq=None):
   """
   This function returns a vector with the curvature based on path defined by `poly`
-  evaluated on distance vector `x_vals`
+  evaluated on distance vector `x_vals`. `poly` can also be a matrix of one polynomial per row, e.g. lanes and path,
+  evaluated at once to a matrix of one curvature vector per row. `x_vals_sq` are the precomputed `x_vals**2`.
   """
   # https://en.wikipedia.org/wiki/Curvature#  Local_expressions
-  def curvature(x):
-    a = abs(2 * poly[1] + 6 * poly[0] * x) / (1 + (3 * poly[0] * x**2 + 2 * poly[1] * x + poly[2])**2)**(1.5)
-    return a
-
-  return np.vectorize(curvature)(x_vals)
+  poly = np.asarray(poly, dtype=np.float64)
+  if x_vals_sq is None:
+    x_vals_sq = x_vals**2
+  a, b, c = poly[..., 0, None], poly[..., 1, None], poly[..., 2, None]
+  return np.abs(2 * b + 6 * a * x_vals) / (1 + (3 * a * x_vals_sq + 2 * b * x_vals + c)**2)**(1.5)
 
 
 def eval_lat_acc(v_ego, x_curv):
@@ -70,12 +79,25 @@ def eval_lat_acc(v_ego, x_curv):
   This function returns a vector with the lateral acceleration based
   for the provided speed `v_ego` evaluated over curvature vector `x_curv`
   """
+  return v_ego**2 * np.asarray(x_curv)
+
 
-  def lat_acc(curv):
-    a = v_ego**2 * curv
-    return a
+class _LanesPolyFit():
+  """
+  Cubic least squares fit over the lane lines x, which only change with the model. The pseudo inverse of the scaled
+  Vandermonde matrix of the last x is kept, so fitting is a matrix product.
+  """
+  def __init__(self):
+    self._x = None
+    self._pinv = None
 
-  return np.vectorize(lat_acc)(x_curv)
+  def __call__(self, x, y):
+    if self._x is None or self._x.shape != x.shape or not np.array_equal(self._x, x):
+      vander = np.vander(x, 4)
+      scale = np.sqrt((vander * vander).sum(axis=0))  # as np.polyfit, for conditioning
+      self._pinv = np.linalg.pinv(vander / scale) / scale[:, None]
+      self._x = x.copy()
+    return self._pinv @ y
 
 
 def _description_for_state(turn_controller_state):
@@ -103,6 +125,7 @@ class VisionTurnController():
     self._a_target = 0.
     self._v_overshoot = 0.
     self._state = VisionTurnControllerState.disabled
+    self._lanes_polyfit = _LanesPolyFit()
 
     self._reset()
 
@@ -152,7 +175,7 @@ class VisionTurnController():
     # 1. When the probability of lanes is good enough, compute polynomial from lanes as they are way more stable
     # on current mode than drving path.
     if model_data is not None and len(model_data.laneLines) == 4 and len(model_data.laneLines[0].t) == TRAJECTORY_SIZE:
-      ll_x = model_data.laneLines[1].x  # left and right ll x is the same
+      ll_x = np.array(model_data.laneLines[1].x)  # left and right ll x is the same
       lll_y = np.array(model_data.laneLines[1].y)
       rll_y = np.array(model_data.laneLines[2].y)
       l_prob = model_data.laneLineProbs[1]
@@ -162,24 +185,21 @@ class VisionTurnController():
 
       # Reduce reliance on lanelines that are too far apart or will be in a few seconds
       width_pts = rll_y - lll_y
-      prob_mods = []
-      for t_check in [0.0, 1.5, 3.0]:
-        width_at_t = interp(t_check * (self._v_ego + 7), ll_x, width_pts)
-        prob_mods.append(interp(width_at_t, [4.0, 5.0], [1.0, 0.0]))
-      mod = min(prob_mods)
+      width_at_t = np.interp(_WIDTH_CHECK_T * (self._v_ego + 7), ll_x, width_pts)
+      mod = float(np.amin(_WIDTH_PROB_MOD.batch(width_at_t)))
       l_prob *= mod
       r_prob *= mod
 
       # Reduce reliance on uncertain lanelines
-      l_std_mod = interp(lll_std, [.15, .3], [1.0, 0.0])
-      r_std_mod = interp(rll_std, [.15, .3], [1.0, 0.0])
+      l_std_mod = _STD_PROB_MOD(lll_std)
+      r_std_mod = _STD_PROB_MOD(rll_std)
       l_prob *= l_std_mod
       r_prob *= r_std_mod
 
       # Find path from lanes as the average center lane only if min probability on both lanes is above threshold.
       if l_prob > _MIN_LANE_PROB and r_prob > _MIN_LANE_PROB:
         c_y = width_pts / 2 + lll_y
-        path_poly = np.polyfit(ll_x, c_y, 3)
+        path_poly = self._lanes_polyfit(ll_x, c_y)
 
     # 2. If not polynomial derived from lanes, then derive it from compensated driving path with lanes as
     # provided by `lateralPlanner`.
@@ -197,7 +217,7 @@ class VisionTurnController():
     self._max_v_for_current_curvature = math.sqrt(_A_LAT_REG_MAX / current_curvature) if current_curvature > 0 \
       else V_CRUISE_MAX * CV.KPH_TO_MS
 
-    pred_curvatures = eval_curvature(path_poly, _EVAL_RANGE)
+    pred_curvatures = eval_curvature(path_poly, _EVAL_RANGE, _EVAL_RANGE_SQ)
     max_pred_curvature = np.amax(pred_curvatures)
     self._max_pred_lat_acc = self._v_ego**2 * max_pred_curvature
 
@@ -255,7 +275,7 @@ class VisionTurnController():
     # ENTERING
     elif self.state == VisionTurnControllerState.entering:
       # when not overshooting, target a smooth deceleration in preparation for a sharp turn to come.
-      a_target = interp(self._max_pred_lat_acc, _ENTERING_SMOOTH_DECEL_BP, _ENTERING_SMOOTH_DECEL_V)
+      a_target = _ENTERING_SMOOTH_DECEL(self._max_pred_lat_acc)
       if self._lat_acc_overshoot_ahead:
         # when overshooting, target the acceleration needed to achieve the overshoot speed at
         # the required distance
@@ -265,7 +285,7 @@ class VisionTurnController():
     # TURNING
     elif self.state == VisionTurnControllerState.turning:
       # When turning we provide a target acceleration that is confortable for the lateral accelearation felt.
-      a_target = interp(self._current_lat_acc, _TURNING_ACC_BP, _TURNING_ACC_V)
+      a_target = _TURNING_ACC(self._current_lat_acc)
     # LEAVING
     elif self.state == VisionTurnControllerState.leaving:
       # When leaving we provide a confortable acceleration to regain speed.
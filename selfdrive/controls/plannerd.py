@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 from cereal import car
 from common.params import Params
-from common.realtime import Priority, config_realtime_process
+from common.profiler import LatencyProfiler
+from common.realtime import Priority, config_realtime_process, DT_MDL
 from selfdrive.swaglog import cloudlog
 from selfdrive.controls.lib.longitudinal_planner import Planner
 from selfdrive.controls.lib.lateral_planner import LateralPlanner
@@ -30,17 +31,28 @@ def plannerd_thread(sm=None, pm=None):
                              poll=['radarState', 'modelV2'], ignore_avg_freq=['radarState'])
 
   if pm is None:
-    pm = messaging.PubMaster(['longitudinalPlan', 'liveLongitudinalMpc', 'lateralPlan', 'liveMpc'])
+    pm = messaging.PubMaster(['longitudinalPlan', 'liveLongitudinalMpc', 'lateralPlan', 'liveMpc', 'plannerdProfile'])
+
+  # Both planners are run at the model rate
+  prof = LatencyProfiler('plannerdProfile', DT_MDL)
 
   while True:
     sm.update()
+    prof.checkpoint("Wait", ignore=True)
 
     if sm.updated['modelV2']:
       lateral_planner.update(sm, CP)
       lateral_planner.publish(sm, pm)
+      prof.checkpoint("Lateral")
     if sm.updated['radarState']:
       longitudinal_planner.update(sm, CP)
       longitudinal_planner.publish(sm, pm)
+      prof.checkpoint("Longitudinal")
+      for key, stats in longitudinal_planner.mpc_stats.items():
+        if stats.last_solve_time is not None:
+          prof.record(f"MPC {key}", stats.last_solve_time)
+
+    prof.frame_done(pm)
 
 
 def main(sm=None, pm=None):
@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 import importlib
-import math
-from collections import defaultdict, deque
+from collections import deque
+
+import numpy as np
 
 import cereal.messaging as messaging
 from cereal import car
-from common.numpy_fast import interp
+from common.numpy_fast import InterpTable
 from common.params import Params
+from common.profiler import LatencyProfiler
 from common.realtime import Ratekeeper, Priority, config_realtime_process
 from selfdrive.config import RADAR_TO_CAMERA
 from selfdrive.controls.lib.cluster.fastcluster_py import cluster_points_centroid
-from selfdrive.controls.lib.radar_helpers import Cluster, Track
+from selfdrive.controls.lib.radar_helpers import D_REL, Y_REL, V_REL, POINT_DTYPE, Cluster, RadarTracks, \
+  potential_low_speed_leads
 from selfdrive.swaglog import cloudlog
 from selfdrive.hardware import TICI, JETSON
 
+# Lead Kalman Filter gain K, by radar time step between 0.01s and 0.1s, see KalmanParams.
+_KALMAN_DTS = [dt * 0.01 for dt in range(1, 11)]
+_KALMAN_K0 = InterpTable(_KALMAN_DTS, [0.12288, 0.14557, 0.16523, 0.18282, 0.19887, 0.21372, 0.22761, 0.24069,
+                                       0.2531, 0.26491])
+_KALMAN_K1 = InterpTable(_KALMAN_DTS, [0.29666, 0.29331, 0.29043, 0.28787, 0.28555, 0.28342, 0.28144, 0.27958,
+                                       0.27783, 0.27617])
+
 
 class KalmanParams():
   def __init__(self, dt):
@@ -25,78 +35,84 @@ class KalmanParams():
     #Q = np.matrix([[10., 0.0], [0.0, 100.]])
     #R = 1e3
     #K = np.matrix([[ 0.05705578], [ 0.03073241]])
-    dts = [dt * 0.01 for dt in range(1, 11)]
-    K0 = [0.12288, 0.14557, 0.16523, 0.18282, 0.19887, 0.21372, 0.22761, 0.24069, 0.2531, 0.26491]
-    K1 = [0.29666, 0.29331, 0.29043, 0.28787, 0.28555, 0.28342, 0.28144, 0.27958, 0.27783, 0.27617]
-    self.K = [[interp(dt, dts, K0)], [interp(dt, dts, K1)]]
-
-
-def laplacian_cdf(x, mu, b):
-  b = max(b, 1e-4)
-  return math.exp(-abs(x-mu)/b)
-
+    self.K = [[_KALMAN_K0(dt)], [_KALMAN_K1(dt)]]
 
-def match_vision_to_cluster(v_ego, lead, clusters):
-  # match vision point to best statistical cluster match
-  offset_vision_dist = lead.x[0] - RADAR_TO_CAMERA
 
-  def prob(c):
-    prob_d = laplacian_cdf(c.dRel, offset_vision_dist, lead.xStd[0])
-    prob_y = laplacian_cdf(c.yRel, -lead.y[0], lead.yStd[0])
-    prob_v = laplacian_cdf(c.vRel + v_ego, lead.v[0], lead.vStd[0])
+def match_vision_to_clusters(v_ego, leads, clusters, cluster_values):
+  """Best statistical cluster match of each vision lead, scoring all the clusters for all the leads at once by
+  their means in cluster_values (RadarTracks.cluster_values). None for the leads without a 'sane' match."""
+  # vision leads in radar coordinates, and the scales of their laplacian distributions
+  vision = np.array([[lead.x[0] - RADAR_TO_CAMERA, -lead.y[0], lead.v[0], lead.xStd[0], lead.yStd[0], lead.vStd[0]]
+                     for lead in leads])
+  vision, scales = vision[:, :3], vision[:, 3:]
+  if len(clusters) > 1:
+    scales = np.maximum(scales, 1e-4)
+    radar = np.array([cluster_values[D_REL], cluster_values[Y_REL], cluster_values[V_REL] + v_ego])
 
     # This is isn't exactly right, but good heuristic
-    return prob_d * prob_y * prob_v
+    probs = np.exp(-np.abs(radar - vision[:, :, None]) / scales[:, :, None])
+    best = np.argmax(probs[:, 0] * probs[:, 1] * probs[:, 2], axis=1).tolist()
+  else:
+    best = [0] * len(leads)
 
-  cluster = max(clusters, key=prob)
+  matches = []
+  for (offset_vision_dist, _, v_vision), idx in zip(vision.tolist(), best):
+    cluster = clusters[idx]
 
-  # if no 'sane' match is found return -1
-  # stationary radar points can be false positives
-  dist_sane = abs(cluster.dRel - offset_vision_dist) < max([(offset_vision_dist)*.25, 5.0])
-  vel_sane = (abs(cluster.vRel + v_ego - lead.v[0]) < 10) or (v_ego + cluster.vRel > 3)
-  if dist_sane and vel_sane:
-    return cluster
-  else:
-    return None
+    # if no 'sane' match is found return None
+    # stationary radar points can be false positives
+    dist_sane = abs(cluster.dRel - offset_vision_dist) < max([(offset_vision_dist)*.25, 5.0])
+    vel_sane = (abs(cluster.vRel + v_ego - v_vision) < 10) or (v_ego + cluster.vRel > 3)
+    matches.append(cluster if dist_sane and vel_sane else None)
+  return matches
 
 
-def get_lead(v_ego, ready, clusters, lead_msg, low_speed_override=True):
+def get_leads(v_ego, ready, clusters, cluster_values, lead_msgs, low_speed_override=True):
+  """Leads of radarState for each vision lead. With low_speed_override, the first lead is overridden by the closest
+  potential low speed lead."""
   # Determine leads, this is where the essential logic happens
-  if len(clusters) > 0 and ready and lead_msg.prob > .5:
-    cluster = match_vision_to_cluster(v_ego, lead_msg, clusters)
-  else:
-    cluster = None
-
-  lead_dict = {'status': False}
-  if cluster is not None:
-    lead_dict = cluster.get_RadarState(lead_msg.prob)
-  elif (cluster is None) and ready and (lead_msg.prob > .5):
-    lead_dict = Cluster().get_RadarState_from_vision(lead_msg, v_ego)
+  lead_probs = [lead_msg.prob for lead_msg in lead_msgs]
+  matched = [i for i, prob in enumerate(lead_probs) if prob > .5] if ready and len(clusters) > 0 else []
+  cluster_matches = [None] * len(lead_msgs)
+  if len(matched):
+    for i, cluster in zip(matched, match_vision_to_clusters(v_ego, [lead_msgs[i] for i in matched], clusters,
+                                                            cluster_values)):
+      cluster_matches[i] = cluster
+
+  lead_dicts = []
+  for lead_msg, prob, cluster in zip(lead_msgs, lead_probs, cluster_matches):
+    lead_dict = {'status': False}
+    if cluster is not None:
+      lead_dict = cluster.get_RadarState(prob)
+    elif ready and (prob > .5):
+      lead_dict = Cluster().get_RadarState_from_vision(lead_msg, v_ego)
+    lead_dicts.append(lead_dict)
 
   if low_speed_override:
-    low_speed_clusters = [c for c in clusters if c.potential_low_speed_lead(v_ego)]
-    if len(low_speed_clusters) > 0:
-      closest_cluster = min(low_speed_clusters, key=lambda c: c.dRel)
+    low_speed_idxs = np.flatnonzero(potential_low_speed_leads(cluster_values, v_ego))
+    if len(low_speed_idxs) > 0:
+      closest_cluster = clusters[low_speed_idxs[np.argmin(cluster_values[D_REL, low_speed_idxs])]]
 
       # Only choose new cluster if it is actually closer than the previous one
-      if (not lead_dict['status']) or (closest_cluster.dRel < lead_dict['dRel']):
-        lead_dict = closest_cluster.get_RadarState()
+      if (not lead_dicts[0]['status']) or (closest_cluster.dRel < lead_dicts[0]['dRel']):
+        lead_dicts[0] = closest_cluster.get_RadarState()
 
-  return lead_dict
+  return lead_dicts
 
 
 class RadarD():
   def __init__(self, radar_ts, delay=0):
     self.current_time = 0
 
-    self.tracks = defaultdict(dict)
     self.kalman_params = KalmanParams(radar_ts)
+    self.tracks = RadarTracks(self.kalman_params)
 
     # v_ego
     self.v_ego = 0.
     self.v_ego_hist = deque([0], maxlen=delay+1)
 
     self.ready = False
+    self.radar_state_builder = messaging.MessageBuilder('radarState')
 
   def update(self, sm, rr, enable_lead):
     self.current_time = 1e-9*max(sm.logMonoTime.values())
@@ -107,57 +123,20 @@ class RadarD():
     if sm.updated['modelV2']:
       self.ready = True
 
-    ar_pts = {}
-    for pt in rr.points:
-      ar_pts[pt.trackId] = [pt.dRel, pt.yRel, pt.vRel, pt.measured]
-
-    # *** remove missing points from meta data ***
-    for ids in list(self.tracks.keys()):
-      if ids not in ar_pts:
-        self.tracks.pop(ids, None)
-
     # *** compute the tracks ***
-    for ids in ar_pts:
-      rpt = ar_pts[ids]
-
-      # align v_ego by a fixed time to align it with the radar measurement
-      v_lead = rpt[2] + self.v_ego_hist[0]
-
-      # create the track if it doesn't exist or it's a new track
-      if ids not in self.tracks:
-        self.tracks[ids] = Track(v_lead, self.kalman_params)
-      self.tracks[ids].update(rpt[0], rpt[1], rpt[2], v_lead, rpt[3])
-
-    idens = list(sorted(self.tracks.keys()))
-    track_pts = list([self.tracks[iden].get_key_for_cluster() for iden in idens])
+    pts = np.array([(pt.trackId, pt.dRel, pt.yRel, pt.vRel, pt.measured) for pt in rr.points], dtype=POINT_DTYPE)
+    self.tracks.update(pts, self.v_ego_hist[0])
 
     # If we have multiple points, cluster them
-    if len(track_pts) > 1:
-      cluster_idxs = cluster_points_centroid(track_pts, 2.5)
-      clusters = [None] * (max(cluster_idxs) + 1)
-
-      for idx in range(len(track_pts)):
-        cluster_i = cluster_idxs[idx]
-        if clusters[cluster_i] is None:
-          clusters[cluster_i] = Cluster()
-        clusters[cluster_i].add(self.tracks[idens[idx]])
-    elif len(track_pts) == 1:
-      # FIXME: cluster_point_centroid hangs forever if len(track_pts) == 1
-      cluster_idxs = [0]
-      clusters = [Cluster()]
-      clusters[0].add(self.tracks[idens[0]])
+    if len(self.tracks) > 1:
+      cluster_idxs = cluster_points_centroid(self.tracks.get_keys_for_cluster(), 2.5)
     else:
-      clusters = []
-
-    # if a new point, reset accel to the rest of the cluster
-    for idx in range(len(track_pts)):
-      if self.tracks[idens[idx]].cnt <= 1:
-        aLeadK = clusters[cluster_idxs[idx]].aLeadK
-        aLeadTau = clusters[cluster_idxs[idx]].aLeadTau
-        self.tracks[idens[idx]].reset_a_lead(aLeadK, aLeadTau)
+      # FIXME: cluster_point_centroid hangs forever if len(track_pts) == 1
+      cluster_idxs = [0] * len(self.tracks)
+    clusters = self.tracks.get_clusters(cluster_idxs)
 
     # *** publish radarState ***
-    dat = messaging.new_message('radarState')
+    dat = self.radar_state_builder.new()
     dat.valid = sm.all_alive_and_valid() and len(rr.errors) == 0
     radarState = dat.radarState
     radarState.mdMonoTime = sm.logMonoTime['modelV2']
@@ -166,9 +145,10 @@ class RadarD():
     radarState.carStateMonoTime = sm.logMonoTime['carState']
 
     if enable_lead:
-      if len(sm['modelV2'].leadsV3) > 1:
-        radarState.leadOne = get_lead(self.v_ego, self.ready, clusters, sm['modelV2'].leadsV3[0], low_speed_override=True)
-        radarState.leadTwo = get_lead(self.v_ego, self.ready, clusters, sm['modelV2'].leadsV3[1], low_speed_override=False)
+      leads_v3 = sm['modelV2'].leadsV3
+      if len(leads_v3) > 1:
+        radarState.leadOne, radarState.leadTwo = get_leads(self.v_ego, self.ready, clusters, self.tracks.cluster_values,
+                                                           [leads_v3[0], leads_v3[1]])
     return dat
 
 
@@ -191,19 +171,23 @@ def radard_thread(sm=None, pm=None, can_sock=None):
   if sm is None:
     sm = messaging.SubMaster(['modelV2', 'carState'], ignore_avg_freq=['modelV2', 'carState'])  # Can't check average frequency, since radar determines timing
   if pm is None:
-    pm = messaging.PubMaster(['radarState', 'liveTracks'])
+    pm = messaging.PubMaster(['radarState', 'liveTracks', 'radardProfile'])
 
   RI = RadarInterface(CP)
 
   rk = Ratekeeper(1.0 / CP.radarTimeStep, print_delay_threshold=None)
   RD = RadarD(CP.radarTimeStep, RI.delay)
+  live_tracks_builder = messaging.MessageBuilder('liveTracks')
+  prof = LatencyProfiler('radardProfile', CP.radarTimeStep)
 
   # TODO: always log leads once we can hide them conditionally
   enable_lead = True #CP.openpilotLongitudinalControl or not CP.radarOffCan
 
   while 1:
     can_strings = messaging.drain_sock_raw(can_sock, wait_for_one=True)
+    prof.checkpoint("Wait", ignore=True)
     rr = RI.update(can_strings)
+    prof.checkpoint("Radar interface")
 
     if rr is None:
       continue
@@ -212,23 +196,27 @@ def radard_thread(sm=None, pm=None, can_sock=None):
 
     dat = RD.update(sm, rr, enable_lead)
     dat.radarState.cumLagMs = -rk.remaining*1000.
+    prof.checkpoint("Update")
 
-    pm.send('radarState', dat)
+    pm.send('radarState', RD.radar_state_builder)
 
     # *** publish tracks for UI debugging (keep last) ***
     tracks = RD.tracks
-    dat = messaging.new_message('liveTracks', len(tracks))
+    dat = live_tracks_builder.new(len(tracks))
 
-    for cnt, ids in enumerate(sorted(tracks.keys())):
+    for cnt, (ids, d_rel, y_rel, v_rel) in enumerate(zip(tracks.ids.tolist(), tracks.dRel.tolist(),
+                                                         tracks.yRel.tolist(), tracks.vRel.tolist())):
       dat.liveTracks[cnt] = {
         "trackId": ids,
-        "dRel": float(tracks[ids].dRel),
-        "yRel": float(tracks[ids].yRel),
-        "vRel": float(tracks[ids].vRel),
+        "dRel": d_rel,
+        "yRel": y_rel,
+        "vRel": v_rel,
       }
-    pm.send('liveTracks', dat)
+    pm.send('liveTracks', live_tracks_builder)
+    prof.checkpoint("Sent")
 
     rk.monitor_time()
+    prof.frame_done(pm)
 
 
 def main(sm=None, pm=None, can_sock=None):
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import random
+import unittest
+
+from cereal import car
+import cereal.messaging as messaging
+from selfdrive.controls.lib.alertmanager import AlertManager
+from selfdrive.controls.lib.events import ET, EVENTS, Alert, Events
+from selfdrive.debug.benchmark_refs import ScanningEvents, SortingAlertManager, alerts_cycle
+
+EventName = car.CarEvent.EventName
+
+class TestAlertManager(unittest.TestCase):
+  def setUp(self):
+    CP = car.CarParams.new_message()
+    sm = messaging.SubMaster(['deviceState', 'pandaState', 'liveCalibration', 'controlsState', 'carState',
+                              'driverMonitoringState', 'modelV2', 'longitudinalPlan'], addr=None)
+    self.callback_args = [CP, sm, False]
+    self.names = [e for e, alerts in EVENTS.items() if all(isinstance(a, Alert) for a in alerts.values())]
+
+  def test_matches_sorting(self):
+    random.seed(0)
+    events, AM = Events(), AlertManager()
+    ref_events, ref_AM = ScanningEvents(), SortingAlertManager()
+
+    active, alert_types = [], [ET.PERMANENT]
+    for frame in range(5000):
+      if random.random() < 0.05:
+        active = random.sample(self.names, random.randint(0, 6))
+      if random.random() < 0.02:
+        alert_types = [ET.PERMANENT] + random.sample([ET.WARNING, ET.NO_ENTRY, ET.ENABLE, ET.SOFT_DISABLE],
+                                                     random.randint(0, 2))
+      self.assertEqual(alerts_cycle(ref_events, ref_AM, frame, active, alert_types, self.callback_args),
+                       alerts_cycle(events, AM, frame, active, alert_types, self.callback_args), f'frame {frame}')
+
+  def test_heap_bounded(self):
+    events, AM = Events(), AlertManager()
+    names = [EventName.preLaneChangeLeft, EventName.steerSaturated, EventName.fcw]
+    for frame in range(1000):
+      alerts_cycle(events, AM, frame, names, [ET.PERMANENT, ET.WARNING], self.callback_args)
+    self.assertLessEqual(len(AM._heap), len(names) + AM.COMPACT_SIZE)
+
+
+if __name__ == "__main__":
+  unittest.main()
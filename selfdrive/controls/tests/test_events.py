@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import random
+import unittest
+
+from cereal import car
+import cereal.messaging as messaging
+from selfdrive.controls.lib.events import ET, EVENTS, Alert, Events
+from selfdrive.debug.benchmark_refs import ScanningEvents, events_cycle
+
+EventName = car.CarEvent.EventName
+
+ALL_ET = [ET.ENABLE, ET.PRE_ENABLE, ET.NO_ENTRY, ET.WARNING, ET.USER_DISABLE, ET.SOFT_DISABLE, ET.IMMEDIATE_DISABLE,
+          ET.PERMANENT]
+
+
+class TestEvents(unittest.TestCase):
+  def setUp(self):
+    CP = car.CarParams.new_message()
+    sm = messaging.SubMaster(['deviceState', 'pandaState', 'liveCalibration', 'controlsState', 'carState',
+                              'driverMonitoringState', 'modelV2', 'longitudinalPlan'], addr=None)
+    self.callback_args = [CP, sm, False]
+    # Events with alerts not depending on the state of the services.
+    self.names = [e for e, alerts in EVENTS.items() if all(isinstance(a, Alert) for a in alerts.values())]
+
+  def test_matches_table_scan(self):
+    random.seed(0)
+    events, scanning = Events(), ScanningEvents()
+    for e in [EventName.startupMaster, EventName.dashcamMode]:
+      events.add(e, static=True)
+      scanning.add(e, static=True)
+
+    # Events stay active over several cycles to cover creation delays.
+    active = []
+    for _ in range(2000):
+      if random.random() < 0.1:
+        active = random.sample(self.names, random.randint(0, 4))
+      self.assertEqual(events_cycle(events, active, self.callback_args), events_cycle(scanning, active, self.callback_args))
+      self.assertEqual({e: n for e, n in scanning.events_prev.items() if n > 0}, events.events_prev)
+
+  def test_any(self):
+    events = Events()
+    events.add(EventName.pcmEnable)
+    self.assertTrue(events.any(ET.ENABLE))
+    self.assertFalse(events.any(ET.NO_ENTRY))
+    events.clear()
+    self.assertFalse(events.any(ET.ENABLE))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import unittest
+import numpy as np
+
+from cereal import car, log
+from common.numpy_fast import interp
+from selfdrive.controls.lib.drive_helpers import CONTROL_N, LON_MPC_N
+from selfdrive.controls.lib.lead_mpc import MPC_T, LeadMpc
+from selfdrive.controls.lib.long_mpc import LongitudinalMpc
+from selfdrive.controls.lib.longitudinal_mpc_lib import libmpc_py
+from selfdrive.debug.benchmark_refs import ListLongitudinalMpc, radar_state
+from selfdrive.modeld.constants import T_IDXS
+
+
+class _RecordingLibmpc():
+  """Forwards to an MPC library, recording the arguments of its solves."""
+  def __init__(self, libmpc):
+    self.libmpc = libmpc
+    self.calls = []
+
+  def __getattr__(self, name):
+    return getattr(self.libmpc, name)
+
+  def run_mpc(self, *args):
+    self.calls.append(args)
+    return self.libmpc.run_mpc(*args)
+
+
+def _address(cdata):
+  return int(libmpc_py.ffi.cast("uintptr_t", cdata))
+
+
+class TestMpcBindings(unittest.TestCase):
+  def test_longitudinal_solution(self):
+    CS, rs = car.CarState.new_message(), log.RadarState.new_message()
+    solutions = []
+    for mpc_class in [ListLongitudinalMpc, LongitudinalMpc]:
+      mpc = mpc_class()
+      for v in [10., 12., 15.]:
+        mpc.set_cur_state(v, 0.)
+        mpc.update(CS, rs, 20., 0., True)
+      solutions.append([np.array(s) for s in (mpc.v_solution, mpc.a_solution, mpc.j_solution)])
+
+    for ref, sol in zip(*solutions):
+      np.testing.assert_equal(ref, sol)
+    # The solution shares the memory of the C struct
+    self.assertEqual(mpc.v_solution[-1], mpc.mpc_solution.v_ego[LON_MPC_N])
+
+  def test_lead_solution(self):
+    CS = car.CarState.new_message()
+    CS.vEgo = 20.
+    mpc = LeadMpc(0)
+    mpc.set_cur_state(20., 0.)
+    mpc.update(CS, radar_state(30.), 25., 0., True)
+    np.testing.assert_allclose(mpc.v_solution, interp(T_IDXS[:CONTROL_N], MPC_T, list(mpc.mpc_solution.v_ego)),
+                               rtol=1e-12)
+    np.testing.assert_allclose(mpc.j_solution, interp(T_IDXS[:CONTROL_N], MPC_T[:-1], list(mpc.mpc_solution.j_ego)),
+                               rtol=1e-12, atol=1e-12)
+
+  def test_buffers(self):
+    CS, rs = car.CarState.new_message(), log.RadarState.new_message()
+    mpc = LongitudinalMpc()
+    mpc.libmpc = _RecordingLibmpc(mpc.libmpc)
+    for v in [10., 12.]:
+      mpc.set_cur_state(v, 0.)
+      mpc.update(CS, rs, 20., 0., True)
+
+    # Every solve gets pointers to the same target buffers, no lists are built
+    self.assertEqual(len(mpc.libmpc.calls), 2)
+    for args in mpc.libmpc.calls:
+      self.assertFalse(any(isinstance(a, list) for a in args))
+      self.assertEqual([_address(a) for a in args[2:5]],
+                       [buf.ctypes.data for buf in (mpc.poss, mpc.speeds, mpc.accels)])
+    np.testing.assert_equal(mpc.speeds, 20.)
+
+    # The solution shares the memory of the C struct, also after a reset
+    for _ in range(2):
+      for sol, field in [(mpc.v_solution, 'v_ego'), (mpc.a_solution, 'a_ego'), (mpc.j_solution, 'j_ego')]:
+        self.assertEqual(sol.ctypes.data, _address(getattr(mpc.mpc_solution, field)))
+      mpc.reset_mpc()
+
+
+if __name__ == "__main__":
+  unittest.main()
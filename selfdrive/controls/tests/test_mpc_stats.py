@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import unittest
+from unittest import mock
+import numpy as np
+
+import cereal.messaging as messaging
+from cereal import car, log
+from selfdrive.controls.lib.lead_mpc import LeadMpc
+from selfdrive.controls.lib.limits_long_mpc import LimitsLongitudinalMpc
+from selfdrive.controls.lib.longitudinal_planner import Planner
+
+_PLANNER_SERVICES = ['carState', 'controlsState', 'radarState', 'modelV2', 'dragonConf', 'liveMapData']
+
+
+def _radar_state(lead_one, lead_two, fcw=False):
+  rs = log.RadarState.new_message()
+  for lead, status in [(rs.leadOne, lead_one), (rs.leadTwo, lead_two)]:
+    lead.status = status
+    if status:
+      lead.dRel, lead.vLead, lead.aLeadK, lead.aLeadTau = 30., 15., 0., 1.5
+  rs.leadTwo.fcw = fcw
+  return rs
+
+
+def _planner_msgs(frame):
+  """Messages for plannerd on `frame`. Driving at 20 m/s, a slow lead braking at 15 mts ahead shows up for 30
+  frames every 400."""
+  cs = messaging.new_message('carState')
+  cs.carState.vEgo = 20.
+  controls = messaging.new_message('controlsState')
+  controls.controlsState.longControlState = car.CarControl.Actuators.LongControlState.pid
+  controls.controlsState.vCruise = 90.
+  controls.controlsState.active = True
+  radar = messaging.new_message('radarState')
+  lead_frame = frame % 400 - 370
+  if lead_frame >= 0:
+    lead = radar.radarState.leadOne
+    lead.status = True
+    lead.dRel, lead.vLead, lead.aLeadK, lead.aLeadTau = 15. - 15. * 0.05 * lead_frame, 5., -2., 1.5
+  return [cs, controls, radar, messaging.new_message('modelV2'), messaging.new_message('dragonConf'),
+          messaging.new_message('liveMapData')]
+
+
+def _planner_outputs(frames=800):
+  CP = car.CarParams.new_message()
+  CP.steerRatio, CP.wheelbase = 15., 2.7
+  planner = Planner(CP)
+  sm = messaging.SubMaster(_PLANNER_SERVICES, addr=None)
+
+  outputs, sources = [], []
+  for frame in range(frames):
+    sm.update_msgs(frame * 0.05, _planner_msgs(frame))
+    planner.update(sm, CP)
+    outputs.append(np.concatenate((planner.v_desired_trajectory, planner.a_desired_trajectory,
+                                   planner.j_desired_trajectory, [planner.fcw])))
+    sources.append(planner.longitudinalPlanSource)
+  return np.array(outputs), sources, planner.mpc_stats
+
+
+class TestMpcStats(unittest.TestCase):
+  def test_planner_solves(self):
+    outputs, sources, stats = _planner_outputs()
+    self.assertIn('lead0', sources)
+    for key in ['lead0', 'lead1', 'cruise', 'custom']:
+      self.assertEqual(stats[key].solves, len(outputs))
+      self.assertGreater(stats[key].solve_time, 0.)
+      self.assertIsNotNone(stats[key].last_solve_time)
+
+  def test_lead_repeated_solves(self):
+    # The lead MPC runs a single iteration warm started from its previous solve, so solving it again with the same
+    # inputs changes its solution. Solutions can not be reused.
+    mpc = LeadMpc(0)
+    CS, rs = car.CarState.new_message(), _radar_state(True, False)
+    CS.vEgo = 20.
+    solutions = []
+    for _ in range(2):
+      mpc.set_cur_state(20., 0.)
+      mpc.update(CS, rs, 25., 0., True)
+      solutions.append(mpc.a_solution.copy())
+    self.assertGreater(np.abs(solutions[1] - solutions[0]).max(), 1e-3)
+
+  def test_skipping_inactive_custom_solves(self):
+    # The custom MPC shares its solver with the cruise MPC, which is warm started from the custom solve. Skipping the
+    # custom solves while no limit controller is active changes the plans once a lead appears.
+    outputs, sources, _ = _planner_outputs()
+    with mock.patch.object(LimitsLongitudinalMpc, 'update', lambda *args: None):
+      skipping_outputs, skipping_sources, _ = _planner_outputs()
+    self.assertEqual(sources, skipping_sources)
+    np.testing.assert_allclose(outputs[:370], skipping_outputs[:370], rtol=0., atol=1e-6)
+    self.assertGreater(np.abs(outputs - skipping_outputs).max(), 1e-4)
+
+
+if __name__ == "__main__":
+  unittest.main()
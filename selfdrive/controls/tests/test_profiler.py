@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import unittest
+from unittest import mock
+
+from cereal import log
+from common.profiler import HIST_BINS_PER_DECADE, LatencyProfiler
+from selfdrive.debug.benchmark_refs import PubMaster
+
+Trigger = log.ProcessProfile.Trigger
+BIN_WIDTH = 10 ** (1 / HIST_BINS_PER_DECADE)
+
+
+class _Clock():
+  def __init__(self):
+    self.t = 100.
+
+  def __call__(self):
+    return self.t
+
+
+class TestLatencyProfiler(unittest.TestCase):
+  def setUp(self):
+    self.clock = _Clock()
+    patcher = mock.patch('common.profiler.time.perf_counter', self.clock)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.prof = LatencyProfiler('controlsdProfile', 0.01)
+    self.pm = PubMaster()
+
+  def _frame(self, wait, sample, control):
+    for name, dt, ignore in [("Wait", wait, True), ("Sample", sample, False), ("Control", control, False)]:
+      self.clock.t += dt
+      self.prof.checkpoint(name, ignore=ignore)
+    return self.prof.frame_done(self.pm)
+
+  def _stages(self, dat):
+    return {s.name: s for s in dat.controlsdProfile.stages}
+
+  def test_histograms(self):
+    for i in range(99):
+      self.assertFalse(self._frame(0.005, 0.001, 0.002 + 0.00001 * i))
+    self.assertEqual(len(self.pm.sent), 0)
+
+    # A second after the first frame, the window is published and reset.
+    self.assertFalse(self._frame(0.7, 0.001, 0.003))
+    self.assertEqual(len(self.pm.sent), 1)
+    service, dat = self.pm.sent[0]
+    self.assertEqual(service, 'controlsdProfile')
+    profile = dat.controlsdProfile
+    self.assertEqual(profile.trigger, Trigger.periodic)
+    self.assertEqual(profile.frames, 100)
+    self.assertEqual(profile.deadlineMisses, 0)
+
+    stages = self._stages(dat)
+    self.assertEqual(list(stages), ["total", "Wait", "Sample", "Control"])
+    self.assertTrue(stages["Wait"].ignored)
+    self.assertEqual(stages["Control"].count, 100)
+    for stage, p50, p99, max_ms in [("Sample", 1., 1., 1.), ("Control", 2.5, 3., 3.), ("total", 3.5, 4., 4.)]:
+      # Within a bin
+      self.assertTrue(p50 / BIN_WIDTH <= stages[stage].p50Ms <= p50 * BIN_WIDTH, stage)
+      self.assertTrue(p99 / BIN_WIDTH <= stages[stage].p99Ms <= p99 * BIN_WIDTH, stage)
+      self.assertAlmostEqual(stages[stage].maxMs, max_ms, places=3)
+    self.assertAlmostEqual(stages["Wait"].maxMs, 700., places=3)
+    self.assertEqual(self.prof.frames, 0)
+
+  def test_deadline_miss(self):
+    self._frame(0.005, 0.001, 0.002)
+    self.assertTrue(self._frame(0.005, 0.004, 0.008))
+    self.assertEqual(len(self.pm.sent), 1)
+    profile = self.pm.sent[0][1].controlsdProfile
+    self.assertEqual(profile.trigger, Trigger.deadlineMiss)
+    self.assertEqual((profile.frames, profile.deadlineMisses, profile.totalDeadlineMisses), (2, 1, 1))
+    stages = self._stages(self.pm.sent[0][1])
+    self.assertAlmostEqual(stages["Control"].lastMs, 8., places=3)
+    self.assertAlmostEqual(stages["total"].lastMs, 12., places=3)
+
+    # Misses are published at most every MISS_PUBLISH_INTERVAL
+    self.assertTrue(self._frame(0.005, 0.004, 0.008))
+    self.assertEqual(len(self.pm.sent), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import unittest
+import numpy as np
+
+from common.numpy_fast import mean
+from selfdrive.controls.lib.radar_helpers import _LEAD_ACCEL_TAU, Cluster, RadarTracks
+from selfdrive.controls.radard import KalmanParams, get_leads
+from selfdrive.debug.benchmark_refs import get_lead, radar_points, tracks_clusters, update_tracks, vision_lead
+
+
+class TestRadarTracks(unittest.TestCase):
+  def setUp(self):
+    self.kalman_params = KalmanParams(0.05)
+
+  def test_kalman(self):
+    rng = np.random.default_rng(0)
+    tracks, ref_tracks = RadarTracks(self.kalman_params), {}
+    ids = np.arange(16)
+    for _ in range(500):
+      # Tracks come and go, in any order
+      ids = np.union1d(ids[rng.random(len(ids)) > 0.05], rng.integers(0, 64, 2))
+      pts = radar_points(rng, rng.permutation(ids))
+      tracks.update(pts, 10.)
+      update_tracks(ref_tracks, pts, 10., self.kalman_params)
+
+      self.assertEqual(tracks.ids.tolist(), sorted(ref_tracks))
+      for name in ['vLeadK', 'aLeadK', 'aLeadTau', 'cnt']:
+        np.testing.assert_allclose(getattr(tracks, name), [getattr(ref_tracks[i], name) for i in tracks.ids],
+                                   rtol=1e-12, err_msg=name)
+
+  def test_duplicated_points(self):
+    tracks = RadarTracks(self.kalman_params)
+    pts = radar_points(np.random.default_rng(0), [3, 1, 3])
+    tracks.update(pts, 0.)
+    self.assertEqual(tracks.ids.tolist(), [1, 3])
+    self.assertEqual(tracks.dRel[1], pts['dRel'][2])
+
+  def test_clusters(self):
+    rng = np.random.default_rng(0)
+    tracks = RadarTracks(self.kalman_params)
+    for ids in [np.arange(20), np.arange(5, 30)]:
+      tracks.update(radar_points(rng, ids), 10.)
+    new = tracks.cnt == 1
+    cluster_idxs = rng.integers(0, 6, len(tracks))
+    cluster_idxs[:6] = np.arange(6)
+
+    updated = [(tracks.aLeadK[i], tracks.aLeadTau[i]) for i in range(len(tracks)) if not new[i]]
+    clusters = tracks.get_clusters(cluster_idxs)
+    self.assertEqual(len(clusters), 6)
+    for c, cluster in enumerate(clusters):
+      idxs = np.flatnonzero(cluster_idxs == c)
+      for name in ['dRel', 'yRel', 'vRel', 'vLead', 'vLeadK']:
+        self.assertAlmostEqual(getattr(cluster, name), mean(getattr(tracks, name)[idxs].tolist()), places=9)
+      self.assertEqual(cluster.measured, any(tracks.measured[idxs]))
+
+      old_idxs = [i for i in idxs if not new[i]]
+      if len(old_idxs):
+        self.assertAlmostEqual(cluster.aLeadK, mean([tracks.aLeadK[i] for i in old_idxs]), places=9)
+        self.assertAlmostEqual(cluster.aLeadTau, mean([tracks.aLeadTau[i] for i in old_idxs]), places=9)
+      else:
+        self.assertEqual((cluster.aLeadK, cluster.aLeadTau), (0., _LEAD_ACCEL_TAU))
+
+      # New tracks get the acceleration of their cluster
+      for i in idxs[new[idxs]]:
+        self.assertEqual((tracks.aLeadK[i], tracks.aLeadTau[i]), (cluster.aLeadK, cluster.aLeadTau))
+    self.assertEqual(updated, [(tracks.aLeadK[i], tracks.aLeadTau[i]) for i in range(len(tracks)) if not new[i]])
+
+
+class TestLeads(unittest.TestCase):
+  def setUp(self):
+    self.kalman_params = KalmanParams(0.05)
+
+  def test_get_leads(self):
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+      tracks, clusters = tracks_clusters(rng, int(rng.integers(0, 16)), self.kalman_params)
+      v_ego, ready = float(rng.choice([2., 10.])), bool(rng.random() < 0.9)
+      leads = [vision_lead(rng, clusters[rng.integers(len(clusters))] if len(clusters) else Cluster(),
+                            float(rng.choice([0.2, 0.9]))) for _ in range(2)]
+
+      lead_one, lead_two = get_leads(v_ego, ready, clusters, tracks.cluster_values, leads)
+      self.assertEqual(lead_one, get_lead(v_ego, ready, clusters, leads[0], low_speed_override=True))
+      self.assertEqual(lead_two, get_lead(v_ego, ready, clusters, leads[1], low_speed_override=False))
+
+
+if __name__ == "__main__":
+  unittest.main()
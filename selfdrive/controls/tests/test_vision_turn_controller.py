@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import unittest
+import numpy as np
+
+from cereal import car
+from selfdrive.controls.lib.lane_planner import TRAJECTORY_SIZE
+from selfdrive.controls.lib.vision_turn_controller import _EVAL_RANGE, VisionTurnController, \
+  VisionTurnControllerState, _LanesPolyFit, eval_curvature, eval_lat_acc
+from selfdrive.debug.benchmark_refs import eval_curvature_vectorized, turn_sm
+
+
+class TestVisionTurnController(unittest.TestCase):
+  def setUp(self):
+    CP = car.CarParams.new_message()
+    CP.steerRatio = 15.
+    CP.wheelbase = 2.7
+    self.controller = VisionTurnController(CP)
+    self.controller._is_enabled = True
+    self.controller._last_params_update = float('inf')
+
+  def test_eval_curvature(self):
+    np.random.seed(0)
+    polys = np.random.uniform(-1e-3, 1e-3, (8, 4))
+    curvatures = eval_curvature(polys, _EVAL_RANGE)
+    self.assertEqual(curvatures.shape, (8, len(_EVAL_RANGE)))
+    for poly, curvature in zip(polys, curvatures):
+      np.testing.assert_allclose(eval_curvature(poly, _EVAL_RANGE), eval_curvature_vectorized(poly, _EVAL_RANGE),
+                                 rtol=1e-12)
+      np.testing.assert_allclose(curvature, eval_curvature_vectorized(poly, _EVAL_RANGE), rtol=1e-12)
+    np.testing.assert_allclose(eval_lat_acc(20., curvatures[0]), 400. * curvatures[0])
+
+  def test_lanes_polyfit(self):
+    np.random.seed(0)
+    polyfit = _LanesPolyFit()
+    for x_max in [190., 190., 120.]:
+      x = np.linspace(0., x_max, TRAJECTORY_SIZE)
+      y = np.polyval(np.random.uniform(-1e-3, 1e-3, 4), x) + np.random.normal(0., 0.05, TRAJECTORY_SIZE)
+      np.testing.assert_allclose(polyfit(x, y), np.polyfit(x, y, 3), rtol=1e-6, atol=1e-12)
+
+  def test_turn_ahead(self):
+    sm = turn_sm(radius=100.)
+    self.controller.update(True, 25., 0., 30., sm)
+    # 25 m/s on a 100 m radius turn
+    self.assertAlmostEqual(self.controller._max_pred_lat_acc, 25.**2 / 100., delta=0.5)
+    self.assertEqual(self.controller.state, VisionTurnControllerState.entering)
+    self.assertTrue(self.controller._lat_acc_overshoot_ahead)
+    self.assertAlmostEqual(self.controller.v_turn, (2. * 100.)**0.5, delta=1.)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Benchmarks of optimized code paths against their reference implementations in the benchmark_refs modules.
+
+Timings depend on the machine and its load, hence they are not asserted on by the unit tests.
+
+  ./benchmark.py                   # all benchmarks
+  ./benchmark.py nodes_data
+"""
+import argparse
+import time
+import timeit
+
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+  BENCHMARKS[fn.__name__] = fn
+  return fn
+
+
+def best_time(fn, number):
+  """Best time per call of `fn` in seconds, out of 5 repetitions of `number` calls."""
+  return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+@benchmark
+def spatial_index():
+  import numpy as np
+  from selfdrive.mapd.lib.mock_data import MockOSM
+  from selfdrive.mapd.lib.WayCollection import WayCollection
+  from selfdrive.mapd.lib.benchmark_refs import GRID_CENTER, fixes_along_grid_street
+
+  # Latency on sparse collections is dominated by the route building
+  for size, spacing in [(40, 100.), (12, 500.)]:
+    ways = MockOSM.grid_ways(GRID_CENTER, size, spacing)
+    query_center = np.radians(np.array(GRID_CENTER))
+    fixes = fixes_along_grid_street(size, spacing)
+
+    def locate(wc):
+      for location_rad, bearing_rad in fixes:  # pylint: disable=cell-var-from-loop
+        wc.get_route(location_rad, bearing_rad, 5.)
+
+    # Per way updates, to isolate the effect of the index from the vectorized update
+    times = [best_time(lambda: locate(wc), 1) / len(fixes)  # pylint: disable=cell-var-from-loop
+             for wc in [WayCollection(ways, query_center, use_spatial_index=False, vectorized=False),
+                        WayCollection(ways, query_center, vectorized=False)]]
+    print(f'{len(ways)} ways. Per fix latency: linear scan {times[0] * 1e3:.2f} ms, spatial index {times[1] * 1e3:.2f} ms')
+
+
+@benchmark
+def nodes_data():
+  import numpy as np
+  from selfdrive.mapd.lib.NodesData import NodesData
+  from selfdrive.mapd.lib.benchmark_refs import fork_way_collection
+
+  # Route regeneration after taking a fork
+  wc, _ = fork_way_collection()
+  fork_wr = next(wr for wr in wc.way_relations if wr.name == 'Fork')
+  location_rad = np.mean(np.radians(fork_wr.nodes_deg[5:7]), axis=0)
+  bearing_rad = np.arctan2(*np.diff(fork_wr.nodes_deg[5:7], axis=0)[0][::-1])
+  wrs = wc.get_route(location_rad, bearing_rad, 5.)._ordered_way_relations
+
+  def cold():
+    for wr in wrs:
+      wr.nodes_calculations.clear()
+    return NodesData(wrs, wc.wr_index)
+
+  cold_time, memoized_time = best_time(cold, 10), best_time(lambda: NodesData(wrs, wc.wr_index), 10)
+  print(f'NodesData of {len(wrs)} ways: cold {cold_time * 1e3:.2f} ms, memoized ways {memoized_time * 1e3:.2f} ms')
+
+
+@benchmark
+def speed_limits():
+  from selfdrive.mapd.lib import WayRelation as way_relation
+  from selfdrive.mapd.lib.geo import DIRECTION
+  from selfdrive.mapd.lib.mock_data import MockOSM
+  from selfdrive.mapd.lib.WayStore import WayStore
+
+  tags = {'highway': 'primary', 'maxspeed': '50',
+          'maxspeed:conditional': '30 @ (Mo-Fr 07:00-09:00,16:00-18:00; Sa 10:00-12:00)'}
+  wr = way_relation.WayRelation(WayStore(MockOSM.road_ways([[52.2, 13.87], [52.2, 13.871]], tags=tags)), 0)
+
+  def cached():
+    wr.direction = DIRECTION.FORWARD if wr.direction != DIRECTION.FORWARD else DIRECTION.BACKWARD
+    return wr.speed_limit
+
+  def parsed():
+    # Parsing the tag strings on every evaluation, as it was before the caches
+    for cache in [way_relation._limit_cache, way_relation._schedule_cache, way_relation._conditional_limit_cache]:
+      cache.clear()
+    wr._speed_limits = {}
+    return cached()
+
+  parsed_time, cached_time = best_time(parsed, 2000), best_time(cached, 2000)
+  print(f'Speed limit evaluation: parsed {parsed_time * 1e6:.1f} us, cached {cached_time * 1e6:.1f} us')
+
+
+@benchmark
+def map_matching():
+  import numpy as np
+  from selfdrive.mapd.lib.mock_data import MockOSM
+  from selfdrive.mapd.lib.WayCollection import WayCollection
+  from selfdrive.mapd.lib.benchmark_refs import GRID_CENTER, STREET_GRID_SIZE, STREET_GRID_SPACING, \
+    matched_route_per_fix, noisy_street_fixes, route_per_fix
+
+  ways = MockOSM.grid_ways(GRID_CENTER, STREET_GRID_SIZE, STREET_GRID_SPACING)
+  query_center = np.radians(np.array(GRID_CENTER))
+  fixes = noisy_street_fixes()
+  for name, locate in [('per fix', route_per_fix), ('HMM', matched_route_per_fix)]:
+    builds = locate(WayCollection(ways, query_center), fixes, 5.)[1]
+    t = best_time(lambda: locate(WayCollection(ways, query_center), fixes, 5.), 1) / len(fixes)  # pylint: disable=cell-var-from-loop
+    print(f'{name}: {builds} route builds in {len(fixes)} fixes, {t * 1e3:.2f} ms per fix')
+
+
+@benchmark
+def submaster():
+  from cereal.messaging import SubMaster
+  from cereal.messaging.benchmark_refs import RecomputingSubMaster, frames, frequent_services
+
+  for count in [1, 5, 10, 20, 40]:
+    services = frequent_services(count)
+    service_frames = frames(services, 1000)
+    times = []
+    for cls in [RecomputingSubMaster, SubMaster]:
+      sm = cls(services, addr=None)
+      update = lambda: [sm.update_msgs(t, msgs) for t, msgs in service_frames]  # pylint: disable=cell-var-from-loop
+      times.append(best_time(update, 1) / len(service_frames))
+    print(f'{count} services. update_msgs: full recompute {times[0] * 1e6:.1f} us, '
+          f'running sums {times[1] * 1e6:.1f} us')
+
+
+@benchmark
+def lazy_decoding():
+  from cereal import messaging
+  from cereal.messaging import LazyEvent, SubMaster
+  from cereal.messaging.benchmark_refs import random_message
+
+  # Services and fields read on each loop by radard and plannerd. The other services are only checked for updates
+  # and mono times.
+  for daemon, services, read in [('radard', ['modelV2', 'carState'], [('carState', 'vEgo')]),
+                                 ('plannerd', ['carState', 'controlsState', 'radarState', 'modelV2', 'dragonConf',
+                                               'liveMapData'], [('carState', 'vEgo'), ('modelV2', 'frameId')])]:
+    dats = [random_message(s).to_bytes() for s in services]
+    times = []
+    for decode in [messaging.log_from_bytes, LazyEvent]:
+      sm = SubMaster(services, addr=None)
+
+      def loop():
+        sm.update_msgs(1., [decode(dat) for dat in dats])
+        for s, field in read:
+          getattr(sm[s], field)
+
+      times.append(best_time(loop, 2000))
+    print(f'{daemon}: update and read per loop. Eager {times[0] * 1e6:.1f} us, lazy {times[1] * 1e6:.1f} us')
+
+
+@benchmark
+def message_builder():
+  from cereal import messaging
+  from cereal.messaging import MessageBuilder
+  from cereal.messaging.benchmark_refs import POOLED_MESSAGES
+
+  for s, size, fill in POOLED_MESSAGES:
+    builder = MessageBuilder(s)
+
+    def new_message():
+      dat = messaging.new_message(s) if size is None else messaging.new_message(s, size)
+      fill(dat)
+      return dat.to_bytes()
+
+    def pooled():
+      fill(builder.new(size))
+      return builder.to_bytes()
+
+    new_time, pooled_time = best_time(new_message, 5000), best_time(pooled, 5000)
+    print(f'{s}: {len(pooled())} bytes. new_message {new_time * 1e6:.1f} us, pooled {pooled_time * 1e6:.1f} us. '
+          f'Pooled arena {builder._words * 8} bytes')
+
+
+@benchmark
+def log_reader():
+  import os
+  import tempfile
+  from selfdrive.loggerd.indexed_log import LogWriter
+  from selfdrive.loggerd.recorder import RLOG_NAME
+  from selfdrive.debug.benchmark_refs import drive
+  from tools.lib.logreader import LogReader
+
+  dats = drive()
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, RLOG_NAME)
+    with LogWriter(path, block_size=16 * 1024) as writer:
+      for dat in dats:
+        writer.write(dat)
+
+    all_time = best_time(lambda: [m for m in LogReader(path) if m.which() == 'radarState'], 1)
+    service_time = best_time(lambda: list(LogReader(path, services=['radarState'])), 1)
+  print(f'{len(dats)} events. radarState from decoding all {all_time * 1e3:.1f} ms, '
+        f'service filter {service_time * 1e3:.1f} ms')
+
+
+@benchmark
+def events():
+  from cereal import car
+  from selfdrive.controls.lib.events import Events
+  from selfdrive.debug.benchmark_refs import ScanningEvents, events_cycle
+
+  # Usual driving cycle: a couple of events active, with static alerts only
+  EventName = car.CarEvent.EventName
+  names = [EventName.pcmEnable, EventName.preLaneChangeLeft]
+  callback_args = [car.CarParams.new_message(), None, False]
+  for events_class in [ScanningEvents, Events]:
+    events = events_class()
+    events.add(EventName.startupMaster, static=True)
+    t = best_time(lambda: events_cycle(events, names, callback_args), 2000)
+    print(f'{events_class.__name__}: {t * 1e6:.1f} us per controlsd cycle')
+
+
+@benchmark
+def alerts():
+  from cereal import car
+  from selfdrive.controls.lib.alertmanager import AlertManager
+  from selfdrive.controls.lib.events import ET, EVENTS, Alert, Events
+  from selfdrive.debug.benchmark_refs import ScanningEvents, SortingAlertManager, alerts_cycle
+
+  # Many simultaneous warnings, e.g. on a faulty car
+  names = [e for e, a in EVENTS.items() if ET.WARNING in a and all(isinstance(x, Alert) for x in a.values())][:20]
+  alert_types = [ET.PERMANENT, ET.WARNING]
+  callback_args = [car.CarParams.new_message(), None, False]
+  for events_class, am_class in [(ScanningEvents, SortingAlertManager), (Events, AlertManager)]:
+    events, AM = events_class(), am_class()
+    frames = iter(range(10**7))
+    t = best_time(lambda: alerts_cycle(events, AM, next(frames), names, alert_types, callback_args), 2000)
+    print(f'{am_class.__name__}: {t * 1e6:.1f} us per controlsd cycle with {len(names)} events')
+
+
+@benchmark
+def profiler():
+  from common.profiler import LatencyProfiler
+  from selfdrive.debug.benchmark_refs import PubMaster
+
+  prof, pm = LatencyProfiler('controlsdProfile', 0.01), PubMaster()
+
+  def frame():
+    for name, ignore in [("Wait", True), ("Sample", False), ("Control", False)]:
+      prof.checkpoint(name, ignore=ignore)
+    prof.frame_done(pm)
+
+  t = best_time(frame, 10000)
+  print(f'LatencyProfiler: {t * 1e6:.2f} us per frame of 3 checkpoints')
+
+
+@benchmark
+def interp_table():
+  from cereal import car
+  from common.numpy_fast import interp, InterpTable
+
+  xp, fp = [0.0, 5.0, 10.0, 20.0, 55.0], [-2.0, -1.8, -1.6, -1.4, -1.2]
+  # Tuning tables of the car interfaces are read from the CarParams on every call
+  CP = car.CarParams.new_message()
+  CP.longitudinalTuning.kpBP = xp
+  CP.longitudinalTuning.kpV = fp
+  tuning = CP.longitudinalTuning
+
+  for name, bp, v in [('list', xp, fp), ('CarParams', tuning.kpBP, tuning.kpV)]:
+    table = InterpTable(bp, v)
+    interp_time = best_time(lambda: interp(25., bp, v), 100000)  # pylint: disable=cell-var-from-loop
+    table_time = best_time(lambda: table(25.), 100000)  # pylint: disable=cell-var-from-loop
+    print(f'{name} table: interp {interp_time * 1e6:.2f} us, InterpTable {table_time * 1e6:.2f} us per call')
+
+
+@benchmark
+def vision_turn():
+  import numpy as np
+  from cereal import car
+  from selfdrive.controls.lib.vision_turn_controller import _EVAL_RANGE, VisionTurnController, eval_curvature
+  from selfdrive.debug.benchmark_refs import eval_curvature_vectorized, turn_sm
+
+  poly = np.random.default_rng(0).uniform(-1e-3, 1e-3, 4)
+  for name, f in [('np.vectorize', eval_curvature_vectorized), ('array', eval_curvature)]:
+    t = best_time(lambda: f(poly, _EVAL_RANGE), 2000)  # pylint: disable=cell-var-from-loop
+    print(f'eval_curvature {name}: {t * 1e6:.1f} us')
+
+  CP = car.CarParams.new_message()
+  CP.steerRatio = 15.
+  CP.wheelbase = 2.7
+  controller = VisionTurnController(CP)
+  controller._is_enabled = True
+  controller._last_params_update = float('inf')
+  sm = turn_sm(radius=300.)
+  t = best_time(lambda: controller.update(True, 25., 0., 30., sm), 2000)
+  print(f'VisionTurnController.update: {t * 1e6:.1f} us per cycle')
+
+
+class _TimedLibmpc():
+  """Forwards to an MPC library, timing its solves."""
+  def __init__(self, libmpc):
+    self.libmpc = libmpc
+    self.solve_time = 0.
+
+  def __getattr__(self, name):
+    return getattr(self.libmpc, name)
+
+  def run_mpc(self, *args):
+    t = time.perf_counter()
+    ret = self.libmpc.run_mpc(*args)
+    self.solve_time += time.perf_counter() - t
+    return ret
+
+
+@benchmark
+def mpc_bindings():
+  from cereal import car
+  from selfdrive.controls.lib.lead_mpc import LeadMpc
+  from selfdrive.controls.lib.long_mpc import LongitudinalMpc
+  from selfdrive.debug.benchmark_refs import ListLongitudinalMpc, radar_state
+
+  CS, rs = car.CarState.new_message(), radar_state(30.)
+  CS.vEgo = 20.
+  n = 1000
+  for name, mpc in [('lists', ListLongitudinalMpc()), ('buffers', LongitudinalMpc()), ('lead', LeadMpc(0))]:
+    mpc.libmpc = _TimedLibmpc(mpc.libmpc)
+    t = time.perf_counter()
+    for _ in range(n):
+      mpc.set_cur_state(20., 0.)
+      mpc.update(CS, rs, 25., 0., True)
+    overhead = (time.perf_counter() - t - mpc.libmpc.solve_time) / n
+    print(f'{name}: {overhead * 1e6:.1f} us per solve outside the solver')
+
+
+@benchmark
+def radar_tracks():
+  import numpy as np
+  from selfdrive.controls.lib.radar_helpers import RadarTracks
+  from selfdrive.controls.radard import KalmanParams
+  from selfdrive.debug.benchmark_refs import radar_points, update_tracks
+
+  kalman_params = KalmanParams(0.05)
+  rng = np.random.default_rng(0)
+  pts = radar_points(rng, rng.permutation(32))
+  tracks, ref_tracks = RadarTracks(kalman_params), {}
+  ref_t = best_time(lambda: update_tracks(ref_tracks, pts, 10., kalman_params), 2000)
+  t = best_time(lambda: tracks.update(pts, 10.), 2000)
+  print(f'Tracks update of 32 points: {ref_t * 1e6:.1f} us by track, {t * 1e6:.1f} us batched')
+
+
+@benchmark
+def radar_leads():
+  import numpy as np
+  from selfdrive.controls.radard import KalmanParams, get_leads
+  from selfdrive.debug.benchmark_refs import get_lead, tracks_clusters, vision_lead
+
+  def leads_by_cluster(clusters, leads):
+    return [get_lead(2., True, clusters, lead, low_speed_override=(i == 0)) for i, lead in enumerate(leads)]
+
+  kalman_params = KalmanParams(0.05)
+  rng = np.random.default_rng(0)
+  for n_clusters in [1, 8, 32]:
+    tracks, clusters = tracks_clusters(rng, n_clusters, kalman_params)
+    leads = [vision_lead(rng, clusters[0], 0.9), vision_lead(rng, clusters[-1], 0.9)]
+    ref_t = best_time(lambda: leads_by_cluster(clusters, leads), 2000)  # pylint: disable=cell-var-from-loop
+    t = best_time(lambda: get_leads(2., True, clusters, tracks.cluster_values, leads), 2000)  # pylint: disable=cell-var-from-loop
+    print(f'Leads of {n_clusters} clusters: {ref_t * 1e6:.1f} us by cluster, {t * 1e6:.1f} us vectorized')
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("benchmarks", nargs='*', help=f"benchmarks to run, all if none: {', '.join(BENCHMARKS)}")
+  args = parser.parse_args()
+  unknown = set(args.benchmarks) - set(BENCHMARKS)
+  if unknown:
+    parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+  for name in args.benchmarks or BENCHMARKS:
+    print(f'--- {name}')
+    BENCHMARKS[name]()
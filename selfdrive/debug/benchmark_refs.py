@@ -0,0 +1,301 @@
+"""Reference implementations of optimized code paths, as they were before the optimizations, and the inputs they are
+compared on. Shared by the unit tests checking both give the same results and by benchmark.py timing them."""
+import copy
+import math
+from typing import List
+
+import numpy as np
+
+import cereal.messaging as messaging
+from cereal import car, log
+from common.kalman.simple_kalman import KF1D
+from common.realtime import DT_CTRL
+from selfdrive.config import RADAR_TO_CAMERA
+from selfdrive.controls.lib.alertmanager import AlertManager
+from selfdrive.controls.lib.drive_helpers import LON_MPC_N
+from selfdrive.controls.lib.events import ET, EVENTS, EVENT_NAME, Alert, Events
+from selfdrive.controls.lib.lane_planner import TRAJECTORY_SIZE
+from selfdrive.controls.lib.long_mpc import LongitudinalMpc
+from selfdrive.controls.lib.radar_helpers import _LEAD_ACCEL_TAU, POINT_DTYPE, Cluster, RadarTracks
+from selfdrive.modeld.constants import T_IDXS
+
+# loggerd
+
+# Services and rates of a 10 s drive.
+DRIVE_SERVICES = {'carState': 100, 'controlsState': 100, 'modelV2': 20, 'radarState': 20, 'deviceState': 2}
+
+
+def drive(seconds=10):
+  msgs = []
+  for s, rate in DRIVE_SERVICES.items():
+    for i in range(seconds * rate):
+      msg = messaging.new_message(s)
+      msg.logMonoTime = int(i * 1e9 / rate)
+      msgs.append(msg)
+  return [msg.to_bytes() for msg in sorted(msgs, key=lambda m: m.logMonoTime)]
+
+# controls
+
+class ScanningEvents(Events):
+  """Events scanning the whole event table, as it was before the bitset."""
+  def __init__(self):
+    super().__init__()
+    self.events_prev = dict.fromkeys(EVENTS.keys(), 0)
+
+  def clear(self):
+    self.events_prev = {k: (v + 1 if k in self.events else 0) for k, v in self.events_prev.items()}
+    self.events = self.static_events.copy()
+
+  def any(self, event_type):
+    for e in self.events:
+      if event_type in EVENTS.get(e, {}).keys():
+        return True
+    return False
+
+  def create_alerts(self, event_types, callback_args=None):
+    if callback_args is None:
+      callback_args = []
+
+    ret = []
+    for e in self.events:
+      types = EVENTS[e].keys()
+      for et in event_types:
+        if et in types:
+          alert = EVENTS[e][et]
+          if not isinstance(alert, Alert):
+            alert = alert(*callback_args)
+
+          if DT_CTRL * (self.events_prev[e] + 1) >= alert.creation_delay:
+            alert.alert_type = f"{EVENT_NAME[e]}/{et}"
+            alert.event_type = et
+            ret.append(alert)
+    return ret
+
+
+def events_cycle(events, names, callback_args):
+  """One controlsd cycle: events from carState and other services, state transition checks and alerts."""
+  events.clear()
+  for e in names:
+    events.add(e)
+  any_types = [events.any(et) for et in [ET.USER_DISABLE, ET.IMMEDIATE_DISABLE, ET.SOFT_DISABLE, ET.PRE_ENABLE,
+                                         ET.ENABLE, ET.NO_ENTRY]]
+  alerts = events.create_alerts([ET.PERMANENT, ET.WARNING], callback_args)
+  return any_types, [a.alert_type for a in alerts]
+
+
+ALERT_FIELDS = ['alert_type', 'alert_text_1', 'alert_text_2', 'alert_status', 'alert_size', 'visual_alert',
+                'audible_alert', 'alert_rate']
+
+
+class SortingAlertManager(AlertManager):
+  """Alert manager copying every added alert and sorting them all on every cycle, as it was before the heap."""
+  def __init__(self):  # pylint: disable=super-init-not-called
+    self.activealerts: List[Alert] = []
+    self.clear_current_alert()
+
+  def add_many(self, frame, alerts, enabled=True):
+    for alert in alerts:
+      added_alert = copy.copy(alert)
+      added_alert.start_time = frame * DT_CTRL
+      self.activealerts.append(added_alert)
+
+  def process_alerts(self, frame, clear_event_type=None):
+    cur_time = frame * DT_CTRL
+    self.activealerts = [a for a in self.activealerts if a.event_type != clear_event_type and
+                         a.start_time + max(a.duration_sound, a.duration_hud_alert, a.duration_text) > cur_time]
+    self.activealerts.sort(key=lambda k: (k.alert_priority, k.start_time), reverse=True)
+
+    self.clear_current_alert()
+    if len(self.activealerts):
+      current_alert = self.activealerts[0]
+      self.alert_type = current_alert.alert_type
+      if current_alert.start_time + current_alert.duration_sound > cur_time:
+        self.audible_alert = current_alert.audible_alert
+      if current_alert.start_time + current_alert.duration_hud_alert > cur_time:
+        self.visual_alert = current_alert.visual_alert
+      if current_alert.start_time + current_alert.duration_text > cur_time:
+        self.alert_text_1 = current_alert.alert_text_1
+        self.alert_text_2 = current_alert.alert_text_2
+        self.alert_status = current_alert.alert_status
+        self.alert_size = current_alert.alert_size
+        self.alert_rate = current_alert.alert_rate
+
+
+def alerts_cycle(events, AM, frame, names, alert_types, callback_args):
+  """The alert part of a controlsd cycle."""
+  events.clear()
+  for e in names:
+    events.add(e)
+  clear_event = ET.WARNING if ET.WARNING not in alert_types else None
+  AM.add_many(frame, events.create_alerts(alert_types, callback_args))
+  AM.process_alerts(frame, clear_event)
+  return [getattr(AM, f) for f in ALERT_FIELDS]
+
+
+class PubMaster():
+  """PubMaster keeping the sent messages."""
+  def __init__(self):
+    self.sent = []
+
+  def send(self, s, dat):
+    self.sent.append((s, dat))
+
+
+def eval_curvature_vectorized(poly, x_vals):
+  """Curvature evaluation with np.vectorize, as it was before the array expression."""
+  def curvature(x):
+    return abs(2 * poly[1] + 6 * poly[0] * x) / (1 + (3 * poly[0] * x**2 + 2 * poly[1] * x + poly[2])**2)**(1.5)
+  return np.vectorize(curvature)(x_vals)
+
+
+class _SubMaster(dict):
+  def __init__(self, msgs):
+    super().__init__(msgs)
+    self.valid = {s: True for s in msgs}
+
+
+def turn_sm(radius):
+  """Lanes 3.6 m apart along a left turn of `radius` ahead."""
+  x = np.linspace(0., 190., TRAJECTORY_SIZE)
+  center = x**2 / (2 * radius)
+  model = log.ModelDataV2.new_message()
+  lane_lines = model.init('laneLines', 4)
+  for i, offset in enumerate([5.4, 1.8, -1.8, -5.4]):
+    lane_lines[i].t = np.linspace(0., 10., TRAJECTORY_SIZE).tolist()
+    lane_lines[i].x = x.tolist()
+    lane_lines[i].y = (center - offset).tolist()
+  model.laneLineProbs = [0.2, 0.9, 0.9, 0.2]
+  model.laneLineStds = [0.5, 0.1, 0.1, 0.5]
+
+  CS = car.CarState.new_message()
+  CS.steeringAngleDeg = 5.
+  return _SubMaster({'modelV2': model, 'carState': CS, 'lateralPlan': log.LateralPlan.new_message()})
+
+
+class ListLongitudinalMpc(LongitudinalMpc):
+  """Longitudinal MPC passing its targets and solution as lists on every solve, as it was before the buffers."""
+  def update(self, carstate, radarstate, v_cruise, a_target, active):
+    v_cruise_clipped = np.clip(v_cruise, self.cur_state[0].v_ego - 10., self.cur_state[0].v_ego + 10.0)
+    poss = v_cruise_clipped * np.array(T_IDXS[:LON_MPC_N+1])
+    speeds = v_cruise_clipped * np.ones(LON_MPC_N+1)
+    accels = np.zeros(LON_MPC_N+1)
+    self.libmpc.run_mpc(self.cur_state, self.mpc_solution,
+                        list(poss), list(speeds), list(accels),
+                        self.min_a, self.max_a)
+    self.v_solution = list(self.mpc_solution.v_ego)
+    self.a_solution = list(self.mpc_solution.a_ego)
+    self.j_solution = list(self.mpc_solution.j_ego)
+    any(math.isnan(x) for x in self.mpc_solution[0].v_ego)
+
+
+def radar_state(d_rel):
+  rs = log.RadarState.new_message()
+  rs.leadOne.status = True
+  rs.leadOne.dRel, rs.leadOne.vLead, rs.leadOne.aLeadK, rs.leadOne.aLeadTau = d_rel, 15., 0., 1.5
+  return rs
+
+# radard
+
+class Track():
+  """Lead Kalman filter of a single radar track, as tracks were before RadarTracks."""
+  def __init__(self, v_lead, kalman_params):
+    self.cnt = 0
+    self.aLeadTau = _LEAD_ACCEL_TAU
+    self.kf = KF1D([[v_lead], [0.0]], kalman_params.A, kalman_params.C, kalman_params.K)
+
+  def update(self, v_lead):
+    if self.cnt > 0:
+      self.kf.update(v_lead)
+    self.vLeadK = float(self.kf.x[0][0])
+    self.aLeadK = float(self.kf.x[1][0])
+    if abs(self.aLeadK) < 0.5:
+      self.aLeadTau = _LEAD_ACCEL_TAU
+    else:
+      self.aLeadTau *= 0.9
+    self.cnt += 1
+
+
+def update_tracks(tracks, pts, v_ego, kalman_params):
+  """Track updates of radard before RadarTracks."""
+  ar_pts = {}
+  for pt in pts:
+    ar_pts[pt['trackId']] = pt
+  for ids in list(tracks.keys()):
+    if ids not in ar_pts:
+      tracks.pop(ids, None)
+  for ids, pt in ar_pts.items():
+    v_lead = pt['vRel'] + v_ego
+    if ids not in tracks:
+      tracks[ids] = Track(v_lead, kalman_params)
+    tracks[ids].update(v_lead)
+
+
+def _laplacian_cdf(x, mu, b):
+  b = max(b, 1e-4)
+  return math.exp(-abs(x-mu)/b)
+
+
+def _match_vision_to_cluster(v_ego, lead, clusters):
+  """Vision to cluster match scoring a cluster at a time, as it was before match_vision_to_clusters."""
+  offset_vision_dist = lead.x[0] - RADAR_TO_CAMERA
+
+  def prob(c):
+    prob_d = _laplacian_cdf(c.dRel, offset_vision_dist, lead.xStd[0])
+    prob_y = _laplacian_cdf(c.yRel, -lead.y[0], lead.yStd[0])
+    prob_v = _laplacian_cdf(c.vRel + v_ego, lead.v[0], lead.vStd[0])
+    return prob_d * prob_y * prob_v
+
+  cluster = max(clusters, key=prob)
+  dist_sane = abs(cluster.dRel - offset_vision_dist) < max([(offset_vision_dist)*.25, 5.0])
+  vel_sane = (abs(cluster.vRel + v_ego - lead.v[0]) < 10) or (v_ego + cluster.vRel > 3)
+  return cluster if dist_sane and vel_sane else None
+
+
+def get_lead(v_ego, ready, clusters, lead_msg, low_speed_override=True):
+  """Lead of radarState by vision lead, as it was before get_leads."""
+  if len(clusters) > 0 and ready and lead_msg.prob > .5:
+    cluster = _match_vision_to_cluster(v_ego, lead_msg, clusters)
+  else:
+    cluster = None
+
+  lead_dict = {'status': False}
+  if cluster is not None:
+    lead_dict = cluster.get_RadarState(lead_msg.prob)
+  elif (cluster is None) and ready and (lead_msg.prob > .5):
+    lead_dict = Cluster().get_RadarState_from_vision(lead_msg, v_ego)
+
+  if low_speed_override:
+    low_speed_clusters = [c for c in clusters if c.potential_low_speed_lead(v_ego)]
+    if len(low_speed_clusters) > 0:
+      closest_cluster = min(low_speed_clusters, key=lambda c: c.dRel)
+      if (not lead_dict['status']) or (closest_cluster.dRel < lead_dict['dRel']):
+        lead_dict = closest_cluster.get_RadarState()
+  return lead_dict
+
+
+def radar_points(rng, ids):
+  pts = np.zeros(len(ids), dtype=POINT_DTYPE)
+  pts['trackId'] = ids
+  pts['dRel'] = rng.uniform(0., 100., len(ids))
+  pts['yRel'] = rng.uniform(-5., 5., len(ids))
+  pts['vRel'] = rng.normal(0., 5., len(ids))
+  pts['measured'] = rng.random(len(ids)) < 0.8
+  return pts
+
+
+def tracks_clusters(rng, n_clusters, kalman_params):
+  """Clusters of a track each."""
+  tracks = RadarTracks(kalman_params)
+  tracks.update(radar_points(rng, np.arange(n_clusters)), 10.)
+  return tracks, tracks.get_clusters(np.arange(n_clusters))
+
+
+def vision_lead(rng, cluster, prob):
+  """Vision lead close to a cluster."""
+  lead = log.ModelDataV2.LeadDataV3.new_message()
+  lead.prob = prob
+  lead.x = [cluster.dRel + RADAR_TO_CAMERA + rng.normal(0., 3.)]
+  lead.y = [-cluster.yRel + rng.normal(0., 0.5)]
+  lead.v = [cluster.vLead + rng.normal(0., 2.)]
+  lead.xStd, lead.yStd, lead.vStd = [[float(s)] for s in rng.uniform(0.5, 5., 3)]
+  return lead
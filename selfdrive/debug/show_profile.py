@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Prints the loop stage latency histograms published by controlsd, plannerd and radard.
+
+  ./show_profile.py                      # every profile
+  ./show_profile.py controlsdProfile     # only controlsd
+  ./show_profile.py --misses             # only the profiles published on deadline misses
+"""
+import os
+import argparse
+
+from cereal import log
+import cereal.messaging as messaging
+
+PROFILES = ['controlsdProfile', 'plannerdProfile', 'radardProfile']
+
+
+def format_profile(service, profile):
+  trigger = "DEADLINE MISS" if profile.trigger == log.ProcessProfile.Trigger.deadlineMiss else "periodic"
+  lines = [f"***** {service} {trigger}: {profile.frames} frames, {profile.deadlineMisses} over {profile.deadlineMs:.1f} ms "
+           f"({profile.totalDeadlineMisses} total)"]
+  lines.append(f"{'stage':>20} {'count':>7} {'p50':>7} {'p99':>7} {'max':>7} {'last':>7}")
+  for stage in profile.stages:
+    name = stage.name + (" (ignored)" if stage.ignored else "")
+    lines.append(f"{name:>20} {stage.count:7d} {stage.p50Ms:7.2f} {stage.p99Ms:7.2f} {stage.maxMs:7.2f} "
+                 f"{stage.lastMs:7.2f}")
+  return "\n".join(lines)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Print the loop stage latencies of the profiled daemons, in ms.")
+  parser.add_argument("services", nargs="*", default=PROFILES, help="profile services")
+  parser.add_argument("--misses", action="store_true", help="only print the profiles of deadline misses")
+  parser.add_argument("--addr", default="127.0.0.1")
+  args = parser.parse_args()
+
+  if args.addr != "127.0.0.1":
+    os.environ["ZMQ"] = "1"
+    messaging.context = messaging.Context()
+
+  poller = messaging.Poller()
+  socks = {messaging.sub_sock(s, poller, addr=args.addr): s for s in args.services}
+  while True:
+    for sock in poller.poll(1000):
+      for msg in messaging.drain_sock(sock):
+        profile = getattr(msg, socks[sock])
+        if args.misses and profile.trigger != log.ProcessProfile.Trigger.deadlineMiss:
+          continue
+        print(format_profile(socks[sock], profile))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Latency report of the messages traced with TRACE_LATENCY set.
+
+Reads the trace rings written by cereal.messaging (see cereal/messaging/trace.py), live or from a dump, and reports
+per service publish intervals and transport latency histograms, and the critical path of chains of services where
+each process publishes the next service from the last message received of the previous one.
+
+  TRACE_LATENCY=1 ./launch_openpilot.sh
+  ./trace_latency.py                                # live, every 5 s
+  ./trace_latency.py --save trace.npz --once
+  ./trace_latency.py --dump trace.npz --chain modelV2 lateralPlan carControl
+
+Services published by C++ processes are not traced on publish. Their logMonoTime is used as publish time instead.
+"""
+import argparse
+import time
+import numpy as np
+from collections import defaultdict
+
+from cereal.messaging.trace import TRACE_DIR, PUBLISH, RECEIVE, SERVICE_IDS, SERVICE_NAMES, read_traces
+
+RECORD_DTYPE = np.dtype([('kind', 'u1'), ('service', 'u2'), ('log_mono_time', 'u8'), ('t', 'u8')])
+HISTOGRAM_BINS_MS = [0., 0.5, 1., 2., 5., 10., 20., 50., 100., np.inf]
+DEFAULT_CHAINS = [['modelV2', 'lateralPlan', 'carControl'], ['carState', 'longitudinalPlan', 'sendcan']]
+
+
+def to_arrays(traces):
+  return {name: np.array(records, dtype=RECORD_DTYPE) for name, records in traces.items() if len(records) > 0}
+
+
+def load_dump(path):
+  with np.load(path) as dump:
+    return {name: dump[name] for name in dump.files}
+
+
+def _stats(ms):
+  return {'count': len(ms), 'mean': float(np.mean(ms)), 'p50': float(np.percentile(ms, 50)),
+          'p99': float(np.percentile(ms, 99)), 'max': float(np.max(ms))}
+
+
+class Publications():
+  """Publish times by service and logMonoTime across all processes."""
+  def __init__(self, arrays):
+    self.producers = {}  # service id -> name of the publishing process
+    pubs = defaultdict(list)
+    for name, records in arrays.items():
+      records = records[records['kind'] == PUBLISH]
+      for service in np.unique(records['service']):
+        self.producers[service] = name
+        pubs[service].append(records[records['service'] == service])
+
+    self.pubs = {}
+    for service, records in pubs.items():
+      records = np.concatenate(records)
+      self.pubs[service] = records[np.argsort(records['log_mono_time'], kind='stable')]
+
+  def publish_times(self, service, log_mono_times):
+    """Publish times of the messages of `service` with `log_mono_times`. logMonoTime when not traced."""
+    log_mono_times = np.asarray(log_mono_times, dtype=np.uint64)
+    records = self.pubs.get(service)
+    if records is None or len(records) == 0:
+      return log_mono_times.copy()
+
+    idxs = np.minimum(np.searchsorted(records['log_mono_time'], log_mono_times), len(records) - 1)
+    found = records['log_mono_time'][idxs] == log_mono_times
+    return np.where(found, records['t'][idxs], log_mono_times)
+
+
+def service_report(arrays, pubs):
+  """Per service publish interval stats and transport latency (receive time - publish time) histograms."""
+  report = {}
+  for service, records in pubs.pubs.items():
+    t = np.sort(records['t'])
+    if len(t) > 1:
+      report.setdefault(SERVICE_NAMES[service], {})['interval'] = _stats(np.diff(t) * 1e-6)
+
+  for name, records in arrays.items():
+    records = records[records['kind'] == RECEIVE]
+    for service in np.unique(records['service']):
+      received = records[records['service'] == service]
+      ms = (received['t'].astype(np.int64) -
+            pubs.publish_times(service, received['log_mono_time']).astype(np.int64)) * 1e-6
+      entry = report.setdefault(SERVICE_NAMES[service], {})
+      entry.setdefault('latency', {})[name] = dict(_stats(ms), histogram=np.histogram(ms, HISTOGRAM_BINS_MS)[0])
+  return report
+
+
+def chain_report(arrays, pubs, chain):
+  """Critical path of `chain`, a list of services where the producer of each service receives the previous one.
+
+  Walks back from each publish of the last service: on the producer, the last message of the previous service received
+  before publishing is the one the publish was computed from. Returns the stats of the transport and processing time of
+  each hop along the end to end time, or None when the chain is never completed.
+  """
+  ids = [SERVICE_IDS[s] for s in chain]
+  last = pubs.pubs.get(ids[-1])
+  if last is None or len(last) == 0:
+    return None
+
+  # Receives of each service on each process, sorted by time.
+  receives = {}
+  for name, records in arrays.items():
+    records = records[records['kind'] == RECEIVE]
+    for service in ids[:-1]:
+      received = records[records['service'] == service]
+      receives[(name, service)] = received[np.argsort(received['t'], kind='stable')]
+
+  t = last['t'].astype(np.int64)
+  valid = np.ones(len(t), dtype=bool)
+  segments = []
+  for k in range(len(ids) - 2, -1, -1):
+    received = receives.get((pubs.producers.get(ids[k + 1]), ids[k]))
+    if received is None or len(received) == 0:
+      return None
+
+    idxs = np.searchsorted(received['t'].astype(np.int64), t, side='right') - 1
+    valid &= idxs >= 0
+    idxs = np.maximum(idxs, 0)
+    recv_t = received['t'][idxs].astype(np.int64)
+    pub_t = pubs.publish_times(ids[k], received['log_mono_time'][idxs]).astype(np.int64)
+    segments.append((f'{chain[k]} -> {chain[k + 1]}', t - recv_t))
+    segments.append((f'{chain[k]} transport', recv_t - pub_t))
+    t = pub_t
+
+  if not np.any(valid):
+    return None
+
+  end_to_end = last['t'].astype(np.int64) - t
+  report = {label: _stats(ms[valid] * 1e-6) for label, ms in reversed(segments)}
+  report['end to end'] = _stats(end_to_end[valid] * 1e-6)
+  return report
+
+
+def print_report(arrays, chains):
+  pubs = Publications(arrays)
+  bins = ' '.join(f'<{b:g}' for b in HISTOGRAM_BINS_MS[1:-1]) + ' more'
+  print(f'{"service":<22}{"receiver":<32}{"count":>7}{"mean":>8}{"p50":>8}{"p99":>8}{"max":>8}  histogram (ms) {bins}')
+  for service, entry in sorted(service_report(arrays, pubs).items()):
+    if 'interval' in entry:
+      s = entry['interval']
+      print(f'{service:<22}{"(publish interval)":<32}{s["count"]:>7}{s["mean"]:>8.2f}{s["p50"]:>8.2f}{s["p99"]:>8.2f}'
+            f'{s["max"]:>8.2f}')
+    for receiver, s in entry.get('latency', {}).items():
+      print(f'{service:<22}{receiver[:31]:<32}{s["count"]:>7}{s["mean"]:>8.2f}{s["p50"]:>8.2f}{s["p99"]:>8.2f}'
+            f'{s["max"]:>8.2f}  {" ".join(str(c) for c in s["histogram"])}')
+
+  for chain in chains:
+    print(f'\ncritical path: {" -> ".join(chain)}')
+    report = chain_report(arrays, pubs, chain)
+    if report is None:
+      print('  not traced')
+      continue
+    for label, s in report.items():
+      print(f'  {label:<40}{s["count"]:>7}{s["mean"]:>8.2f}{s["p50"]:>8.2f}{s["p99"]:>8.2f}{s["max"]:>8.2f}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Report latencies of the messages traced with TRACE_LATENCY set.')
+  parser.add_argument('--dir', default=TRACE_DIR, help='trace rings directory')
+  parser.add_argument('--dump', help='report on a dump saved with --save instead of the live rings')
+  parser.add_argument('--save', help='save the rings to this .npz file')
+  parser.add_argument('--chain', nargs='+', action='append', help='services of a chain to report the critical path of')
+  parser.add_argument('--interval', type=float, default=5., help='seconds between live reports')
+  parser.add_argument('--once', action='store_true', help='report once and exit')
+  args = parser.parse_args()
+  chains = args.chain if args.chain is not None else DEFAULT_CHAINS
+
+  if args.dump is not None:
+    print_report(load_dump(args.dump), chains)
+    return
+
+  while True:
+    arrays = to_arrays(read_traces(args.dir))
+    if args.save is not None:
+      np.savez(args.save, **arrays)
+    print_report(arrays, chains)
+    if args.once:
+      break
+    print()
+    time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,183 @@
+"""Indexed log segments.
+
+A segment is a file of compressed blocks of events followed by an index of the blocks. Each event is stored as a
+record with a small header (service, logMonoTime and length) before the capnp bytes, so readers can skip the events of
+other services without decoding them, and the index lets them skip whole blocks by service and time. The index is
+written when the segment is closed. Segments without it, i.e. from a recorder that did not exit cleanly, are read by
+scanning the block headers.
+
+  file:   FILE_HEADER, blocks..., index, INDEX_FOOTER
+  block:  BLOCK_HEADER, compressed records
+  record: RECORD_HEADER, capnp Event bytes
+"""
+import bz2
+import json
+import zlib
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import cereal.messaging as messaging
+from cereal.messaging.trace import SERVICE_IDS, SERVICE_NAMES
+
+FILE_MAGIC = b'OPILOG'
+FILE_VERSION = 1
+INDEX_MAGIC = b'OPILOGIX'
+BLOCK_SIZE = 256 * 1024  # Uncompressed bytes per block.
+
+FILE_HEADER = struct.Struct('<6sBB')  # magic, version, compression
+BLOCK_HEADER = struct.Struct('<IIIQQ')  # compressed size, size, count, first logMonoTime, last logMonoTime
+RECORD_HEADER = struct.Struct('<HQI')  # service, logMonoTime, size
+INDEX_FOOTER = struct.Struct('<Q8s')  # index offset, magic
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_BZ2 = 2
+_COMPRESS = {COMPRESSION_NONE: bytes, COMPRESSION_ZLIB: zlib.compress, COMPRESSION_BZ2: bz2.compress}
+_DECOMPRESS = {COMPRESSION_NONE: bytes, COMPRESSION_ZLIB: zlib.decompress, COMPRESSION_BZ2: bz2.decompress}
+
+
+class BlockIndex():
+  """Position, time span and services of a block."""
+  def __init__(self, offset: int, first_time: int, last_time: int, services: Dict[str, int]):
+    self.offset = offset
+    self.first_time = first_time
+    self.last_time = last_time
+    self.services = services  # service -> count of events. None when unknown, i.e. not indexed.
+
+  def to_dict(self):
+    return {'offset': self.offset, 'first_time': self.first_time, 'last_time': self.last_time,
+            'services': self.services}
+
+  def matches(self, services=None, start_time=None, end_time=None) -> bool:
+    if services is not None and self.services is not None and not any(s in self.services for s in services):
+      return False
+    if start_time is not None and self.last_time < start_time:
+      return False
+    return end_time is None or self.first_time <= end_time
+
+
+class LogWriter():
+  """Writes events to an indexed log segment at `path`."""
+  def __init__(self, path: str, compression: int = COMPRESSION_ZLIB, block_size: int = BLOCK_SIZE):
+    self.path = path
+    self.compression = compression
+    self.block_size = block_size
+    self.blocks: List[BlockIndex] = []
+    self._f = open(path, 'wb')
+    self._f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, compression))
+    self._records: List[bytes] = []
+    self._size = 0
+    self._services: Dict[str, int] = {}
+    self._first_time = None
+    self._last_time = 0
+
+  def write(self, dat: bytes) -> None:
+    """Writes a serialized Event."""
+    event = messaging.LazyEvent(dat)
+    s = event.which()
+    self._records.append(RECORD_HEADER.pack(SERVICE_IDS[s], event.logMonoTime, len(dat)))
+    self._records.append(dat)
+    self._size += RECORD_HEADER.size + len(dat)
+    self._services[s] = self._services.get(s, 0) + 1
+    self._first_time = event.logMonoTime if self._first_time is None else min(self._first_time, event.logMonoTime)
+    self._last_time = max(self._last_time, event.logMonoTime)
+
+    if self._size >= self.block_size:
+      self.flush()
+
+  def flush(self) -> None:
+    """Writes the buffered events as a block."""
+    if len(self._records) == 0:
+      return
+
+    raw = b''.join(self._records)
+    dat = _COMPRESS[self.compression](raw)
+    count = sum(self._services.values())
+    self.blocks.append(BlockIndex(self._f.tell(), self._first_time, self._last_time, self._services))
+    self._f.write(BLOCK_HEADER.pack(len(dat), len(raw), count, self._first_time, self._last_time))
+    self._f.write(dat)
+    self._f.flush()
+
+    self._records = []
+    self._size = 0
+    self._services = {}
+    self._first_time = None
+    self._last_time = 0
+
+  def close(self) -> None:
+    if self._f.closed:
+      return
+
+    self.flush()
+    index_offset = self._f.tell()
+    self._f.write(zlib.compress(json.dumps([b.to_dict() for b in self.blocks]).encode()))
+    self._f.write(INDEX_FOOTER.pack(index_offset, INDEX_MAGIC))
+    self._f.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+def is_indexed_log(f: BinaryIO) -> bool:
+  f.seek(0)
+  header = f.read(FILE_HEADER.size)
+  return len(header) == FILE_HEADER.size and FILE_HEADER.unpack(header)[0] == FILE_MAGIC
+
+
+def read_index(f: BinaryIO) -> Tuple[int, List[BlockIndex]]:
+  """Provides the compression and the block index of the segment in `f`. Scans the blocks when not indexed."""
+  f.seek(0)
+  magic, version, compression = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+  if magic != FILE_MAGIC or version > FILE_VERSION:
+    raise ValueError(f'Not an indexed log or unsupported version: {magic!r} {version}')
+
+  end = f.seek(0, 2)
+  if end >= FILE_HEADER.size + INDEX_FOOTER.size:
+    f.seek(end - INDEX_FOOTER.size)
+    index_offset, index_magic = INDEX_FOOTER.unpack(f.read(INDEX_FOOTER.size))
+    if index_magic == INDEX_MAGIC:
+      f.seek(index_offset)
+      index = json.loads(zlib.decompress(f.read(end - INDEX_FOOTER.size - index_offset)))
+      return compression, [BlockIndex(**b) for b in index]
+
+  # No index. Scan the blocks, dropping a truncated last one. Services are unknown until the block is read.
+  blocks = []
+  offset = FILE_HEADER.size
+  while offset + BLOCK_HEADER.size <= end:
+    f.seek(offset)
+    size, _, _, first_time, last_time = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+    if offset + BLOCK_HEADER.size + size > end:
+      break
+    blocks.append(BlockIndex(offset, first_time, last_time, None))
+    offset += BLOCK_HEADER.size + size
+  return compression, blocks
+
+
+def read_block(f: BinaryIO, compression: int, block: BlockIndex) -> bytes:
+  f.seek(block.offset)
+  size = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))[0]
+  return _DECOMPRESS[compression](f.read(size))
+
+
+def iter_records(f: BinaryIO, services: Optional[List[str]] = None, start_time: Optional[int] = None,
+                 end_time: Optional[int] = None) -> Iterator[Tuple[str, int, bytes]]:
+  """Yields (service, logMonoTime, serialized Event) of the events of `services` within [start_time, end_time] in
+  the segment in `f`, in write order. Events are not decoded."""
+  compression, blocks = read_index(f)
+  ids = None if services is None else {SERVICE_IDS[s] for s in services}
+  for block in blocks:
+    if not block.matches(services, start_time, end_time):
+      continue
+
+    raw = read_block(f, compression, block)
+    offset = 0
+    while offset < len(raw):
+      service, log_mono_time, size = RECORD_HEADER.unpack_from(raw, offset)
+      offset += RECORD_HEADER.size
+      if (ids is None or service in ids) and (start_time is None or log_mono_time >= start_time) and \
+         (end_time is None or log_mono_time <= end_time):
+        yield SERVICE_NAMES.get(service), log_mono_time, raw[offset:offset + size]
+      offset += size
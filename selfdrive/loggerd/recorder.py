@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Records the logged services into indexed log segments, see indexed_log.py.
+
+Segments are written like loggerd ones, to <ROOT>/<route>--<segment>/ as rlog.ilog with every message and qlog.ilog
+with the decimated services. Read them back with tools.lib.logreader.LogReader.
+
+  ./recorder.py --root /tmp/logs --services carState controlsState
+"""
+import os
+import time
+import argparse
+from typing import List, Optional
+
+import cereal.messaging as messaging
+from cereal.services import service_list
+from selfdrive.loggerd.config import ROOT, SEGMENT_LENGTH
+from selfdrive.loggerd.indexed_log import LogWriter
+
+RLOG_NAME = 'rlog.ilog'
+QLOG_NAME = 'qlog.ilog'
+
+
+class Recorder():
+  def __init__(self, root: str = ROOT, segment_length: float = SEGMENT_LENGTH, route_name: Optional[str] = None):
+    self.root = root
+    self.segment_length = segment_length
+    self.route_name = time.strftime('%Y-%m-%d--%H-%M-%S') if route_name is None else route_name
+    self.segment = -1
+    self.segment_start = 0.
+    self.rlog = None
+    self.qlog = None
+    self.qlog_counts = {}
+
+  @property
+  def segment_path(self) -> str:
+    return os.path.join(self.root, f'{self.route_name}--{self.segment}')
+
+  def rotate(self, cur_time: float) -> None:
+    self.close()
+    self.segment += 1
+    self.segment_start = cur_time
+    os.makedirs(self.segment_path, exist_ok=True)
+    self.rlog = LogWriter(os.path.join(self.segment_path, RLOG_NAME))
+    self.qlog = LogWriter(os.path.join(self.segment_path, QLOG_NAME))
+
+  def write(self, s: str, dat: bytes, cur_time: float) -> None:
+    if self.rlog is None or cur_time - self.segment_start >= self.segment_length:
+      self.rotate(cur_time)
+
+    self.rlog.write(dat)
+    decimation = service_list[s].decimation
+    if decimation is not None:
+      count = self.qlog_counts.get(s, 0)
+      if count % decimation == 0:
+        self.qlog.write(dat)
+      self.qlog_counts[s] = count + 1
+
+  def close(self) -> None:
+    for writer in [self.rlog, self.qlog]:
+      if writer is not None:
+        writer.close()
+    self.rlog, self.qlog = None, None
+
+
+def recorder_thread(services: List[str], root: str = ROOT, segment_length: float = SEGMENT_LENGTH):
+  poller = messaging.Poller()
+  socks = {messaging.sub_sock(s, poller=poller): s for s in services}
+  recorder = Recorder(root, segment_length)
+
+  try:
+    while True:
+      for sock in poller.poll(1000):
+        s = socks[sock]
+        cur_time = time.monotonic()
+        for dat in messaging.drain_sock_raw(sock):
+          recorder.write(s, dat, cur_time)
+  finally:
+    recorder.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Record the logged services into indexed log segments.')
+  parser.add_argument('--root', default=ROOT, help='directory to write the route segments to')
+  parser.add_argument('--services', nargs='+', help='services to record. All logged services by default')
+  parser.add_argument('--segment-length', type=float, default=SEGMENT_LENGTH, help='segment length in seconds')
+  args = parser.parse_args()
+
+  services = args.services
+  if services is None:
+    services = [s for s, v in service_list.items() if v.should_log]
+
+  try:
+    recorder_thread(services, args.root, args.segment_length)
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == "__main__":
+  main()
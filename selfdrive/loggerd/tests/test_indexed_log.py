@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import os
+import bz2
+import tempfile
+import unittest
+
+import cereal.messaging as messaging
+from selfdrive.loggerd.indexed_log import LogWriter, read_index
+from selfdrive.loggerd.recorder import Recorder, QLOG_NAME, RLOG_NAME
+from selfdrive.debug.benchmark_refs import drive
+from tools.lib.logreader import LogReader, MultiLogIterator
+from tools.lib.route import Route
+
+class TestIndexedLog(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.dats = drive()
+
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.tmp.name, RLOG_NAME)
+    with LogWriter(self.path, block_size=16 * 1024) as writer:
+      for dat in self.dats:
+        writer.write(dat)
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def test_round_trip(self):
+    msgs = list(LogReader(self.path))
+    self.assertEqual(len(msgs), len(self.dats))
+    self.assertEqual([m.as_builder().to_bytes() for m in msgs[:10]], self.dats[:10])
+
+  def test_service_and_time_filter(self):
+    msgs = list(LogReader(self.path, services=['radarState'], start_time=int(2e9), end_time=int(4e9)))
+    self.assertTrue(all(m.which() == 'radarState' and 2e9 <= m.logMonoTime <= 4e9 for m in msgs))
+    self.assertEqual(len(msgs), 41)
+
+  def test_not_indexed(self):
+    # A recorder killed mid write: no index and a truncated last block.
+    with open(self.path, 'rb') as f:
+      dat = f.read()
+    with open(self.path, 'wb') as f:
+      f.write(dat[:len(dat) // 2])
+
+    with open(self.path, 'rb') as f:
+      blocks = read_index(f)[1]
+    msgs = list(LogReader(self.path, services=['carState']))
+    self.assertTrue(all(b.services is None for b in blocks))
+    self.assertGreater(len(msgs), 0)
+    self.assertTrue(all(m.which() == 'carState' for m in msgs))
+
+  def test_legacy_log(self):
+    path = os.path.join(self.tmp.name, 'rlog.bz2')
+    with open(path, 'wb') as f:
+      f.write(bz2.compress(b''.join(self.dats[:100])))
+    car_states = [d for d in self.dats[:100] if messaging.LazyEvent(d).which() == 'carState']
+    self.assertEqual(len(list(LogReader(path))), 100)
+    self.assertEqual(len(list(LogReader(path, services=['carState']))), len(car_states))
+
+  def test_recorder_segments(self):
+    recorder = Recorder(self.tmp.name, segment_length=4., route_name='2021-01-01--00-00-00')
+    for dat in self.dats:
+      event = messaging.LazyEvent(dat)
+      recorder.write(event.which(), dat, event.logMonoTime * 1e-9)
+    recorder.close()
+
+    route = Route('2021-01-01--00-00-00', self.tmp.name)
+    self.assertEqual(len(route.log_paths()), 3)
+    self.assertTrue(all(p.endswith(RLOG_NAME) for p in route.log_paths()))
+    self.assertTrue(all(p.endswith(QLOG_NAME) for p in route.qlog_paths()))
+    self.assertEqual(len(list(MultiLogIterator(route.log_paths(), wraparound=False))), len(self.dats))
+    # carState is decimated by 10 on qlogs.
+    qlog_car_states = list(MultiLogIterator(route.qlog_paths(), wraparound=False, services=['carState']))
+    self.assertEqual(len(qlog_car_states), 100)
+
+  def test_single_service(self):
+    read_all = [m for m in LogReader(self.path) if m.which() == 'radarState']
+    read_service = list(LogReader(self.path, services=['radarState']))
+    self.assertEqual([m.logMonoTime for m in read_service], [m.logMonoTime for m in read_all])
+
+if __name__ == "__main__":
+  unittest.main()
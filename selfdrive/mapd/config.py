@@ -4,3 +4,16 @@ QUERY_RADIUS = 3000  # mts. Radius to use on OSM data queries.
 MIN_DISTANCE_FOR_NEW_QUERY = 1000  # mts. Minimum distance to query area edge before issuing a new query.
 FULL_STOP_MAX_SPEED = 1.39  # m/s Max speed for considering car is stopped.
 LOOK_AHEAD_HORIZON_TIME = 15.  # s. Time horizon for look ahead of turn speed sections to provide on liveMapData msg.
+PUBLISH_RATE = 10.  # Hz. liveMapData publish rate. Distances are dead reckoned with carState.vEgo between gps fixes.
+PREFETCH_HORIZON_TIME = 60.  # s. Prefetch map data when the need for a new query is predicted within this time.
+
+# Route matching config
+ROUTE_STRATEGY_FIX = 'fix'  # Locate the route from the current fix, rebuild it when locating fails.
+ROUTE_STRATEGY_HMM = 'hmm'  # Locate the route with an HMM map matcher over the last fixes.
+ROUTE_STRATEGY = ROUTE_STRATEGY_FIX
+MAP_MATCHING_WINDOW = 10  # Count of fixes kept by the HMM map matcher.
+
+# OSM tile cache config
+OSM_CACHE_TILE_SIZE = 0.005  # deg. Side of the square geographic tiles used to bucket cached OSM data.
+OSM_CACHE_MAX_SIZE = 200 * 1024 * 1024  # bytes. Disk budget for cached tiles. Least recently used tiles are evicted.
+OSM_CACHE_TTL = 30 * 24 * 60 * 60  # s. Age after which a cached tile is revalidated against the Overpass API.
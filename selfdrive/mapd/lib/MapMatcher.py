@@ -0,0 +1,107 @@
+from collections import deque
+
+
+_MIN_SIGMA = 5.  # mts. Minimum standard deviation of the gps fix location used on emission probabilities.
+_BEARING_SIGMA = 0.2  # Standard deviation of the sine of the bearing delta to way used on emission probabilities.
+_RANK_COST = 0.01  # Cost per highway rank unit. Slightly prefers main roads over small parallel roads.
+_TRANSITION_COST = 2.  # Cost to transition to a way connected to the previous one.
+_JUMP_COST = 12.  # Cost to transition to a non connected way or to reverse direction on the same way.
+
+
+class MapMatcher():
+  """Map matching of consecutive GPS fixes to the ways of a WayCollection using a Hidden Markov Model.
+
+  The hidden states are the way relations (with their driving direction) that can contain each fix. Emission costs
+  come from the distance and the bearing delta to the way, while transition costs follow the way topology in the
+  collection `wr_index`: staying on the same way is free, moving to a way sharing an edge node is cheap and any other
+  jump is expensive. The Viterbi scores are updated incrementally, so each fix costs O(candidates), and the decoded
+  path is available over a sliding window of the last fixes.
+  """
+  def __init__(self, way_collection, window=10):
+    """
+    Args:
+        way_collection (WayCollection): The collection to match fixes to.
+        window (int): The count of fixes to keep for decoding the matched path.
+    """
+    self.way_collection = way_collection
+    self._columns = deque(maxlen=window)  # On each column: way relation idx -> (score, previous idx, direction).
+    self._neighbours = {}
+    self._idxs = {id(wr): idx for idx, wr in enumerate(way_collection.way_relations)}
+
+  def reset(self):
+    self._columns.clear()
+
+  def _neighbour_idxs(self, idx):
+    """Provides the indexes of the way relations sharing an edge node with way relation at `idx`."""
+    neighbours = self._neighbours.get(idx)
+    if neighbours is None:
+      wr = self.way_collection.way_relations[idx]
+      neighbours = {self._idxs[id(other)] for node_id in wr.edge_nodes_ids
+                    for other in self.way_collection.wr_index[node_id]} - {idx}
+      self._neighbours[idx] = neighbours
+    return neighbours
+
+  def _emission_score(self, wr, accuracy):
+    sigma = max(accuracy / 2., _MIN_SIGMA)  # `accuracy` is 2 sigma.
+    return -0.5 * (wr.distance_to_way / sigma)**2 - 0.5 * (wr.active_bearing_delta / _BEARING_SIGMA)**2 - \
+      _RANK_COST * wr.highway_rank
+
+  def update(self, location_rad, bearing_rad, accuracy):
+    """Matches a new fix. Returns the way relation with the most likely path ending on it, updated to the fix,
+    or None when no way can contain the fix.
+    """
+    idxs = self.way_collection.update_candidates(location_rad, bearing_rad, accuracy)
+    way_relations = self.way_collection.way_relations
+    previous = self._columns[-1] if len(self._columns) > 0 else None
+    best_previous = max(previous.items(), key=lambda item: item[1][0]) if previous else None
+
+    column = {}
+    for idx in idxs:
+      wr = way_relations[idx]
+      if not wr.active or wr.is_prohibited:
+        continue
+
+      score = self._emission_score(wr, accuracy)
+      if previous is not None:
+        # Best of the jump from the most likely previous state, staying on the way or moving to a connected way.
+        transition_score, from_idx = best_previous[1][0] - _JUMP_COST, best_previous[0]
+        state = previous.get(idx)
+        if state is not None and state[2] == wr.direction and state[0] > transition_score:
+          transition_score, from_idx = state[0], idx
+        for n_idx in self._neighbour_idxs(idx):
+          state = previous.get(n_idx)
+          if state is not None and state[0] - _TRANSITION_COST > transition_score:
+            transition_score, from_idx = state[0] - _TRANSITION_COST, n_idx
+        score += transition_score
+      else:
+        from_idx = None
+
+      column[idx] = (score, from_idx, wr.direction)
+
+    # With no candidates the chain is broken, start over on next fix.
+    if len(column) == 0:
+      self.reset()
+      return None
+
+    # Normalize scores to keep them bounded.
+    max_score = max(state[0] for state in column.values())
+    column = {idx: (state[0] - max_score, state[1], state[2]) for idx, state in column.items()}
+    self._columns.append(column)
+
+    return way_relations[max(column.items(), key=lambda item: item[1][0])[0]]
+
+  def path(self):
+    """Provides the most likely sequence of way relations over the window of fixes, oldest first.
+    """
+    if len(self._columns) == 0:
+      return []
+
+    idx = max(self._columns[-1].items(), key=lambda item: item[1][0])[0]
+    path = []
+    for column in reversed(self._columns):
+      path.append(self.way_collection.way_relations[idx])
+      idx = column[idx][1]
+      if idx is None:
+        break
+
+    return path[::-1]
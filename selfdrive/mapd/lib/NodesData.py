@@ -25,7 +25,7 @@ def nodes_raw_data_array_for_wr(wr, drop_last=False):
   """Provides an array of raw node data (id, lat, lon, speed_limit) for all nodes in way relation
   """
   sl = wr.speed_limit if wr.speed_limit is not None else 0.
-  data = np.array(list(map(lambda n: (n.id, n.lat, n.lon, sl), wr.way.nodes)), dtype=float)
+  data = np.column_stack((wr.node_ids, wr.nodes_deg, np.full(len(wr.node_ids), sl))).astype(float)
 
   # reverse the order if way direction is backwards
   if wr.direction == DIRECTION.BACKWARD:
@@ -44,8 +44,12 @@ def node_calculations(points):
 
   # Get the vector representation of node points in cartesian plane.
   # (N-1, 2) array. Not including (0., 0.)
-  v = vectors(points) * R
+  return node_calculations_for_vectors(vectors(points) * R)
 
+
+def node_calculations_for_vectors(v):
+  """Provides node calculations based on the (N-1, 2) array of cartesian vectors between N consecutive nodes.
+  """
   # Calculate the vector magnitudes (or distance)
   # (N-1, 1) array. No distance for v[-1]
   d = np.linalg.norm(v, axis=1)
@@ -70,9 +74,8 @@ def node_calculations(points):
   return v, dp, dn, dr, b
 
 
-def spline_curvature_calculations(vect, dist_prev):
-  """Provides an array of curvatures and its distances by applying a spline interpolation
-  to the path described by the nodes data.
+def enhanced_vectors(vect, dist_prev):
+  """Provides the array of relative vectors with added nodes wherever the distance to the previous node is too long.
   """
   # We need to artificially enhance the data before applying spline interpolation to avoid getting
   # inexistent curvature values close to irregularities on the road when the resolution of nodes data
@@ -89,16 +92,21 @@ def spline_curvature_calculations(vect, dist_prev):
     vect = np.delete(vect, idx, axis=0)  # remove the relative vector to be replaced by the insertion of new vectors.
     vect = np.insert(vect, [idx] * n, [new_v] * n, axis=0)  # insert n new relative vectors
 
-  # Data is now enhanced, we can proceed with curvature evaluation.
-  # - Create cumulative arrays for distance traveled and vector (x, y)
-  ds = np.cumsum(dist_prev, axis=0)
+  return vect
+
+
+def spline_curvatures(vect, length):
+  """Provides an array of curvatures and its distances by applying a spline interpolation to the path described
+  by the (enhanced) relative vectors `vect` with a total `length`.
+  """
+  # - Create cumulative arrays for vector (x, y)
   vs = np.cumsum(vect, axis=0)
 
   # - spline interpolation
   tck, u = splprep([vs[:, 0], vs[:, 1]])
 
   # - evaluate every _SPLINE_EVAL_STEP mts.
-  n = max(int(ds[-1] / _SPLINE_EVAL_STEP), len(u))
+  n = max(int(length / _SPLINE_EVAL_STEP), len(u))
   unew = np.arange(0, n + 1) / n
 
   # - get derivatives
@@ -109,11 +117,48 @@ def spline_curvature_calculations(vect, dist_prev):
   num = d1[0] * d2[1] - d1[1] * d2[0]
   den = (d1[0]**2 + d1[1]**2)**(1.5)
   curv = num / den
-  curv_ds = unew * ds[-1]
+  curv_ds = unew * length
 
   return curv, curv_ds
 
 
+def spline_curvature_calculations(vect, dist_prev):
+  """Provides an array of curvatures and its distances by applying a spline interpolation
+  to the path described by the nodes data.
+  """
+  # Data is enhanced before proceeding with curvature evaluation.
+  vect = enhanced_vectors(vect, dist_prev)
+  ds = np.cumsum(dist_prev, axis=0)
+
+  return spline_curvatures(vect, ds[-1])
+
+
+class WayNodesCalculations():
+  """Calculations on the nodes of a way relation for a given direction of travel. They only depend on the way
+  geometry, hence they are memoized on the way relation and reused by every route including it.
+  """
+  def __init__(self, wr, direction):
+    points = np.radians(wr.nodes_deg)
+    points = points if direction != DIRECTION.BACKWARD else np.flip(points, axis=0)
+
+    # Vectors in cartesian plane between consecutive nodes in direction of travel. (N-1, 2)
+    self.vect = vectors(points) * R
+
+    # Relative vectors enhanced for spline evaluation, including origin.
+    self.enhanced_vect = enhanced_vectors(np.concatenate(([[0., 0.]], self.vect)),
+                                          np.concatenate(([0.], np.linalg.norm(self.vect, axis=1))))
+
+
+def way_nodes_calculations(wr):
+  """Provides the memoized WayNodesCalculations for the way relation on its current direction.
+  """
+  calculations = wr.nodes_calculations.get(wr.direction)
+  if calculations is None:
+    calculations = WayNodesCalculations(wr, wr.direction)
+    wr.nodes_calculations[wr.direction] = calculations
+  return calculations
+
+
 def speed_section(curv_sec):
   """Map curvature section data into turn speed sections data.
     Returns: [section start distance, section end distance, speed limit based on max curvature, sing of curvature]
@@ -248,6 +293,9 @@ class NodesData:
   """Container for the list of node data from a ordered list of way relations to be used in a Route
   """
   def __init__(self, way_relations, wr_index):
+    """Creates the node data for the route given by `way_relations`. The memoized vectors of each way relation are
+    concatenated, only the spline for curvatures is fitted on the whole route.
+    """
     self._nodes_data = np.array([])
     self._divertions = np.array([])
     self._curvature_speed_sections_data = np.array([])
@@ -266,13 +314,14 @@ class NodesData:
       wrs_data += (nodes_data,)
       nodes_data = np.concatenate(wrs_data)
 
-    # Get a subarray with lat, lon to compute the remaining node values.
-    lat_lon_array = nodes_data[:, [1, 2]]
-    points = np.radians(lat_lon_array)
     # Ensure we have more than 3 points, if not calculations are not possible.
-    if len(points) < 3:
+    if len(nodes_data) < 3:
       return
-    vect, dist_prev, dist_next, dist_route, bearing = node_calculations(points)
+
+    # The vectors between nodes of the route are the concatenation of the vectors on each way.
+    calculations = [way_nodes_calculations(wr) for wr in way_relations]
+    vect, dist_prev, dist_next, dist_route, bearing = \
+      node_calculations_for_vectors(np.concatenate([c.vect for c in calculations]))
 
     # append calculations to nodes_data
     # nodes_data structure: [id, lat, lon, speed_limit, x, y, dist_prev, dist_next, dist_route, bearing]
@@ -294,8 +343,10 @@ class NodesData:
 
     # Store calculcations for curvature sections speed limits. We need more than 3 points to be able to process.
     # _curvature_speed_sections_data structure: [dist_start, dist_stop, speed_limits, curv_sign]
+    # The enhanced vectors of the route are the ones of each way, as data is enhanced on each vector independently.
     if len(vect) > 3:
-      curv, curv_ds = spline_curvature_calculations(vect, dist_prev)
+      enhanced_vect = np.concatenate([calculations[0].enhanced_vect] + [c.enhanced_vect[1:] for c in calculations[1:]])
+      curv, curv_ds = spline_curvatures(enhanced_vect, dist_route[-1])
       self._curvature_speed_sections_data = speed_limits_for_curvatures_data(curv, curv_ds)
 
   @property
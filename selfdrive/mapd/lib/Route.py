@@ -24,6 +24,7 @@ class Route():
     """
     self.way_collection_id = way_collection_id
     self._ordered_way_relations = []
+    self._ordered_directions = []
     self._nodes_data = None
     self._reset()
 
@@ -41,7 +42,7 @@ class Route():
       ordered_way_ids.append(last_wr.id)
 
       # - Get the id of the node at the end of the way and then fetch the way relations that share the end node id.
-      last_node_id = last_wr.last_node.id
+      last_node_id = last_wr.last_node_id
       way_relations = wr_index[last_node_id]
 
       # - If no more way_relations than last_wr, we got to the end.
@@ -139,6 +140,10 @@ class Route():
       # - Select next way.
       last_wr = way_relations[best_idx]
 
+    # Keep the driving direction of each way relation on the route. Way relations are shared with the collection and
+    # their direction changes on location updates.
+    self._ordered_directions = [wr.direction for wr in self._ordered_way_relations]
+
     # Build the node data from the ordered list of way relations
     self._nodes_data = NodesData(self._ordered_way_relations, wr_index)
 
@@ -168,7 +173,7 @@ class Route():
     if current is None:
       return
 
-    node_ahead_id = current.node_ahead.id
+    node_ahead_id = current.node_ahead_id
     self._distance_to_node_ahead = current.distance_to_node_ahead
     start_idx = self._ahead_idx if self._ahead_idx is not None else 1
     self._ahead_idx = None
@@ -210,6 +215,7 @@ class Route():
 
       # We have now the current wr. Repopulate from here till the end and locate
       self._ordered_way_relations = self._ordered_way_relations[idx:]
+      self._ordered_directions = self._ordered_directions[idx:]
       self._reset()
       self._locate()
 
@@ -226,6 +232,47 @@ class Route():
     # if we got here, there is no new active way relation or driving direction has changed. Reset.
     self._reset()
 
+  def relocate(self, current):
+    """Locates the route on `current`, a way relation already updated to the current location by a map matcher.
+    Returns False when `current` is not on the route ahead with the same driving direction.
+    """
+    for idx, wr in enumerate(self._ordered_way_relations):
+      if wr is not current:
+        continue
+
+      if not wr.active or wr.direction != self._ordered_directions[idx]:
+        break
+
+      self._ordered_way_relations = self._ordered_way_relations[idx:]
+      self._ordered_directions = self._ordered_directions[idx:]
+      self._reset()
+      self._locate()
+      return self.located
+
+    self._reset()
+    return False
+
+  def advance(self, distance):
+    """Dead reckons the location on the route `distance` mts ahead of the current one, i.e. between gps fixes.
+    The route is no longer located when advancing past its end.
+    """
+    if not self.located or distance <= 0.:
+      return
+
+    dist_next = self._nodes_data.get(NodeDataIdx.dist_next)
+    ahead_idx = self._ahead_idx
+    distance_to_node_ahead = self._distance_to_node_ahead - distance
+    while distance_to_node_ahead < 0.:
+      if ahead_idx >= len(dist_next) - 1:
+        self._reset()
+        return
+      distance_to_node_ahead += dist_next[ahead_idx]
+      ahead_idx += 1
+
+    self._reset()
+    self._ahead_idx = ahead_idx
+    self._distance_to_node_ahead = distance_to_node_ahead
+
   @property
   def speed_limits_ahead(self):
     """Returns and array of SpeedLimitSection objects for the actual route ahead of current location
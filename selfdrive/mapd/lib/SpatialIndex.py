@@ -0,0 +1,44 @@
+import numpy as np
+from selfdrive.mapd.lib.geo import R
+
+
+_DEFAULT_CELL_SIZE = 200. / R  # 200 mts grid cells. (expressed in radians)
+
+
+class SpatialIndex():
+  """A uniform grid index over bounding boxes in [lat, lon] radians space. Each grid cell keeps the integer keys of
+  the items having a bounding box that overlaps the cell.
+  """
+  def __init__(self, cell_size=_DEFAULT_CELL_SIZE):
+    self.cell_size = cell_size
+    self._cells = {}
+
+  def _cell(self, point):
+    return tuple(np.floor(point / self.cell_size).astype(int))
+
+  def insert(self, key, bboxes):
+    """Adds the item identified by the integer `key` on every cell overlapped by `bboxes`.
+       `bboxes` is a (N, 2, 2) array of [[min_lat, min_lon], [max_lat, max_lon]] boxes in radians.
+    """
+    if len(bboxes) == 0:
+      return
+
+    min_cells = np.floor(bboxes[:, 0, :] / self.cell_size).astype(int)
+    max_cells = np.floor(bboxes[:, 1, :] / self.cell_size).astype(int)
+    cells = set()
+    for min_cell, max_cell in zip(min_cells, max_cells):
+      for i in range(min_cell[0], max_cell[0] + 1):
+        for j in range(min_cell[1], max_cell[1] + 1):
+          cells.add((i, j))
+
+    for cell in cells:
+      self._cells.setdefault(cell, []).append(key)
+
+  def query(self, point):
+    """Returns the sorted list of keys for the items with a bounding box overlapping the cell containing `point`.
+    """
+    return sorted(self._cells.get(self._cell(point), []))
+
+  @property
+  def cell_count(self):
+    return len(self._cells)
@@ -1,5 +1,10 @@
 from selfdrive.mapd.lib.dp_way_relation import DPWayRelation as WayRelation
 from selfdrive.mapd.lib.dp_route import DPRoute as Route
+from selfdrive.mapd.lib.WayRelation import WayRelationBatch
+from selfdrive.mapd.lib.SpatialIndex import SpatialIndex
+from selfdrive.mapd.lib.WayStore import WayStore
+from selfdrive.mapd.lib.MapMatcher import MapMatcher
+from selfdrive.mapd.config import MAP_MATCHING_WINDOW
 import uuid
 
 
@@ -9,15 +14,23 @@ _ACCEPTABLE_BEARING_DELTA_IND = 0.7071067811865475  # sin(pi/4) | 45 degrees acc
 class WayCollection():
   """A collection of WayRelations to use for maps data analysis.
   """
-  def __init__(self, ways, query_center):
+  def __init__(self, ways, query_center, use_spatial_index=True, vectorized=True):
     """Creates a WayCollection with a set of OSM way objects.
 
     Args:
         ways (Array): Collection of Way objects fetched from OSM in a radius around `query_center`
         query_center (Numpy Array): [lat, lon] numpy array in radians indicating the center of the data query.
+        use_spatial_index (Bool): Locate the current way only among the ways with segments close to the location.
+          When False, all ways in the collection are updated on every location.
+        vectorized (Bool): Update the candidate ways in a single vectorized pass over the packed nodes of the
+          collection. When False, each way relation is updated independently.
     """
     self.id = uuid.uuid4()
-    self.way_relations = [WayRelation(way) for way in ways]
+
+    # Import the OSM ways into a compact store. The way relations only reference the store, so the overpy objects
+    # can be released.
+    self.store = WayStore(ways)
+    self.way_relations = [WayRelation(self.store, idx) for idx in range(len(self.store))]
     self.query_center = query_center
 
     # Create the index by edge node ids.
@@ -26,19 +39,56 @@ class WayCollection():
       for node_id in wr.edge_nodes_ids:
         self.wr_index[node_id] = self.wr_index.get(node_id, []) + [wr]
 
+    # Create the spatial index of way relations by the bounding boxes of their segments.
+    self.spatial_index = None
+    if use_spatial_index:
+      self.spatial_index = SpatialIndex()
+      for idx, wr in enumerate(self.way_relations):
+        self.spatial_index.insert(idx, wr.segment_bboxes)
+
+    # Pack the nodes of all way relations for vectorized updates.
+    self._batch = WayRelationBatch(self.way_relations) if vectorized else None
+
+    # Map matcher keeping the state of the HMM over the last fixes for `get_matched_route`.
+    self.map_matcher = MapMatcher(self, MAP_MATCHING_WINDOW)
+
+  def candidate_idxs(self, location_rad):
+    """Provides the indexes of the way relations that could contain `location_rad`, in collection order.
+    """
+    if self.spatial_index is None:
+      return list(range(len(self.way_relations)))
+
+    return self.spatial_index.query(location_rad)
+
+  def candidate_way_relations(self, location_rad):
+    """Provides the way relations that could contain `location_rad`, in collection order.
+    """
+    return [self.way_relations[idx] for idx in self.candidate_idxs(location_rad)]
+
+  def update_candidates(self, location_rad, bearing_rad, accuracy):
+    """Updates the candidate way relations in collection to the provided location and bearing. Ways with no segment
+    close to the location can not be matched and are left untouched. Returns the indexes of the candidates.
+    """
+    idxs = self.candidate_idxs(location_rad)
+    if self._batch is not None:
+      self._batch.update(idxs, location_rad, bearing_rad, accuracy)
+    else:
+      for idx in idxs:
+        self.way_relations[idx].update(location_rad, bearing_rad, accuracy)
+
+    return idxs
+
   def get_route(self, location_rad, bearing_rad, accuracy):
     """Provides the best route found in the way collection based on current location and bearing.
     """
     if location_rad is None or bearing_rad is None or accuracy is None:
       return None
 
-    # Update all way relations in collection to the provided location and bearing.
-    for wr in self.way_relations:
-      wr.update(location_rad, bearing_rad, accuracy)
+    candidates = [self.way_relations[idx] for idx in self.update_candidates(location_rad, bearing_rad, accuracy)]
 
     # Get the way relations where a match was found. i.e. those now marked as active as long as the direction of
     # travel is valid.
-    valid_way_relations = [wr for wr in self.way_relations if wr.active and not wr.is_prohibited]
+    valid_way_relations = [wr for wr in candidates if wr.active and not wr.is_prohibited]
 
     # If no active, then we could not find a current way to build a route.
     if len(valid_way_relations) == 0:
@@ -83,3 +133,19 @@ class WayCollection():
           current = wr_accurate_distance[0]
 
     return Route(current, self.wr_index, self.id, self.query_center)
+
+  def get_matched_route(self, route, location_rad, bearing_rad, accuracy):
+    """Provides the route for the current location and bearing using the way matched by the HMM map matcher over the
+    last fixes. `route` is reused when it continues on the matched way, otherwise a new route is built.
+    """
+    if location_rad is None or bearing_rad is None or accuracy is None:
+      return None
+
+    current = self.map_matcher.update(location_rad, bearing_rad, accuracy)
+    if current is None:
+      return None
+
+    if route is not None and route.way_collection_id == self.id and route.relocate(current):
+      return route
+
+    return Route(current, self.wr_index, self.id, self.query_center)
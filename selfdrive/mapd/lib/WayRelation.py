@@ -43,17 +43,62 @@ _HIGHWAY_RANK = {
 }
 
 
-def is_osm_time_condition_active(condition_string):
+_MINUTES_PER_DAY = 24 * 60
+_PARSE_CACHE_MAX_SIZE = 4096  # Max count of tag strings kept on each parse cache.
+
+# Parse caches keyed by tag string. Tag strings are interned by the WayStore, so the hashes are cached as well.
+_limit_cache = {}
+_schedule_cache = {}
+_conditional_limit_cache = {}
+
+
+def _cached(cache, key, parse):
+  value = cache.get(key)
+  if value is None:
+    if len(cache) >= _PARSE_CACHE_MAX_SIZE:
+      cache.clear()
+    value = cache[key] = parse(key)
+  return value
+
+
+def minute_of_week(time):
+  """Provides the integer minute of week, starting monday at 00:00, for a datetime."""
+  return time.weekday() * _MINUTES_PER_DAY + time.hour * 60 + time.minute
+
+
+def current_minute_of_week():
+  return minute_of_week(dt.now().astimezone())
+
+
+class Schedule():
+  """A set of minute of week intervals, with inclusive boundaries, during which a condition is active.
   """
-  Will indicate if a time condition for a restriction as described
+  def __init__(self, intervals):
+    self.intervals = tuple(intervals)
+
+  def __or__(self, other):
+    return Schedule(self.intervals + other.intervals)
+
+  def is_active(self, minute):
+    for start, end in self.intervals:
+      if start <= minute <= end:
+        return True
+    return False
+
+
+def _minutes(time_string):
+  h, m = time_string.split(':')
+  return int(h) * 60 + int(m)
+
+
+def _parse_time_condition(condition_string):
+  """Compiles a time condition for a restriction as described
   @ https://wiki.openstreetmap.org/wiki/Conditional_restrictions
-  is active for the current date and time of day.
+  into a `Schedule`.
   """
-  now = dt.now().astimezone()
-  today = now.date()
   week_days = []
 
-  # Look for days of week matched and validate if today matches criteria.
+  # Look for days of week matched.
   dr = re.findall(r'(Mo|Tu|We|Th|Fr|Sa|Su[-,\s]*?)', condition_string)
 
   if len(dr) == 1:
@@ -62,25 +107,34 @@ def is_osm_time_condition_active(condition_string):
   elif len(dr) > 1:
     week_days = list(range(_WD[dr[0]], _WD[dr[1]] + 1))
 
-  # If valid week days list is not empy and today day is not in the list, then the time-date range is not active.
-  if len(week_days) > 0 and now.weekday() not in week_days:
-    return False
+  # An empty week days list does not restrict the days.
+  if len(week_days) == 0:
+    week_days = list(range(7))
 
   # Look for time ranges on the day. No time range, means all day
   tr = re.findall(r'([0-9]{1,2}:[0-9]{2})\s*?-\s*?([0-9]{1,2}:[0-9]{2})', condition_string)
 
   # if no time range but there were week days set, consider it active during the whole day
   if len(tr) == 0:
-    return len(dr) > 0
+    return Schedule([(d * _MINUTES_PER_DAY, (d + 1) * _MINUTES_PER_DAY - 1) for d in week_days] if len(dr) > 0
+                    else [])
+
+  ranges = [(_minutes(t0), _minutes(t1)) for t0, t1 in tr]
+  return Schedule([(d * _MINUTES_PER_DAY + t0, d * _MINUTES_PER_DAY + t1) for d in week_days for t0, t1 in ranges
+                   if t0 <= t1])
 
-  # Search among time ranges matched, one where now time belongs too. If found range is active.
-  for times_tup in tr:
-    times = list(map(lambda tt: dt.
-                 combine(today, dt.strptime(tt, '%H:%M').time().replace(tzinfo=now.tzinfo)), times_tup))
-    if now >= times[0] and now <= times[1]:
-      return True
 
-  return False
+def time_condition_schedule(condition_string):
+  return _cached(_schedule_cache, condition_string, _parse_time_condition)
+
+
+def is_osm_time_condition_active(condition_string):
+  """
+  Will indicate if a time condition for a restriction as described
+  @ https://wiki.openstreetmap.org/wiki/Conditional_restrictions
+  is active for the current date and time of day.
+  """
+  return time_condition_schedule(condition_string).is_active(current_minute_of_week())
 
 
 def speed_limit_value_for_limit_string(limit_string):
@@ -92,12 +146,7 @@ def speed_limit_value_for_limit_string(limit_string):
   return conv * float(v[1])
 
 
-def speed_limit_for_osm_tag_limit_string(limit_string):
-  # https://wiki.openstreetmap.org/wiki/Key:maxspeed
-  if limit_string is None:
-    # When limit is set to 0. is considered not existing.
-    return 0.
-
+def _parse_speed_limit(limit_string):
   # Attempt to parse limit as simple numeric value considering units.
   limit = speed_limit_value_for_limit_string(limit_string)
   if limit is not None:
@@ -117,50 +166,92 @@ def speed_limit_for_osm_tag_limit_string(limit_string):
   return limit if limit is not None else 0.
 
 
-def conditional_speed_limit_for_osm_tag_limit_string(limit_string):
+def speed_limit_for_osm_tag_limit_string(limit_string):
+  # https://wiki.openstreetmap.org/wiki/Key:maxspeed
   if limit_string is None:
     # When limit is set to 0. is considered not existing.
     return 0.
 
+  return _cached(_limit_cache, limit_string, _parse_speed_limit)
+
+
+class ConditionalSpeedLimit():
+  """A speed limit `value` applying during a `Schedule`."""
+  def __init__(self, value, schedule):
+    self.value = value
+    self.schedule = schedule
+
+  def limit_at(self, minute):
+    return self.value if self.schedule.is_active(minute) else 0.
+
+
+_NO_CONDITIONAL_LIMIT = ConditionalSpeedLimit(0., Schedule([]))
+
+
+def _compile_conditional_speed_limit(limit_string):
   # Look for matches of the `<restriction-value> @ (<condition>)` format
   v = re.match(r'^(.*)@\s*\((.*)\).*$', limit_string)
   if v is None:
-    return 0.  # No valid format match
+    return _NO_CONDITIONAL_LIMIT  # No valid format match
 
   value = speed_limit_for_osm_tag_limit_string(v[1])
   if value == 0.:
-    return 0.  # Invalid speed limit value
+    return _NO_CONDITIONAL_LIMIT  # Invalid speed limit value
 
-  # Look for date-time conditions separated by semicolon
-  v = re.findall(r'(?:;|^)([^;]*)', v[2])
-  for datetime_condition in v:
-    if is_osm_time_condition_active(datetime_condition):
-      return value
+  # Look for date-time conditions separated by semicolon, the limit applies while any of them is active.
+  schedule = Schedule([])
+  for datetime_condition in re.findall(r'(?:;|^)([^;]*)', v[2]):
+    schedule = schedule | time_condition_schedule(datetime_condition)
 
-  # If we get here, no current date-time conditon is active.
-  return 0.
+  return ConditionalSpeedLimit(value, schedule)
+
+
+def parse_conditional_speed_limit(limit_string):
+  """Provides the (cached) `ConditionalSpeedLimit` for a conditional limit tag string."""
+  if limit_string is None:
+    return _NO_CONDITIONAL_LIMIT
+
+  return _cached(_conditional_limit_cache, limit_string, _compile_conditional_speed_limit)
+
+
+def conditional_speed_limit_for_osm_tag_limit_string(limit_string):
+  conditional_limit = parse_conditional_speed_limit(limit_string)
+  if conditional_limit is _NO_CONDITIONAL_LIMIT:
+    # When limit is set to 0. is considered not existing.
+    return 0.
+
+  return conditional_limit.limit_at(current_minute_of_week())
 
 
 class WayRelation():
   """A class that represent the relationship of an OSM way and a given `location` and `bearing` of a driving vehicle.
   """
-  def __init__(self, way):
-    self.way = way
+  def __init__(self, store, idx):
+    """Creates the relationship for the way at `idx` of a WayStore. Node data are views on the store arrays.
+    """
+    self.id = int(store.way_ids[idx])
+    self.tags = store.way_tags(idx)
     self.reset_location_variables()
     self.direction = DIRECTION.NONE
-    self._speed_limit = None
-    self._one_way = way.tags.get("oneway")
-    self.name = way.tags.get('name')
-    self.ref = way.tags.get('ref')
-    self.highway_type = way.tags.get("highway")
+    self._speed_limits = {}  # direction -> (ConditionalSpeedLimit, speed limit). Tags are only parsed once.
+    self._one_way = self.tags.get("oneway")
+    self.name = self.tags.get('name')
+    self.ref = self.tags.get('ref')
+    self.highway_type = self.tags.get("highway")
     self.highway_rank = _HIGHWAY_RANK.get(self.highway_type)
     try:
-      self.lanes = int(way.tags.get('lanes'))
+      self.lanes = int(self.tags.get('lanes'))
     except Exception:
       self.lanes = 2
 
-    # Create a numpy array with nodes data to support calculations.
-    self._nodes_np = np.radians(np.array([[nd.lat, nd.lon] for nd in way.nodes], dtype=float))
+    # Node ids, and node coordinates in degrees and in radians as numpy arrays to support calculations.
+    nodes_slice = store.way_slice(idx)
+    self.node_ids = store.node_ids[nodes_slice]
+    self.nodes_deg = store.nodes_deg[nodes_slice]
+    self._nodes_np = store.nodes_rad[nodes_slice]
+
+    # Memoized calculations on the way nodes by direction of travel. See `NodesData.way_nodes_calculations`.
+    self.nodes_calculations = {}
 
     # Get the vectors representation of the segments betwheen consecutive nodes. (N-1, 2)
     v = vectors(self._nodes_np) * R
@@ -177,7 +268,15 @@ class WayRelation():
                               np.amax(self._nodes_np, 0) + _WAY_BBOX_PADING))
 
     # Get the edge nodes ids.
-    self.edge_nodes_ids = [way.nodes[0].id, way.nodes[-1].id]
+    self.edge_nodes_ids = [int(self.node_ids[0]), int(self.node_ids[-1])]
+
+  @property
+  def segment_bboxes(self):
+    """Provides the padded bounding boxes for every segment of the way. (N-1, 2, 2)
+       [[min_lat, min_lon], [max_lat, max_lon]] for each segment between consecutive nodes.
+    """
+    start, end = self._nodes_np[:-1], self._nodes_np[1:]
+    return np.stack((np.minimum(start, end) - _WAY_BBOX_PADING, np.maximum(start, end) + _WAY_BBOX_PADING), axis=1)
 
   def __repr__(self):
     return f'(id: {self.id}, between {self.behind_idx} and {self.ahead_idx}, {self.direction}, active: {self.active})'
@@ -198,10 +297,6 @@ class WayRelation():
     self._active_bearing_delta = None
     self._distance_to_way = None
 
-  @property
-  def id(self):
-    return self.way.id
-
   def update(self, location_rad, bearing_rad, location_accuracy):
     """Will update and validate the associated way with a given `location_rad` and `bearing_rad`.
        Specifically it will find the nodes behind and ahead of the current location and bearing.
@@ -256,12 +351,21 @@ class WayRelation():
     min_h_possible_idx = np.argmin(h_possible)
     min_delta_idx = possible_idxs[min_h_possible_idx]
 
+    self.set_location(location_rad, bearing_rad, location_accuracy, min_delta_idx, is_ahead[min_delta_idx],
+                      h[min_delta_idx], abs_sin_bw_delta_possible[min_h_possible_idx], distances)
+
+  def set_location(self, location_rad, bearing_rad, location_accuracy, min_delta_idx, min_delta_is_ahead,
+                   distance_to_way, active_bearing_delta, distances):
+    """Populates the location variables once the way section where the location is has been found.
+       `min_delta_idx` is the index of the node starting the section, `distance_to_way` the height of the
+       triangle formed by the location and the section nodes and `distances` the distances to all nodes in the way.
+    """
     # - If the distance to the road is greater than the accuracy + half the maximum road width estimate then we
     # are most likely diverting from this route.
-    diverting = h_possible[min_h_possible_idx] > location_accuracy + self.lanes * _LANE_WIDTH / 2.
+    diverting = distance_to_way > location_accuracy + self.lanes * _LANE_WIDTH / 2.
 
     # Populate location variables with result
-    if is_ahead[min_delta_idx]:
+    if min_delta_is_ahead:
       self.direction = DIRECTION.BACKWARD
       self.ahead_idx = min_delta_idx
       self.behind_idx = min_delta_idx + 1
@@ -270,8 +374,8 @@ class WayRelation():
       self.ahead_idx = min_delta_idx + 1
       self.behind_idx = min_delta_idx
 
-    self._distance_to_way = h[min_delta_idx]
-    self._active_bearing_delta = abs_sin_bw_delta_possible[min_h_possible_idx]
+    self._distance_to_way = distance_to_way
+    self._active_bearing_delta = active_bearing_delta
     # TODO: The distance to node ahead currently represent the distance from the GPS fix location.
     # It would be perhaps more accurate to use the distance on the projection over the direct line between
     # the two nodes.
@@ -280,10 +384,8 @@ class WayRelation():
     self.diverting = diverting
     self.location_rad = location_rad
     self.bearing_rad = bearing_rad
-    self._speed_limit = None
 
   def update_direction_from_starting_node(self, start_node_id):
-    self._speed_limit = None
     if self.edge_nodes_ids[0] == start_node_id:
       self.direction = DIRECTION.FORWARD
     elif self.edge_nodes_ids[-1] == start_node_id:
@@ -300,34 +402,44 @@ class WayRelation():
 
     return np.all(np.concatenate((is_g, is_l)))
 
-  @property
-  def speed_limit(self):
-    if self._speed_limit is not None:
-      return self._speed_limit
+  def _direction_speed_limits(self):
+    """Provides the parsed conditional limit and regular limit for the current direction.
+    """
+    limits = self._speed_limits.get(self.direction)
+    if limits is not None:
+      return limits
 
     # Get string from corresponding tag, consider conditional limits first.
-    limit_string = self.way.tags.get("maxspeed:conditional")
+    limit_string = self.tags.get("maxspeed:conditional")
     if limit_string is None:
       if self.direction == DIRECTION.FORWARD:
-        limit_string = self.way.tags.get("maxspeed:forward:conditional")
+        limit_string = self.tags.get("maxspeed:forward:conditional")
       elif self.direction == DIRECTION.BACKWARD:
-        limit_string = self.way.tags.get("maxspeed:backward:conditional")
+        limit_string = self.tags.get("maxspeed:backward:conditional")
 
-    limit = conditional_speed_limit_for_osm_tag_limit_string(limit_string)
+    conditional_limit = parse_conditional_speed_limit(limit_string)
 
-    # When no conditional limit set, attempt to get from regular speed limit tags.
-    if limit == 0.:
-      limit_string = self.way.tags.get("maxspeed")
-      if limit_string is None:
-        if self.direction == DIRECTION.FORWARD:
-          limit_string = self.way.tags.get("maxspeed:forward")
-        elif self.direction == DIRECTION.BACKWARD:
-          limit_string = self.way.tags.get("maxspeed:backward")
+    # Regular speed limit tags apply when no conditional limit is active.
+    limit_string = self.tags.get("maxspeed")
+    if limit_string is None:
+      if self.direction == DIRECTION.FORWARD:
+        limit_string = self.tags.get("maxspeed:forward")
+      elif self.direction == DIRECTION.BACKWARD:
+        limit_string = self.tags.get("maxspeed:backward")
+
+    limits = (conditional_limit, speed_limit_for_osm_tag_limit_string(limit_string))
+    self._speed_limits[self.direction] = limits
+    return limits
 
-      limit = speed_limit_for_osm_tag_limit_string(limit_string)
+  @property
+  def speed_limit(self):
+    conditional_limit, limit = self._direction_speed_limits()
+    if conditional_limit.value > 0.:
+      value = conditional_limit.limit_at(current_minute_of_week())
+      if value > 0.:
+        return value
 
-    self._speed_limit = limit
-    return self._speed_limit
+    return limit
 
   @property
   def active_bearing_delta(self):
@@ -351,17 +463,17 @@ class WayRelation():
     return self._distance_to_way
 
   @property
-  def node_ahead(self):
-    return self.way.nodes[self.ahead_idx] if self.ahead_idx is not None else None
+  def node_ahead_id(self):
+    return int(self.node_ids[self.ahead_idx]) if self.ahead_idx is not None else None
 
   @property
-  def last_node(self):
-    """Returns the last node on the way considering the traveling direction
+  def last_node_id(self):
+    """Returns the id of the last node on the way considering the traveling direction
     """
     if self.direction == DIRECTION.FORWARD:
-      return self.way.nodes[-1]
+      return self.edge_nodes_ids[-1]
     if self.direction == DIRECTION.BACKWARD:
-      return self.way.nodes[0]
+      return self.edge_nodes_ids[0]
     return None
 
   @property
@@ -384,3 +496,85 @@ class WayRelation():
       return self._nodes_np[-2]
 
     return np.array([0., 0.])
+
+
+class WayRelationBatch():
+  """A packed representation of the nodes of a list of WayRelations to update their relationship with a given
+  `location` and `bearing` in a single vectorized pass. Results are identical to calling `WayRelation.update` on
+  each of the way relations.
+  """
+  def __init__(self, way_relations):
+    self.way_relations = way_relations
+
+    # All nodes in one contiguous array, with the nodes of way relation `i` in `offsets[i]:offsets[i + 1]`.
+    # Segments are indexed by their starting node, the last node of each way does not start a segment.
+    counts = np.array([len(wr._nodes_np) for wr in way_relations], dtype=int)
+    self.offsets = np.concatenate(([0], np.cumsum(counts)))
+    self.nodes_np = np.concatenate([wr._nodes_np for wr in way_relations]) if len(way_relations) else np.zeros((0, 2))
+    self.way_distances = np.zeros(len(self.nodes_np))
+    self.way_bearings = np.zeros(len(self.nodes_np))
+    for wr, start in zip(way_relations, self.offsets[:-1]):
+      self.way_distances[start:start + len(wr._way_distances)] = wr._way_distances
+      self.way_bearings[start:start + len(wr._way_bearings)] = wr._way_bearings
+
+    self.bboxes = np.array([wr.bbox for wr in way_relations]).reshape(-1, 2, 2)
+
+  def update(self, idxs, location_rad, bearing_rad, location_accuracy):
+    """Updates the way relations with indexes `idxs` (in ascending order) to the given `location_rad` and
+    `bearing_rad`. Way relations not in `idxs` are left untouched.
+    """
+    idxs = np.asarray(idxs, dtype=int)
+    for idx in idxs:
+      self.way_relations[idx].reset_location_variables()
+
+    # Ignore way relations where location is not in bounding box.
+    bboxes = self.bboxes[idxs]
+    in_bbox = np.all(np.logical_and(location_rad >= bboxes[:, 0, :], location_rad <= bboxes[:, 1, :]), axis=1)
+    idxs = idxs[in_bbox]
+    if len(idxs) == 0:
+      return
+
+    # Gather the nodes of the way relations to update. `group` holds the position in `idxs` for each gathered node
+    # and `starts` the position of the first node of every way relation in the gathered arrays.
+    counts = self.offsets[idxs + 1] - self.offsets[idxs]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    group = np.repeat(np.arange(len(idxs)), counts)
+    node_idxs = np.arange(len(group)) - starts[group] + self.offsets[idxs][group]
+    nodes = self.nodes_np[node_idxs]
+
+    # - Get the distance and bearings from location to all nodes. (N)
+    bearings = bearing_to_points(location_rad, nodes)
+    distances = distance_to_points(location_rad, nodes)
+
+    # - Nodes are ahead if the cosine of the delta is positive (N)
+    is_ahead = np.cos(np.abs(bearing_rad - bearings)) >= 0.
+
+    # - Segments are the consecutive pairs of gathered nodes within the same way relation. (S)
+    seg = np.nonzero(group[:-1] == group[1:])[0]
+    seg_group = group[seg]
+
+    # - Possible locations are the segments where nodes change from ahead to behind or viceversa.
+    possible = is_ahead[seg] != is_ahead[seg + 1]
+
+    # - Triangle height (distance to way) and bearing delta indicator for each segment. See `WayRelation.update`.
+    way_distances = self.way_distances[node_idxs[seg]]
+    h = distances[seg] * distances[seg + 1] * np.abs(np.sin(bearings[seg + 1] - bearings[seg])) / way_distances
+    abs_sin_bw_delta = np.abs(np.sin(self.way_bearings[node_idxs[seg]] - bearing_rad))
+
+    # - Pick for every way relation the possible segment with minimum distance to the way. The stable sort keeps
+    # the first segment on ties, matching `np.argmin`.
+    possible_seg = np.nonzero(possible)[0]
+    if len(possible_seg) == 0:
+      return
+
+    order = possible_seg[np.lexsort((h[possible_seg], seg_group[possible_seg]))]
+    first = np.concatenate(([True], seg_group[order][1:] != seg_group[order][:-1]))
+    chosen = order[first]
+
+    # Populate the location variables of the located way relations.
+    for s in chosen:
+      g = seg_group[s]
+      start = starts[g]
+      wr = self.way_relations[idxs[g]]
+      wr.set_location(location_rad, bearing_rad, location_accuracy, seg[s] - start, is_ahead[seg[s]], h[s],
+                      abs_sin_bw_delta[s], distances[start:start + counts[g]])
@@ -0,0 +1,61 @@
+import sys
+import numpy as np
+
+
+class WayStore():
+  """Compact array backed storage for the ways fetched from OSM. It replaces the overpy object graph (Way, Node and
+  tag dict objects) with flat arrays so the query result can be released after import.
+
+  The nodes of way `i` are stored in `offsets[i]:offsets[i + 1]` of the node arrays. Tag dictionaries are interned,
+  so ways with identical tags share a single dictionary and all tag strings are shared.
+  """
+  def __init__(self, ways):
+    way_ids = []
+    counts = []
+    node_ids = []
+    coords = []
+    tag_idxs = []
+    self._tags = []
+    tags_index = {}
+
+    for way in ways:
+      nodes = way.nodes
+      way_ids.append(way.id)
+      counts.append(len(nodes))
+      for nd in nodes:
+        node_ids.append(nd.id)
+        coords.append((nd.lat, nd.lon))
+
+      tags = {sys.intern(k): sys.intern(v) for k, v in way.tags.items()}
+      key = frozenset(tags.items())
+      if key not in tags_index:
+        tags_index[key] = len(self._tags)
+        self._tags.append(tags)
+      tag_idxs.append(tags_index[key])
+
+    self.way_ids = np.array(way_ids, dtype=np.int64)
+    self.offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    self.node_ids = np.array(node_ids, dtype=np.int64)
+    self.nodes_deg = np.array(coords, dtype=np.float64).reshape(-1, 2)
+    self.nodes_rad = np.radians(self.nodes_deg)
+    self.tag_idxs = np.array(tag_idxs, dtype=np.int32)
+
+  def __len__(self):
+    return len(self.way_ids)
+
+  @property
+  def nbytes(self):
+    """Approximate memory used by the arrays in the store, not including the tag tables.
+    """
+    return sum(a.nbytes for a in [self.way_ids, self.offsets, self.node_ids, self.nodes_deg, self.nodes_rad,
+                                  self.tag_idxs])
+
+  def way_slice(self, idx):
+    """Provides the slice on the node arrays for the nodes of way at `idx`.
+    """
+    return slice(self.offsets[idx], self.offsets[idx + 1])
+
+  def way_tags(self, idx):
+    """Provides the (shared) tags dictionary for way at `idx`. It must not be modified.
+    """
+    return self._tags[self.tag_idxs[idx]]
@@ -0,0 +1,74 @@
+"""Reference implementations of optimized mapd code paths and the mock drives they are compared on. Shared by the
+unit tests and selfdrive/debug/benchmark.py."""
+import numpy as np
+from selfdrive.mapd.lib.geo import R
+from selfdrive.mapd.lib.mock_data import MockOSM, MockRoad
+from selfdrive.mapd.lib.WayCollection import WayCollection
+
+GRID_CENTER = [52.2, 13.87]
+STREET_GRID_SIZE = 11
+STREET_GRID_SPACING = 100.
+
+
+def fixes_along_grid_street(size, spacing, count=20):
+  """Provides a list of (location_rad, bearing_rad) fixes driving east on a street crossing the grid center.
+  """
+  lat_step = np.degrees(spacing / R)
+  lon_step = lat_step / np.cos(np.radians(GRID_CENTER[0]))
+  lat = GRID_CENTER[0] - lat_step * (size - 1) / 2. + lat_step * (size // 2) + np.degrees(2. / R)  # 2 mts off way.
+  lons = GRID_CENTER[1] + np.linspace(-0.25, 0.25, count) * lon_step * (size - 1)
+  return [(np.radians(np.array([lat, lon])), np.radians(90.)) for lon in lons]
+
+
+def fork_way_collection():
+  """Provides the way collection of MockRoad.road1 split in ways of 8 nodes, with a fork leaving on node 42 and
+  rejoining on node 63, and the road points.
+  """
+  points = MockRoad.road1_points_grad
+  fork_points = np.row_stack((points[42], np.linspace(points[42], points[63], 12)[1:-1] + 0.0005, points[63]))
+  fork_node_ids = [1000042] + [4000000 + i for i in range(10)] + [1000063]
+  ways = MockOSM.road_ways(points, nodes_per_way=8) + \
+    MockOSM.road_ways(fork_points, nodes_per_way=12, first_way_id=4000000, node_ids=fork_node_ids,
+                      tags={'highway': 'tertiary', 'name': 'Fork'})
+  return WayCollection(ways, np.radians(points[40])), points
+
+
+def street_points(row):
+  """Provides the [lat, lon] points in degrees of the ends of street `row` of the street grid, driving east."""
+  lat_step = np.degrees(STREET_GRID_SPACING / R)
+  lon_step = lat_step / np.cos(np.radians(GRID_CENTER[0]))
+  lat = GRID_CENTER[0] + lat_step * (row - (STREET_GRID_SIZE - 1) / 2.)
+  half_length = lon_step * (STREET_GRID_SIZE - 2) / 2.
+  return [[lat, GRID_CENTER[1] - half_length], [lat, GRID_CENTER[1] + half_length]]
+
+
+def noisy_street_fixes():
+  """Provides poor accuracy fixes along the center street of the street grid."""
+  fixes = []
+  for seed in range(3):
+    fixes += MockOSM.fixes_along(street_points(STREET_GRID_SIZE // 2), 150, noise=10., seed=seed)
+  return fixes
+
+
+def route_per_fix(wc, fixes, accuracy):
+  """Locates a route on every fix as MapD does, rebuilding it from the single fix when locating fails.
+  Returns the list of current way relations and the count of route builds."""
+  route, builds, current = None, 0, []
+  for location_rad, bearing_rad in fixes:
+    if route is not None:
+      route.update(location_rad, bearing_rad, accuracy)
+    if route is None or not route.located:
+      route = wc.get_route(location_rad, bearing_rad, accuracy)
+      builds += route is not None
+    current.append(route.current_wr if route is not None and route.located else None)
+  return current, builds
+
+
+def matched_route_per_fix(wc, fixes, accuracy):
+  route, builds, current = None, 0, []
+  for location_rad, bearing_rad in fixes:
+    new_route = wc.get_matched_route(route, location_rad, bearing_rad, accuracy)
+    builds += new_route is not None and new_route is not route
+    route = new_route
+    current.append(route.current_wr if route is not None and route.located else None)
+  return current, builds
@@ -1,19 +1,37 @@
 import overpy
 import math
+import time
+from selfdrive.mapd.lib.osm_cache import OSMTileCache
 
 
 class DPOSM():
-  def __init__(self):
+  def __init__(self, offline=False, cache=None):
     self.api = overpy.Overpass()
+    # When offline, ways are served exclusively from the tile cache, stale or not.
+    self.offline = offline
+    self.cache = cache if cache is not None else OSMTileCache()
+    self.query_count = 0
+    self.query_failures = 0
+    self.query_time = 0.  # s. Accumulated time spent on Overpass queries.
 
-  def build_way_query(self, lat, lon, heading, radius=50):
-    print("lat: %s lon: %s heading: %s" % (lat, lon, heading))
-    """Builds a query to find all highways within a given radius around a point"""
+  @property
+  def stats(self):
+    return dict(self.cache.stats, queries=self.query_count, query_failures=self.query_failures,
+                query_time=self.query_time)
+
+  def query_center(self, lat, lon, heading, radius=50):
+    """Provides the center of the query area, which is shifted half the radius in the direction of `heading`"""
     a = 111132.954*math.cos(float(lat)/180*3.141592)
     b = 111132.954 - 559.822 * math.cos( 2 * float(lat)/180*3.141592) + 1.175 * math.cos( 4 * float(lat)/180*3.141592)
     heading = math.radians(-heading + 90)
     lat = lat+math.sin(heading)*radius/2/b
     lon = lon+math.cos(heading)*radius/2/a
+    return lat, lon
+
+  def build_way_query(self, lat, lon, heading, radius=50):
+    print("lat: %s lon: %s heading: %s" % (lat, lon, heading))
+    """Builds a query to find all highways within a given radius around a point"""
+    lat, lon = self.query_center(lat, lon, heading, radius)
     pos = "  (around:%f,%f,%f)" % (radius, lat, lon)
     lat_lon = "(%f,%f)" % (lat, lon)
     q = """(
@@ -27,15 +45,32 @@ class DPOSM():
     return q
 
   def fetch_road_ways_around_location(self, lat, lon, heading, radius=50):
+    center_lat, center_lon = self.query_center(lat, lon, heading, radius)
+
+    # Serve from cache when all tiles for the query area are available and fresh, or any age when offline.
+    ways = self.cache.load(center_lat, center_lon, radius, allow_stale=self.offline)
+    if ways is not None or self.offline:
+      return ways if ways is not None else []
+
     q = self.build_way_query(lat, lon, heading, radius)
+    t = time.monotonic()
+    self.query_count += 1
     try:
       ways = self.api.query(q).ways
     except Exception as e:
       print(f'Exception while querying OSM:\n{e}')
+      self.query_failures += 1
       ways = []
+    self.query_time += time.monotonic() - t
+
+    if len(ways) > 0:
+      self.cache.store(ways, center_lat, center_lon, radius)
+      return ways
 
-    return ways
+    # Most likely a connectivity issue. Fall back to cached data even if stale.
+    ways = self.cache.load(center_lat, center_lon, radius, allow_stale=True)
+    return ways if ways is not None else []
 
 if __name__ == "__main__":
-  osm = OSM()
+  osm = DPOSM()
   print(osm.build_way_query(-27.6256875, 153.0617238, 0, 3000))
@@ -12,9 +12,9 @@ class DPWayRelation(WayRelation):
     # make sure we have priority here, e.g. stop sign should have higher priority than roundabout
 
     # stop sign
-    stop_sign_str = self.way.tags.get("highway")
+    stop_sign_str = self.tags.get("highway")
     if stop_sign_str is not None and stop_sign_str == "stop":
-      direction = self.way.tags.get("direction")
+      direction = self.tags.get("direction")
       limit_to = None
       # if we don't have a direction tag, we slow it down to 5km/h
       if direction is None:
@@ -32,7 +32,7 @@ class DPWayRelation(WayRelation):
         return self._speed_limit
 
     # roundabout, by arne
-    junction_string = self.way.tags.get("junction")
+    junction_string = self.tags.get("junction")
     if junction_string is not None and junction_string == "roundabout":
       self._speed_limit = 25.0 * CV.KPH_TO_MS
       return self._speed_limit
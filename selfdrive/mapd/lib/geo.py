@@ -58,6 +58,16 @@ def distance_to_points(point, points):
   return c * R
 
 
+def point_at_distance(point, bearing, distance):
+  """Provides the point reached when traveling `distance` mts from `point` with initial `bearing` (from true north
+  clockwise) on a great circle. `point` is a 2 element array containing a latitud, longitude pair in radians.
+  """
+  d = distance / R
+  lat = np.arcsin(np.sin(point[0]) * np.cos(d) + np.cos(point[0]) * np.sin(d) * np.cos(bearing))
+  lon = point[1] + np.arctan2(np.sin(bearing) * np.sin(d) * np.cos(point[0]), np.cos(d) - np.sin(point[0]) * np.sin(lat))
+  return np.array([lat, lon])
+
+
 class DIRECTION(Enum):
   NONE = 0
   AHEAD = 1
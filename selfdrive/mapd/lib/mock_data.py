@@ -1,4 +1,6 @@
 import numpy as np
+import overpy
+from selfdrive.mapd.lib.geo import R
 
 
 class MockRoad():
@@ -86,3 +88,70 @@ class MockRoad():
     [52.2153110, 13.8730398],
     [52.2157442, 13.8730848],
     [52.2158833, 13.8731036]])
+
+
+class MockOSM():
+  @staticmethod
+  def grid_ways(center_deg, size, spacing, nodes_per_block=3):
+    """Provides a synthetic road network as a list of overpy Way objects. The network is a square grid of `size` x
+    `size` intersections separated by `spacing` mts around `center_deg` ([lat, lon] in degrees). Every block between
+    intersections is an independent way with `nodes_per_block` nodes, as usually found on OSM data.
+    """
+    lat_step = np.degrees(spacing / R)
+    lon_step = lat_step / np.cos(np.radians(center_deg[0]))
+    origin = np.array(center_deg) - np.array([lat_step, lon_step]) * (size - 1) / 2.
+    elements = []
+    node_ids = {}
+
+    def node_id(lat, lon):
+      key = (round(lat, 9), round(lon, 9))
+      if key not in node_ids:
+        node_ids[key] = len(node_ids) + 1
+        elements.append({'type': 'node', 'id': node_ids[key], 'lat': lat, 'lon': lon})
+      return node_ids[key]
+
+    way_id = 1
+    for i in range(size):
+      for j in range(size):
+        start = origin + np.array([i * lat_step, j * lon_step])
+        for k, step in enumerate([[lat_step, 0.], [0., lon_step]]):
+          if (k == 0 and i == size - 1) or (k == 1 and j == size - 1):
+            continue
+          points = start + np.outer(np.linspace(0., 1., nodes_per_block), step)
+          tags = {'highway': 'primary' if (i if k == 1 else j) % 5 == 0 else 'residential',
+                  'name': f'{"Street" if k == 1 else "Avenue"} {i if k == 1 else j}'}
+          elements.append({'type': 'way', 'id': way_id, 'nodes': [node_id(*p) for p in points], 'tags': tags})
+          way_id += 1
+
+    return overpy.Result.from_json({'elements': elements}).ways
+
+  @staticmethod
+  def road_ways(points_deg, nodes_per_way=10, first_node_id=1000000, first_way_id=1000000, tags=None, node_ids=None):
+    """Provides a road following `points_deg` ([lat, lon] in degrees) as a list of consecutive overpy Way objects
+    with `nodes_per_way` nodes each. Node ids are consecutive from `first_node_id` unless provided in `node_ids`.
+    """
+    tags = tags if tags is not None else {'highway': 'secondary', 'name': 'Mock Road', 'maxspeed': '80'}
+    node_ids = node_ids if node_ids is not None else [first_node_id + i for i in range(len(points_deg))]
+    elements = [{'type': 'node', 'id': node_ids[i], 'lat': p[0], 'lon': p[1]} for i, p in enumerate(points_deg)]
+    for w, start in enumerate(range(0, len(points_deg) - 1, nodes_per_way - 1)):
+      way_node_ids = node_ids[start:start + nodes_per_way]
+      elements.append({'type': 'way', 'id': first_way_id + w, 'nodes': way_node_ids, 'tags': tags})
+
+    return overpy.Result.from_json({'elements': elements}).ways
+
+  @staticmethod
+  def fixes_along(points_deg, count, noise=3., seed=0):
+    """Provides `count` simulated GPS fixes as (location_rad, bearing_rad) tuples driving along `points_deg`
+    with a gaussian position noise of `noise` mts and bearing noise of 5 degrees.
+    """
+    rng = np.random.default_rng(seed)
+    points = np.radians(np.array(points_deg))
+    fixes = []
+    for t in np.linspace(0., len(points) - 1.001, count):
+      idx = int(t)
+      a, b = points[idx], points[idx + 1]
+      location = a + (b - a) * (t - idx) + rng.normal(0., noise / R, 2)
+      bearing = np.arctan2(np.sin(b[1] - a[1]) * np.cos(b[0]),
+                           np.cos(a[0]) * np.sin(b[0]) - np.sin(a[0]) * np.cos(b[0]) * np.cos(b[1] - a[1]))
+      fixes.append((location, bearing + rng.normal(0., np.radians(5.))))
+    return fixes
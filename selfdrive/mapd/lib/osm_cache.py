@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import math
+import overpy
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from common.file_helpers import mkdirs_exists_ok, rm_not_exists_ok, atomic_write_in_dir
+from selfdrive.hardware import PC, JETSON
+from selfdrive.mapd.lib.geo import R, distance_to_points
+from selfdrive.mapd.config import OSM_CACHE_TILE_SIZE, OSM_CACHE_MAX_SIZE, OSM_CACHE_TTL
+
+
+if os.environ.get('OSM_CACHE_ROOT', False):
+  CACHE_ROOT = os.environ['OSM_CACHE_ROOT']
+elif PC or JETSON:
+  CACHE_ROOT = os.path.join(str(Path.home()), ".comma", "media", "0", "osm_cache")
+else:
+  CACHE_ROOT = '/data/media/0/osm_cache/'
+
+
+_TILE_EXT = '.json'
+
+
+class OSMTileCache():
+  """A disk backed cache of OSM ways and nodes bucketed in fixed square geographic tiles.
+     Each tile is stored as a json file holding the Overpass elements (ways and all of their nodes) for every way with
+     a segment crossing the tile. Tiles are evicted on a least recently used basis when the disk budget is exceeded.
+  """
+  def __init__(self, root=CACHE_ROOT, tile_size=OSM_CACHE_TILE_SIZE, max_size=OSM_CACHE_MAX_SIZE, ttl=OSM_CACHE_TTL):
+    self.root = root
+    self.tile_size = tile_size
+    self.max_size = max_size
+    self.ttl = ttl
+    self.stats = {
+      'hits': 0,          # Loads fully served with fresh tiles.
+      'stale_hits': 0,    # Loads served with at least one tile older than ttl. (offline fallback)
+      'misses': 0,        # Loads that could not be served as some tiles were missing or stale.
+      'evictions': 0,     # Tiles removed to keep the cache within its disk budget.
+      'load_time': 0.,    # s. Accumulated time spent loading from cache.
+      'store_time': 0.,   # s. Accumulated time spent storing to cache.
+    }
+    self._tiles = OrderedDict()  # tile -> file size. Ordered from least to most recently used.
+    self._size = 0
+    mkdirs_exists_ok(self.root)
+    self._load_index()
+
+  def _load_index(self):
+    """Builds the LRU index from the tiles on disk using the file modification time as last access time.
+    """
+    entries = []
+    for fn in os.listdir(self.root):
+      if not fn.endswith(_TILE_EXT):
+        continue
+      try:
+        tile = tuple(int(v) for v in fn[:-len(_TILE_EXT)].split('_'))
+        st = os.stat(os.path.join(self.root, fn))
+      except (ValueError, OSError):
+        continue
+      entries.append((st.st_mtime, tile, st.st_size))
+
+    for _, tile, size in sorted(entries):
+      self._tiles[tile] = size
+      self._size += size
+
+  @property
+  def size(self):
+    return self._size
+
+  def _tile_path(self, tile):
+    return os.path.join(self.root, f'{tile[0]}_{tile[1]}{_TILE_EXT}')
+
+  def _tile_for_point(self, lat, lon):
+    return (int(math.floor(lat / self.tile_size)), int(math.floor(lon / self.tile_size)))
+
+  def _tile_bounds(self, tile):
+    """Returns the [[min_lat, min_lon], [max_lat, max_lon]] bounds of a tile in degrees.
+    """
+    return np.array([[tile[0], tile[1]], [tile[0] + 1, tile[1] + 1]], dtype=float) * self.tile_size
+
+  def _circle_tiles(self, lat, lon, radius):
+    """Provides a dictionary with the tiles intersecting the circle of `radius` mts around `lat`, `lon` (in degrees)
+       indicating for each one whether it is fully contained in the circle.
+    """
+    lat_angle = np.degrees(radius / R)
+    lon_angle = lat_angle / max(math.cos(math.radians(lat)), 1e-6)
+    min_tile = self._tile_for_point(lat - lat_angle, lon - lon_angle)
+    max_tile = self._tile_for_point(lat + lat_angle, lon + lon_angle)
+    center = np.radians(np.array([lat, lon]))
+
+    tiles = {}
+    for tx in range(min_tile[0], max_tile[0] + 1):
+      for ty in range(min_tile[1], max_tile[1] + 1):
+        bounds = self._tile_bounds((tx, ty))
+        # The tile intersects the circle if its closest point to the center is inside the circle, and it is fully
+        # contained if its farthest corner is.
+        closest = np.clip([lat, lon], bounds[0], bounds[1])
+        corners = np.array([[bounds[i, 0], bounds[j, 1]] for i in range(2) for j in range(2)])
+        distances = distance_to_points(center, np.radians(np.vstack((closest, corners))))
+        if distances[0] <= radius:
+          tiles[(tx, ty)] = bool(np.all(distances[1:] <= radius))
+
+    return tiles
+
+  def tiles_for_circle(self, lat, lon, radius, fully_contained=False):
+    """Provides the list of tiles intersecting the circle of `radius` mts around `lat`, `lon` (in degrees).
+       When `fully_contained` is True, only the tiles laying completely inside the circle are provided.
+    """
+    return [tile for tile, contained in self._circle_tiles(lat, lon, radius).items()
+            if contained or not fully_contained]
+
+  def _tiles_for_way(self, nodes):
+    """Provides the set of tiles crossed by the bounding boxes of the segments of a way.
+    """
+    tiles = set()
+    segments = list(zip(nodes[:-1], nodes[1:])) or [(nodes[0], nodes[0])]
+    for nd_a, nd_b in segments:
+      t_a = self._tile_for_point(float(nd_a.lat), float(nd_a.lon))
+      t_b = self._tile_for_point(float(nd_b.lat), float(nd_b.lon))
+      for tx in range(min(t_a[0], t_b[0]), max(t_a[0], t_b[0]) + 1):
+        for ty in range(min(t_a[1], t_b[1]), max(t_a[1], t_b[1]) + 1):
+          tiles.add((tx, ty))
+    return tiles
+
+  def store(self, ways, lat, lon, radius):
+    """Stores in cache the `ways` resulting from a query of all ways in a circle of `radius` mts around `lat`, `lon`.
+       Tiles fully contained in the query circle are stored as complete. Tiles on the border of the circle only hold
+       part of their data and are merged with any previous partial data, never replacing a fresh complete tile.
+    """
+    t = time.monotonic()
+    circle_tiles = self._circle_tiles(lat, lon, radius)
+    tiles_elements = {tile: {} for tile in circle_tiles}
+
+    for way in ways:
+      nodes = way.nodes
+      if len(nodes) == 0:
+        continue
+      tiles = [tile for tile in self._tiles_for_way(nodes) if tile in circle_tiles]
+      if len(tiles) == 0:
+        continue
+
+      way_element = {'type': 'way', 'id': way.id, 'nodes': [nd.id for nd in nodes], 'tags': way.tags}
+      node_elements = [{'type': 'node', 'id': nd.id, 'lat': float(nd.lat), 'lon': float(nd.lon), 'tags': nd.tags}
+                       for nd in nodes]
+      for tile in tiles:
+        elements = tiles_elements[tile]
+        elements[('way', way.id)] = way_element
+        for element in node_elements:
+          elements[('node', element['id'])] = element
+
+    now = time.time()
+    for tile, elements in tiles_elements.items():
+      complete = circle_tiles[tile]
+      if not complete:
+        if len(elements) == 0:
+          continue
+        data = self._read_tile(tile)
+        if data is not None:
+          if data['complete'] and now - data['timestamp'] <= self.ttl:
+            continue
+          if not data['complete']:
+            merged = {(e['type'], e['id']): e for e in data['elements']}
+            merged.update(elements)
+            elements = merged
+      self._write_tile(tile, {'timestamp': now, 'complete': complete, 'elements': list(elements.values())})
+
+    self._evict()
+    self.stats['store_time'] += time.monotonic() - t
+
+  def load(self, lat, lon, radius, allow_stale=False):
+    """Loads from cache the ways in a circle of `radius` mts around `lat`, `lon`.
+       All tiles fully contained in the circle must be available and complete, while the ones on the border are used
+       when available. Returns None when data is missing, or stale unless `allow_stale` is True.
+    """
+    t = time.monotonic()
+    now = time.time()
+    stale = False
+    elements = {}
+
+    for tile, contained in self._circle_tiles(lat, lon, radius).items():
+      data = self._read_tile(tile)
+      if data is None or (contained and not data['complete']):
+        if contained:
+          self.stats['misses'] += 1
+          return None
+        continue
+
+      if now - data['timestamp'] > self.ttl:
+        if not allow_stale:
+          self.stats['misses'] += 1
+          return None
+        stale = True
+
+      for element in data['elements']:
+        elements[(element['type'], element['id'])] = element
+
+    if len(elements) == 0:
+      self.stats['misses'] += 1
+      return None
+
+    ways = overpy.Result.from_json({'elements': list(elements.values())}).ways
+
+    self.stats['stale_hits' if stale else 'hits'] += 1
+    self.stats['load_time'] += time.monotonic() - t
+    return ways
+
+  def _read_tile(self, tile):
+    if tile not in self._tiles:
+      return None
+
+    path = self._tile_path(tile)
+    try:
+      with open(path, 'r') as f:
+        data = json.load(f)
+      os.utime(path)  # Keep the last access time on disk for the LRU index.
+    except (OSError, ValueError):
+      self._remove_tile(tile)
+      return None
+
+    self._tiles.move_to_end(tile)
+    return data
+
+  def _write_tile(self, tile, data):
+    path = self._tile_path(tile)
+    with atomic_write_in_dir(path, overwrite=True) as f:
+      json.dump(data, f)
+
+    self._size -= self._tiles.pop(tile, 0)
+    self._tiles[tile] = os.path.getsize(path)
+    self._size += self._tiles[tile]
+
+  def _remove_tile(self, tile):
+    self._size -= self._tiles.pop(tile, 0)
+    rm_not_exists_ok(self._tile_path(tile))
+
+  def _evict(self):
+    while self._size > self.max_size and len(self._tiles) > 0:
+      tile = next(iter(self._tiles))
+      self._remove_tile(tile)
+      self.stats['evictions'] += 1
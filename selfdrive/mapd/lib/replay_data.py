@@ -0,0 +1,150 @@
+import re
+import json
+import time
+import overpy
+import numpy as np
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from selfdrive.mapd.lib.geo import distance_to_points, bearing_to_points
+from selfdrive.mapd.lib.mock_data import MockOSM
+from selfdrive.mapd.lib.WayStore import WayStore
+
+
+_AROUND_RE = re.compile(r'around:\s*([-0-9.eE]+)\s*,\s*([-0-9.eE]+)\s*,\s*([-0-9.eE]+)')
+_BBOX_RE = re.compile(r'way\(\s*([-0-9.eE]+)\s*,\s*([-0-9.eE]+)\s*,\s*([-0-9.eE]+)\s*,\s*([-0-9.eE]+)\s*\)')
+_GPX_NS = {'gpx': 'http://www.topografix.com/GPX/1/1'}
+
+
+def load_osm_fixture(path):
+  """Loads the ways in a saved OSM fixture file. Either Overpass json output (.json) or OSM xml (.osm, .xml).
+  """
+  with open(path, 'rb') as f:
+    data = f.read()
+
+  if path.endswith('.json'):
+    return overpy.Result.from_json(json.loads(data)).ways
+  return overpy.Result.from_xml(data.decode('utf-8')).ways
+
+
+class FileOverpass():
+  """A local stand-in for `overpy.Overpass` answering way queries from fixture data instead of an Overpass server.
+  It supports the `around` queries issued by DPOSM and the bounding box queries issued by OSM. Ways with any node in
+  the queried area are returned along all their nodes.
+  """
+  def __init__(self, ways, latency=0.):
+    """Args:
+        ways (Array): overpy Way objects to answer queries from. See `load_osm_fixture`.
+        latency (float): s. Simulated server latency added to every query.
+    """
+    self.latency = latency
+    self.query_count = 0
+    self._store = WayStore(ways)
+    self._elements = []
+    for way in ways:
+      nodes = way.nodes
+      self._elements.append([{'type': 'way', 'id': way.id, 'nodes': [nd.id for nd in nodes], 'tags': way.tags}] +
+                            [{'type': 'node', 'id': nd.id, 'lat': float(nd.lat), 'lon': float(nd.lon),
+                              'tags': nd.tags} for nd in nodes])
+
+  def _ways_mask(self, nodes_mask):
+    """Reduces a mask on all the stored nodes to a mask on the ways having any of the nodes.
+    """
+    if len(nodes_mask) == 0:
+      return np.array([], dtype=bool)
+    return np.logical_or.reduceat(nodes_mask, self._store.offsets[:-1])
+
+  def query(self, query):
+    self.query_count += 1
+    if self.latency > 0.:
+      time.sleep(self.latency)
+
+    v = _AROUND_RE.search(query)
+    if v is not None:
+      radius, center = float(v[1]), np.radians([float(v[2]), float(v[3])])
+      ways_mask = self._ways_mask(distance_to_points(center, self._store.nodes_rad) <= radius)
+    else:
+      v = _BBOX_RE.search(query)
+      if v is None:
+        raise overpy.exception.OverpassBadRequest(query)
+      bbox = np.array([[float(v[1]), float(v[2])], [float(v[3]), float(v[4])]])
+      nodes = self._store.nodes_deg
+      ways_mask = self._ways_mask(np.all(np.logical_and(nodes >= bbox[0], nodes <= bbox[1]), axis=1))
+
+    elements = {}
+    for idx in np.nonzero(ways_mask)[0]:
+      for element in self._elements[idx]:
+        elements[(element['type'], element['id'])] = element
+
+    return overpy.Result.from_json({'elements': list(elements.values())})
+
+
+def _fix(timestamp, lat, lon, bearing_deg, speed, accuracy):
+  return {'timestamp': int(timestamp), 'latitude': float(lat), 'longitude': float(lon),
+          'bearingDeg': float(bearing_deg), 'speed': float(speed), 'accuracy': float(accuracy)}
+
+
+def fixes_from_points(points_deg, timestamps, accuracy=2.5):
+  """Provides gps fixes for a track of `points_deg` ([lat, lon] in degrees) at the given `timestamps` (ms).
+  Bearing and speed are derived from the consecutive points.
+  """
+  points = np.radians(np.array(points_deg, dtype=float))
+  fixes = []
+  bearing, speed = 0., 0.
+  for i in range(len(points)):
+    if i + 1 < len(points):
+      dt = (timestamps[i + 1] - timestamps[i]) * 1e-3
+      distance = distance_to_points(points[i], points[i + 1:i + 2])[0]
+      if distance > 0.:
+        bearing = np.degrees(bearing_to_points(points[i], points[i + 1:i + 2])[0]) % 360.
+      speed = distance / dt if dt > 0. else speed
+    fixes.append(_fix(timestamps[i], points_deg[i][0], points_deg[i][1], bearing, speed, accuracy))
+  return fixes
+
+
+def load_trace(path):
+  """Loads a gps trace as a list of gps fix dictionaries with the `gpsLocationExternal` field names.
+  Supported formats are GPX files as written by gpxd (.gpx) and json lists of fixes (.json).
+  """
+  if path.endswith('.json'):
+    with open(path, 'r') as f:
+      return [_fix(d['timestamp'], d['latitude'], d['longitude'], d.get('bearingDeg', 0.), d.get('speed', 0.),
+                   d.get('accuracy', 2.5)) for d in json.load(f)]
+
+  trkpts = ET.parse(path).getroot().findall('.//gpx:trkpt', _GPX_NS)
+  points = [[float(p.get('lat')), float(p.get('lon'))] for p in trkpts]
+  # gpxd writes naive UTC times.
+  timestamps = [datetime.fromisoformat(p.find('gpx:time', _GPX_NS).text.rstrip('Z')).replace(tzinfo=timezone.utc)
+                .timestamp() * 1e3 for p in trkpts]
+  return fixes_from_points(points, timestamps)
+
+
+def synthetic_trace(points_deg, speed=20., rate=1., start_timestamp=1600000000000):
+  """Provides gps fixes driving along the polyline `points_deg` ([lat, lon] in degrees) at constant `speed` (m/s)
+  with fixes at `rate` (Hz).
+  """
+  points = np.radians(np.array(points_deg, dtype=float))
+  dist = np.concatenate(([0.], np.cumsum([distance_to_points(a, np.array([b]))[0]
+                                          for a, b in zip(points[:-1], points[1:])])))
+  ds = np.arange(0., dist[-1], speed / rate)
+  lat = np.interp(ds, dist, points[:, 0])
+  lon = np.interp(ds, dist, points[:, 1])
+  timestamps = start_timestamp + np.arange(len(ds)) * 1e3 / rate
+  return fixes_from_points(np.degrees(np.column_stack((lat, lon))), timestamps)
+
+
+def synthetic_scenario(center_deg=(52.2, 13.87), size=41, spacing=100.):
+  """Provides the ways of a grid city of `size` x `size` intersections around `center_deg` and gps fixes driving
+  along its central street. `size` must be odd for a street to run through `center_deg`.
+  """
+  center_deg = list(center_deg)
+  ways = MockOSM.grid_ways(center_deg, size, spacing)
+  fixes = synthetic_trace([[center_deg[0], center_deg[1] - 0.025], [center_deg[0], center_deg[1] + 0.025]])
+  return ways, fixes
+
+
+def trace_length(fixes):
+  """Provides the length in mts of the track described by `fixes`."""
+  points = np.radians(np.array([[f['latitude'], f['longitude']] for f in fixes]))
+  return float(np.sum([distance_to_points(a, np.array([b]))[0] for a, b in zip(points[:-1], points[1:])])) \
+    if len(points) > 1 else 0.
+
@@ -4,11 +4,12 @@ from traceback import print_exception
 import numpy as np
 from time import strftime, gmtime
 import cereal.messaging as messaging
-from common.realtime import Ratekeeper
+from common.realtime import Ratekeeper, sec_since_boot
 from selfdrive.mapd.lib.dp_osm import DPOSM as OSM
-from selfdrive.mapd.lib.geo import distance_to_points
+from selfdrive.mapd.lib.geo import distance_to_points, point_at_distance
 from selfdrive.mapd.lib.WayCollection import WayCollection
-from selfdrive.mapd.config import QUERY_RADIUS, MIN_DISTANCE_FOR_NEW_QUERY, FULL_STOP_MAX_SPEED, LOOK_AHEAD_HORIZON_TIME
+from selfdrive.mapd.config import QUERY_RADIUS, MIN_DISTANCE_FOR_NEW_QUERY, FULL_STOP_MAX_SPEED, \
+  LOOK_AHEAD_HORIZON_TIME, PREFETCH_HORIZON_TIME, ROUTE_STRATEGY, ROUTE_STRATEGY_HMM, PUBLISH_RATE
 
 
 _DEBUG = False
@@ -29,9 +30,12 @@ threading.excepthook = excepthook
 
 
 class MapD():
-  def __init__(self):
+  def __init__(self, route_strategy=ROUTE_STRATEGY):
     self.osm = OSM()
+    self.route_strategy = route_strategy
+    self.route_builds = 0  # Count of routes built. Each build recalculates the route nodes data.
     self.way_collection = None
+    self._standby = None  # (WayCollection, fetch location) prefetched ahead of the current location.
     self.route = None
     self.last_gps_fix_timestamp = 0
     self.last_gps = None
@@ -42,7 +46,11 @@ class MapD():
     self.gps_speed = 0.
     self.last_fetch_location = None
     self.last_route_update_fix_timestamp = 0
-    self.last_publish_fix_timestamp = 0
+    self.last_publish_distances_timestamp = 0
+    self.v_ego = 0.
+    self._fix_time = None  # sec_since_boot when the last gps fix was received.
+    self._position_time = None  # sec_since_boot the current position on the route corresponds to.
+    self._position_fix_timestamp = 0  # Timestamp of the gps fix the route was last located with.
     self._op_enabled = False
     self._disengaging = False
     self._query_thread = None
@@ -57,6 +65,13 @@ class MapD():
     self._disengaging = not controls_state.enabled and self._op_enabled
     self._op_enabled = controls_state.enabled
 
+  def update_car_state(self, sm):
+    sock = 'carState'
+    if not sm.updated[sock] or not sm.valid[sock]:
+      return
+
+    self.v_ego = sm[sock].vEgo
+
   def update_gps(self, sm):
     sock = 'gpsLocationExternal'
     if not sm.updated[sock] or not sm.valid[sock]:
@@ -70,6 +85,7 @@ class MapD():
       return
 
     self.last_gps_fix_timestamp = log.timestamp  # Unix TS. Milliseconds since January 1, 1970.
+    self._fix_time = sec_since_boot()
     self.location_rad = np.radians(np.array([log.latitude, log.longitude], dtype=float))
     self.location_deg = (log.latitude, log.longitude, log.bearingDeg)
     _debug(f'self.location_deg: {self.location_deg}')
@@ -85,54 +101,132 @@ class MapD():
            f'timestamp: {strftime("%d-%m-%y %H:%M:%S", gmtime(self.last_gps_fix_timestamp * 1e-3))}'
            f'*******')
 
-  def _query_osm_not_blocking(self):
-    def query(osm, location_deg, location_rad, radius):
-      _debug(f'Mapd: Start query for OSM map data at {location_deg}')
-      lat, lon, bearing = location_deg
-      ways = osm.fetch_road_ways_around_location(lat, lon, bearing, radius)
-      _debug(f'Mapd: Query to OSM finished with {len(ways)} ways')
-
-      # Only issue an update if we received some ways. Otherwise it is most likely a conectivity issue.
-      # Will retry on next loop.
-      if len(ways) > 0:
-        new_way_collection = WayCollection(ways, location_rad)
-
-        # Use the lock to update the way_collection as it might be being used to update the route.
-        _debug('Mapd: Locking to write results from osm.')
-        with self._lock:
+  def _query_osm(self, location_deg, location_rad, radius, standby=False):
+    _debug(f'Mapd: Start {"prefetch " if standby else ""}query for OSM map data at {location_deg}')
+    lat, lon, bearing = location_deg
+    ways = self.osm.fetch_road_ways_around_location(lat, lon, bearing, radius)
+    _debug(f'Mapd: Query to OSM finished with {len(ways)} ways')
+    _debug(f'Mapd: OSM stats: {self.osm.stats}')
+
+    # Only issue an update if we received some ways. Otherwise it is most likely a conectivity issue.
+    # Will retry on next loop.
+    if len(ways) > 0:
+      # The way collection is fully built (store, indexes and way relations) before taking the lock.
+      new_way_collection = WayCollection(ways, location_rad)
+
+      # Use the lock to update the way_collection as it might be being used to update the route.
+      _debug('Mapd: Locking to write results from osm.')
+      with self._lock:
+        if standby:
+          self._standby = (new_way_collection, location_rad)
+          _debug(f'Mapd: Prefetched map data @ {location_deg} - got {len(ways)} ways')
+        else:
           self.way_collection = new_way_collection
           self.last_fetch_location = location_rad
           _debug(f'Mapd: Updated map data @ {location_deg} - got {len(ways)} ways')
 
-        _debug('Mapd: Releasing Lock to write results from osm')
+      _debug('Mapd: Releasing Lock to write results from osm')
 
+  def _query_osm_not_blocking(self, location_deg=None, location_rad=None, standby=False):
     # Ignore if we have a query thread already running.
     if self._query_thread is not None and self._query_thread.is_alive():
       return
 
-    self._query_thread = threading.Thread(target=query, args=(self.osm, self.location_deg, self.location_rad,
-                                                              QUERY_RADIUS))
+    location_deg = self.location_deg if location_deg is None else location_deg
+    location_rad = self.location_rad if location_rad is None else location_rad
+    self._query_thread = threading.Thread(target=self._query_osm, args=(location_deg, location_rad, QUERY_RADIUS,
+                                                                         standby))
     self._query_thread.start()
 
-  def updated_osm_data(self):
+  def _distance_to_new_query(self):
+    """Provides the distance to travel before new map data is needed. 0. when it is needed now.
+    """
+    # Map data is needed once the route ahead is shorter than `MIN_DISTANCE_FOR_NEW_QUERY`.
+    route_distance = 0.
     if self.route is not None:
       distance_to_end = self.route.distance_to_end
-      if distance_to_end is not None and distance_to_end >= MIN_DISTANCE_FOR_NEW_QUERY:
-        # do not query as long as we have a route with enough distance ahead.
-        return
+      if distance_to_end is not None:
+        route_distance = max(distance_to_end - MIN_DISTANCE_FOR_NEW_QUERY, 0.)
+
+    # and we are close to the border of the previous query area.
+    fetch_distance = 0.
+    if self.last_fetch_location is not None:
+      distance_since_last = distance_to_points(self.last_fetch_location, np.array([self.location_rad]))[0]
+      fetch_distance = max(QUERY_RADIUS - MIN_DISTANCE_FOR_NEW_QUERY - distance_since_last, 0.)
+
+    return max(route_distance, fetch_distance)
+
+  def _prefetch_osm_data(self, distance_to_query):
+    """Queries in the background the map data for the location where we are predicted to be once new data is
+    needed, as to have it ready by then. The result is kept as a standby way collection.
+    """
+    if self._standby is not None or self.bearing_rad is None:
+      return
+
+    if distance_to_query > self.gps_speed * PREFETCH_HORIZON_TIME:
+      return
+
+    location_rad = point_at_distance(self.location_rad, self.bearing_rad, distance_to_query)
+    lat, lon = np.degrees(location_rad)
+    self._query_osm_not_blocking((lat, lon, self.location_deg[2]), location_rad, standby=True)
+
+  def _swap_standby_way_collection(self):
+    """Swaps in the standby way collection if it covers the current location. Returns True on success.
+    """
+    with self._lock:
+      if self._standby is None:
+        return False
 
+      way_collection, fetch_location = self._standby
+      self._standby = None
+
+      # Discard if we are not where predicted. e.g. we turned.
+      distance_to_fetch = distance_to_points(fetch_location, np.array([self.location_rad]))[0]
+      if distance_to_fetch >= QUERY_RADIUS - MIN_DISTANCE_FOR_NEW_QUERY:
+        _debug('Mapd: Discarding standby map data as it does not cover current location')
+        return False
+
+      self.way_collection = way_collection
+      self.last_fetch_location = fetch_location
+      _debug('Mapd: Swapped in standby map data')
+      return True
+
+  def updated_osm_data(self):
     if self.location_rad is None:
       return
 
-    if self.last_fetch_location is not None:
-      distance_since_last = distance_to_points(self.last_fetch_location, np.array([self.location_rad]))[0]
-      if distance_since_last < QUERY_RADIUS - MIN_DISTANCE_FOR_NEW_QUERY:
-        # do not query if are still not close to the border of previous query area
-        return
+    distance_to_query = self._distance_to_new_query()
+    if distance_to_query > 0.:
+      # do not query yet, but prefetch if new data will be needed soon.
+      self._prefetch_osm_data(distance_to_query)
+      return
+
+    if self._swap_standby_way_collection():
+      return
 
     self._query_osm_not_blocking()
 
   def update_route(self):
+    def update_matched_proc():
+      # Do not match while stopped as the bearing can start jumping. Keep the route from the current way collection.
+      if self.route is not None and self.route.way_collection_id == self.way_collection.id and \
+         self.gps_speed < FULL_STOP_MAX_SPEED:
+        _debug('Mapd *****: Route Not updated as car has Stopped ********')
+        return
+
+      route = self.way_collection.get_matched_route(self.route, self.location_rad, self.bearing_rad, self.accuracy)
+      if route is not None and route is not self.route:
+        self.route_builds += 1
+
+      # Keep updating a route from an older way collection until the new one can be located.
+      if self.route is not None and self.route.way_collection_id != self.way_collection.id and \
+         (route is None or not route.located):
+        self.route.update(self.location_rad, self.bearing_rad, self.accuracy)
+        return
+
+      self.route = route
+      _debug(f'Mapd *****: Route matched: \n{self.route}\n********')
+
     def update_proc():
       # Ensure we clear the route on op disengage, this way we can correct possible incorrect map data due
       # to wrongly locating or picking up the wrong route.
@@ -150,11 +244,20 @@ class MapD():
 
       self.last_route_update_fix_timestamp = self.last_gps_fix_timestamp
 
+      if self.route_strategy == ROUTE_STRATEGY_HMM:
+        update_matched_proc()
+        return
+
       # Create the route if not existent or if it was generated by an older way collection
       if self.route is None or self.route.way_collection_id != self.way_collection.id:
-        self.route = self.way_collection.get_route(self.location_rad, self.bearing_rad, self.accuracy)
-        _debug(f'Mapd *****: Route created: \n{self.route}\n********')
-        return
+        route = self.way_collection.get_route(self.location_rad, self.bearing_rad, self.accuracy)
+        self.route_builds += route is not None
+        # Keep updating a route from an older way collection until the new one can be located. This avoids gaps
+        # when swapping way collections.
+        if self.route is None or (route is not None and route.located):
+          self.route = route
+          _debug(f'Mapd *****: Route created: \n{self.route}\n********')
+          return
 
       # Do not attempt to update the route if the car is going close to a full stop, as the bearing can start
       # jumping and creating unnecesary loosing of the route. Since the route update timestamp has been updated
@@ -170,6 +273,7 @@ class MapD():
 
       # if an old route did not mange to locate, attempt to regenerate form way collection.
       self.route = self.way_collection.get_route(self.location_rad, self.bearing_rad, self.accuracy)
+      self.route_builds += self.route is not None
       _debug(f'Mapd *****: Failed to update location in route. Regenerated with route: \n{self.route}\n********')
 
     # We use the lock when updating the route, as it reads `way_collection` which can ben updated by
@@ -180,16 +284,38 @@ class MapD():
 
     _debug('Mapd: Releasing Lock to update route')
 
+  def dead_reckon(self):
+    """Advances the position on the route with the car speed since the last update, so distances ahead stay current
+    between gps fixes without updating the route.
+    """
+    if self.route is None or not self.route.located:
+      return
+
+    now = sec_since_boot()
+    # On a route located with a new fix, dead reckon from the moment the fix was received.
+    if self._position_fix_timestamp != self.last_route_update_fix_timestamp:
+      self._position_fix_timestamp = self.last_route_update_fix_timestamp
+      self._position_time = self._fix_time
+
+    self.route.advance(self.v_ego * (now - self._position_time))
+    self._position_time = now
+
+  @property
+  def distances_timestamp(self):
+    """Unix timestamp in milliseconds the distances on the route correspond to."""
+    return int(self.last_gps_fix_timestamp + (self._position_time - self._fix_time) * 1e3)
+
   def publish(self, pm, sm):
     # Ensure we have a route currently located
-    if self.route is None or not self.route.located:
+    if self.route is None or not self.route.located or self._position_time is None:
       return
 
-    # Ensure we have a route update since last publish
-    if self.last_publish_fix_timestamp == self.last_route_update_fix_timestamp:
+    # Ensure we have a route update or a dead reckoned position since last publish
+    distances_timestamp = self.distances_timestamp
+    if self.last_publish_distances_timestamp == distances_timestamp:
       return
 
-    self.last_publish_fix_timestamp = self.last_route_update_fix_timestamp
+    self.last_publish_distances_timestamp = distances_timestamp
 
     speed_limit = self.route.current_speed_limit
     next_speed_limit_section = self.route.next_speed_limit_section
@@ -203,6 +329,7 @@ class MapD():
     map_data_msg.liveMapData.currentRoadName = str(road_name if road_name is not None else "")
 
     map_data_msg.liveMapData.lastGpsTimestamp = self.last_gps.timestamp
+    map_data_msg.liveMapData.distancesTimestamp = distances_timestamp
     map_data_msg.liveMapData.speedLimitValid = bool(speed_limit is not None)
     map_data_msg.liveMapData.speedLimit = float(speed_limit if speed_limit is not None else 0.0)
     map_data_msg.liveMapData.speedLimitAheadValid = bool(next_speed_limit_section is not None)
@@ -227,28 +354,31 @@ class MapD():
 
 
 # provides live map data information
-def mapd_thread(sm=None, pm=None):
-  mapd = MapD()
-  rk = Ratekeeper(1., print_delay_threshold=None)  # Keeps rate at 1 hz
+def mapd_thread(sm=None, pm=None, mapd=None):
+  if mapd is None:
+    mapd = MapD()
+  rk = Ratekeeper(PUBLISH_RATE, print_delay_threshold=None)
 
   # *** setup messaging
   if sm is None:
-    sm = messaging.SubMaster(['gpsLocationExternal', 'controlsState'])
+    sm = messaging.SubMaster(['gpsLocationExternal', 'controlsState', 'carState'])
   if pm is None:
     pm = messaging.PubMaster(['liveMapData'])
 
   while True:
     sm.update()
     mapd.udpate_state(sm)
+    mapd.update_car_state(sm)
     mapd.update_gps(sm)
     mapd.updated_osm_data()
     mapd.update_route()
+    mapd.dead_reckon()
     mapd.publish(pm, sm)
     rk.keep_time()
 
 
-def main(sm=None, pm=None):
-  mapd_thread(sm, pm)
+def main(sm=None, pm=None, mapd=None):
+  mapd_thread(sm, pm, mapd)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Offline replay of gps traces through mapd.
+
+Runs the mapd update loop on a recorded gps trace (gpxd GPX files or json lists of fixes), answering map queries from
+a local OSM fixture instead of the Overpass servers, and reports the latency of each stage of the loop and the CPU usage
+at the given loop rates.
+
+  ./replay.py --osm map.osm --trace route.gpx --report report.json
+  ./replay.py --synthetic --rate 1 5 10
+"""
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from types import SimpleNamespace
+from selfdrive.mapd import mapd as mapd_module
+from selfdrive.mapd.lib.dp_osm import DPOSM
+from selfdrive.mapd.lib.osm_cache import OSMTileCache
+from selfdrive.mapd.config import ROUTE_STRATEGY, ROUTE_STRATEGY_FIX, ROUTE_STRATEGY_HMM
+from selfdrive.mapd.lib.replay_data import FileOverpass, load_osm_fixture, load_trace, synthetic_scenario, trace_length
+
+
+_STAGES = ['update_gps', 'updated_osm_data', 'query', 'update_route', 'dead_reckon', 'publish', 'total']
+
+
+class ReplaySubMaster():
+  """Minimal SubMaster stand-in fed one gps fix at a time."""
+  def __init__(self):
+    self.updated = {'gpsLocationExternal': False, 'controlsState': False, 'carState': False}
+    self.valid = {'gpsLocationExternal': True, 'controlsState': True, 'carState': True}
+    self.data = {'controlsState': SimpleNamespace(enabled=True), 'carState': SimpleNamespace(vEgo=0.)}
+
+  def __getitem__(self, s):
+    return self.data[s]
+
+  def all_alive_and_valid(self, service_list=None):
+    return True
+
+  def feed(self, fix, new_fix):
+    """Updates the car state with the speed of `fix` and the gps location with `fix` when `new_fix`."""
+    self.data['carState'] = SimpleNamespace(vEgo=fix['speed'])
+    self.updated['carState'] = True
+    self.updated['controlsState'] = True
+    self.updated['gpsLocationExternal'] = new_fix
+    if new_fix:
+      self.data['gpsLocationExternal'] = SimpleNamespace(flags=1, bearingAccuracyDeg=1., **fix)
+
+
+class ReplayPubMaster():
+  """Minimal PubMaster stand-in collecting the published messages."""
+  def __init__(self):
+    self.sent = []
+
+  def send(self, s, dat):
+    self.sent.append((s, dat))
+
+
+class StageTimer():
+  def __init__(self):
+    self.samples = {stage: [] for stage in _STAGES}
+
+  def time(self, stage, fn, *args):
+    t = time.monotonic()
+    result = fn(*args)
+    self.samples[stage].append(time.monotonic() - t)
+    return result
+
+  def report(self):
+    report = {}
+    for stage, samples in self.samples.items():
+      if len(samples) == 0:
+        continue
+      ms = np.array(samples) * 1e3
+      report[stage] = {'count': len(ms), 'mean': float(np.mean(ms)), 'p50': float(np.percentile(ms, 50)),
+                       'p90': float(np.percentile(ms, 90)), 'p99': float(np.percentile(ms, 99)),
+                       'max': float(np.max(ms))}
+    return report
+
+
+def replay(ways, fixes, cache_root, latency=0., route_strategy=ROUTE_STRATEGY, rate=1.):
+  """Replays `fixes` through a MapD instance served by the `ways` fixture running the loop at `rate` (Hz). Time is
+  simulated, so the replay runs as fast as possible. Returns the report dictionary."""
+  mapd = mapd_module.MapD(route_strategy)
+  api = FileOverpass(ways, latency=latency)
+  mapd.osm = DPOSM(cache=OSMTileCache(root=cache_root))
+  mapd.osm.api = api
+
+  timer = StageTimer()
+  query = mapd._query_osm
+  mapd._query_osm = lambda *args: timer.time('query', query, *args)
+
+  # Simulated monotonic clock driving the dead reckoning.
+  clock = [0.]
+  mapd_module.sec_since_boot = lambda: clock[0]
+
+  sm = ReplaySubMaster()
+  pm = ReplayPubMaster()
+  located = 0
+  ticks = 0
+  cpu_time = time.process_time()
+  for i, fix in enumerate(fixes):
+    fix_interval = (fixes[i + 1]['timestamp'] - fix['timestamp']) * 1e-3 if i + 1 < len(fixes) else 1.
+    for tick in range(max(int(round(fix_interval * rate)), 1)):
+      clock[0] = (fix['timestamp'] - fixes[0]['timestamp']) * 1e-3 + tick / rate
+      sm.feed(fix, tick == 0)
+      t = time.monotonic()
+      mapd.udpate_state(sm)
+      mapd.update_car_state(sm)
+      timer.time('update_gps', mapd.update_gps, sm)
+      timer.time('updated_osm_data', mapd.updated_osm_data)
+      # Wait on queries to make the replay deterministic. Query time is reported on its own stage.
+      t_query = time.monotonic()
+      if mapd._query_thread is not None:
+        mapd._query_thread.join()
+      t_query = time.monotonic() - t_query
+      timer.time('update_route', mapd.update_route)
+      timer.time('dead_reckon', mapd.dead_reckon)
+      timer.time('publish', mapd.publish, pm, sm)
+      timer.samples['total'].append(time.monotonic() - t - t_query)
+      located += mapd.route is not None and mapd.route.located
+      ticks += 1
+  cpu_time = time.process_time() - cpu_time
+  duration = (fixes[-1]['timestamp'] - fixes[0]['timestamp']) * 1e-3 + 1. if len(fixes) > 0 else 0.
+
+  return {
+    'fixes': len(fixes),
+    'rate': rate,
+    'ticks': ticks,
+    'located_ticks': int(located),
+    'published': len(pm.sent),
+    'route_strategy': route_strategy,
+    'route_builds': mapd.route_builds,
+    'trace_length': trace_length(fixes),
+    'duration': duration,
+    'cpu_time': cpu_time,
+    'cpu_usage': cpu_time / duration if duration > 0. else 0.,
+    'osm': dict(mapd.osm.stats, overpass_queries=api.query_count),
+    'stages_ms': timer.report(),
+  }
+
+
+def print_report(report):
+  print(f'{report["fixes"]} fixes over {report["trace_length"]:.0f} mts and {report["duration"]:.0f} s at '
+        f'{report["rate"]:.0f} Hz. Located on {report["located_ticks"]} of {report["ticks"]} ticks, '
+        f'published {report["published"]} messages.')
+  print(f'CPU: {report["cpu_time"]:.2f} s, {report["cpu_usage"] * 100.:.2f} % of one core.')
+  print(f'Route strategy: {report["route_strategy"]}, {report["route_builds"]} routes built.')
+  print(f'OSM: {report["osm"]}')
+  print(f'{"stage (ms)":<18}{"count":>8}{"mean":>10}{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}')
+  for stage, s in report['stages_ms'].items():
+    print(f'{stage:<18}{s["count"]:>8}{s["mean"]:>10.2f}{s["p50"]:>10.2f}{s["p90"]:>10.2f}{s["p99"]:>10.2f}'
+          f'{s["max"]:>10.2f}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Replay gps traces through mapd offline and report stage latencies.')
+  parser.add_argument('--osm', help='OSM fixture. Overpass json output (.json) or OSM xml (.osm, .xml)')
+  parser.add_argument('--trace', help='gps trace. gpxd GPX file (.gpx) or json list of fixes (.json)')
+  parser.add_argument('--synthetic', action='store_true', help='replay a synthetic trace across a grid city')
+  parser.add_argument('--latency', type=float, default=0., help='simulated Overpass latency in seconds')
+  parser.add_argument('--strategy', choices=[ROUTE_STRATEGY_FIX, ROUTE_STRATEGY_HMM], default=ROUTE_STRATEGY,
+                      help='route matching strategy')
+  parser.add_argument('--rate', type=float, nargs='+', default=[1.],
+                      help='loop rates in Hz to replay at. e.g. --rate 1 5 10 to compare CPU usage')
+  parser.add_argument('--cache', help='OSM tile cache directory. A temporary empty cache by default')
+  parser.add_argument('--report', help='write the report as json to this file')
+  args = parser.parse_args()
+
+  if args.synthetic:
+    ways, fixes = synthetic_scenario()
+  elif args.osm is not None and args.trace is not None:
+    ways = load_osm_fixture(args.osm)
+    fixes = load_trace(args.trace)
+  else:
+    parser.error('either --synthetic or both --osm and --trace are required')
+
+  reports = {}
+  for rate in args.rate:
+    if args.cache is not None:
+      report = replay(ways, fixes, args.cache, args.latency, args.strategy, rate)
+    else:
+      with tempfile.TemporaryDirectory() as cache_root:
+        report = replay(ways, fixes, cache_root, args.latency, args.strategy, rate)
+
+    print_report(report)
+    reports[f'{rate:g}'] = report
+
+  if args.report is not None:
+    with open(args.report, 'w') as f:
+      json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+  main()
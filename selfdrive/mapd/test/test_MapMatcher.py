@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from selfdrive.mapd.lib.mock_data import MockOSM
+from selfdrive.mapd.lib.WayCollection import WayCollection
+from selfdrive.mapd.lib.benchmark_refs import GRID_CENTER, STREET_GRID_SIZE, STREET_GRID_SPACING, \
+  matched_route_per_fix, noisy_street_fixes, route_per_fix, street_points
+
+
+class TestMapMatcher(unittest.TestCase):
+  def setUp(self):
+    self.ways = MockOSM.grid_ways(GRID_CENTER, STREET_GRID_SIZE, STREET_GRID_SPACING)
+    self.query_center = np.radians(np.array(GRID_CENTER))
+    self.street = f'Street {STREET_GRID_SIZE // 2}'
+
+  def _on_street(self, current):
+    return sum(wr is not None and wr.name == self.street for wr in current) / len(current)
+
+  def test_matched_route_follows_street(self):
+    wc = WayCollection(self.ways, self.query_center)
+    fixes = MockOSM.fixes_along(street_points(STREET_GRID_SIZE // 2), 100, noise=2.)
+    current, builds = matched_route_per_fix(wc, fixes, 5.)
+
+    self.assertGreater(self._on_street(current), 0.95)
+    self.assertEqual([wr.name for wr in wc.map_matcher.path()], [self.street] * 10)
+    self.assertLess(builds, 5)
+
+  def test_no_match_away_from_ways(self):
+    wc = WayCollection(self.ways, self.query_center)
+    location_rad = np.radians(np.array([GRID_CENTER[0] + 1., GRID_CENTER[1]]))
+    self.assertIsNone(wc.get_matched_route(None, location_rad, 0., 5.))
+    self.assertEqual(wc.map_matcher.path(), [])
+
+  def test_rebuild_count(self):
+    # Poor accuracy fixes along a street. Single fix locating keeps loosing the route next to the crossings.
+    fixes = noisy_street_fixes()
+    per_fix_current, per_fix_builds = route_per_fix(WayCollection(self.ways, self.query_center), fixes, 5.)
+    matched_current, matched_builds = matched_route_per_fix(WayCollection(self.ways, self.query_center), fixes, 5.)
+
+    self.assertLess(matched_builds, per_fix_builds)
+    self.assertGreater(self._on_street(matched_current), 0.98)
+
+if __name__ == "__main__":
+  unittest.main()
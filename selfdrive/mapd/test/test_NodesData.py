@@ -1,8 +1,10 @@
 import unittest
 import numpy as np
 from numpy.testing import assert_array_almost_equal
-from selfdrive.mapd.lib.mock_data import MockRoad
-from selfdrive.mapd.lib.NodesData import vectors
+from selfdrive.mapd.lib.mock_data import MockRoad, MockOSM
+from selfdrive.mapd.lib.NodesData import vectors, NodesData, node_calculations, spline_curvature_calculations, \
+  speed_limits_for_curvatures_data, NodeDataIdx
+from selfdrive.mapd.lib.benchmark_refs import fork_way_collection
 
 
 class TestNodesData(unittest.TestCase):
@@ -92,3 +94,46 @@ class TestNodesData(unittest.TestCase):
 
     v = vectors(points)
     assert_array_almost_equal(v, expected)
+
+
+class TestNodesDataMemoized(unittest.TestCase):
+  def setUp(self):
+    self.wc, self.points = fork_way_collection()
+
+  def test_route_curvature_sections(self):
+    location_rad, bearing_rad = MockOSM.fixes_along(self.points, 10, noise=0.)[1]
+    route = self.wc.get_route(location_rad, bearing_rad, 5.)
+    nodes_data = route._nodes_data
+
+    # Turn speed sections of the route are the ones of a spline on the whole route.
+    vect = np.column_stack((nodes_data.get(NodeDataIdx.x), nodes_data.get(NodeDataIdx.y)))
+    curv, curv_ds = spline_curvature_calculations(vect, nodes_data.get(NodeDataIdx.dist_prev))
+    expected = speed_limits_for_curvatures_data(curv, curv_ds)
+    self.assertGreater(len(expected), 1)
+    np.testing.assert_allclose(nodes_data._curvature_speed_sections_data, expected, rtol=1e-9)
+
+  def test_route_node_data(self):
+    location_rad, bearing_rad = MockOSM.fixes_along(self.points, 10, noise=0.)[1]
+    route = self.wc.get_route(location_rad, bearing_rad, 5.)
+    nodes_data = route._nodes_data
+
+    # Node data concatenated from the memoized ways is the one calculated on the whole route.
+    points = np.radians(np.column_stack((nodes_data.get(NodeDataIdx.lat), nodes_data.get(NodeDataIdx.lon))))
+    expected = np.column_stack(node_calculations(points))
+    np.testing.assert_allclose(nodes_data._nodes_data[:, NodeDataIdx.x.value:], expected, rtol=1e-9, atol=1e-9)
+
+    # Calculations are memoized on the way relations and reused by the next route.
+    calculations = [wr.nodes_calculations[wr.direction] for wr in route._ordered_way_relations]
+    NodesData(route._ordered_way_relations, self.wc.wr_index)
+    self.assertEqual(calculations, [wr.nodes_calculations[wr.direction] for wr in route._ordered_way_relations])
+
+  def test_route_regeneration_after_fork(self):
+    # Locate before the fork, then regenerate the route after taking the fork.
+    location_rad, bearing_rad = MockOSM.fixes_along(self.points, 10, noise=0.)[1]
+    self.wc.get_route(location_rad, bearing_rad, 5.)
+    fork_wr = next(wr for wr in self.wc.way_relations if wr.name == 'Fork')
+    location_rad = np.mean(np.radians(fork_wr.nodes_deg[5:7]), axis=0)
+    bearing_rad = np.arctan2(*np.diff(fork_wr.nodes_deg[5:7], axis=0)[0][::-1])
+    route = self.wc.get_route(location_rad, bearing_rad, 5.)
+    self.assertEqual(route.current_wr.name, 'Fork')
+    self.assertGreater(len(route._ordered_way_relations), 1)
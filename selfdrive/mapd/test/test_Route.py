@@ -0,0 +1,30 @@
+import unittest
+import numpy as np
+from selfdrive.mapd.lib.mock_data import MockOSM, MockRoad
+from selfdrive.mapd.lib.WayCollection import WayCollection
+
+
+class TestRoute(unittest.TestCase):
+  def setUp(self):
+    ways = MockOSM.road_ways(MockRoad.road1_points_grad)
+    wc = WayCollection(ways, np.radians(MockRoad.road1_points_grad[40]))
+    location_rad, bearing_rad = MockOSM.fixes_along(MockRoad.road1_points_grad, 100, noise=0.)[20]
+    self.route = wc.get_route(location_rad, bearing_rad, 5.)
+
+  def test_advance(self):
+    distance_to_end = self.route.distance_to_end
+    limits_ahead = self.route.speed_limits_ahead
+
+    self.route.advance(100.)
+    self.assertTrue(self.route.located)
+    self.assertAlmostEqual(self.route.distance_to_end, distance_to_end - 100., places=3)
+    self.assertEqual(len(self.route.speed_limits_ahead), len(limits_ahead))
+    self.assertAlmostEqual(self.route.speed_limits_ahead[0].end, limits_ahead[0].end - 100., places=3)
+
+    # Route is lost when advancing past its end.
+    self.route.advance(distance_to_end)
+    self.assertFalse(self.route.located)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from selfdrive.mapd.lib.mock_data import MockOSM, MockRoad
+from selfdrive.mapd.lib.WayCollection import WayCollection
+from selfdrive.mapd.lib.benchmark_refs import GRID_CENTER, fixes_along_grid_street
+
+
+def _route_ids(route):
+  return [wr.id for wr in route._ordered_way_relations] if route is not None else None
+
+
+class TestWayCollection(unittest.TestCase):
+  def _check_spatial_index(self, size, spacing):
+    ways = MockOSM.grid_ways(GRID_CENTER, size, spacing)
+    query_center = np.radians(np.array(GRID_CENTER))
+    wc_linear = WayCollection(ways, query_center, use_spatial_index=False, vectorized=False)
+    wc_indexed = WayCollection(ways, query_center, vectorized=False)
+
+    for location_rad, bearing_rad in fixes_along_grid_street(size, spacing):
+      route_linear = wc_linear.get_route(location_rad, bearing_rad, 5.)
+      route_indexed = wc_indexed.get_route(location_rad, bearing_rad, 5.)
+      self.assertIsNotNone(route_indexed)
+      self.assertEqual(_route_ids(route_indexed), _route_ids(route_linear))
+
+  def test_dense_collection(self):
+    self._check_spatial_index(40, 100.)
+
+  def test_sparse_collection(self):
+    self._check_spatial_index(12, 500.)
+
+  def test_no_candidates_away_from_ways(self):
+    ways = MockOSM.grid_ways(GRID_CENTER, 5, 100.)
+    wc = WayCollection(ways, np.radians(np.array(GRID_CENTER)))
+    location_rad = np.radians(np.array([GRID_CENTER[0] + 1., GRID_CENTER[1]]))
+    self.assertEqual(wc.candidate_way_relations(location_rad), [])
+    self.assertIsNone(wc.get_route(location_rad, 0., 5.))
+
+  def test_vectorized_update_matches_per_way_update(self):
+    ways = MockOSM.grid_ways(MockRoad.road1_points_grad[40], 20, 150.) + \
+      MockOSM.road_ways(MockRoad.road1_points_grad)
+    query_center = np.radians(MockRoad.road1_points_grad[40])
+    wc_per_way = WayCollection(ways, query_center, vectorized=False)
+    wc_vectorized = WayCollection(ways, query_center)
+    fixes = MockOSM.fixes_along(MockRoad.road1_points_grad, 200) + \
+      MockOSM.fixes_along(MockRoad.road1_points_grad[::-1], 200, noise=15., seed=1)
+
+    located = 0
+    for location_rad, bearing_rad in fixes:
+      route_per_way = wc_per_way.get_route(location_rad, bearing_rad, 10.)
+      route_vectorized = wc_vectorized.get_route(location_rad, bearing_rad, 10.)
+      self.assertEqual(_route_ids(route_vectorized), _route_ids(route_per_way))
+      located += route_vectorized is not None
+
+      for wr_a, wr_b in zip(wc_per_way.candidate_way_relations(location_rad),
+                            wc_vectorized.candidate_way_relations(location_rad)):
+        self.assertEqual((wr_a.active, wr_a.direction, wr_a.ahead_idx, wr_a.diverting),
+                         (wr_b.active, wr_b.direction, wr_b.ahead_idx, wr_b.diverting))
+        self.assertEqual(wr_a.distance_to_way, wr_b.distance_to_way)
+        self.assertEqual(wr_a.active_bearing_delta, wr_b.active_bearing_delta)
+        self.assertEqual(wr_a.distance_to_node_ahead, wr_b.distance_to_node_ahead)
+
+    self.assertGreater(located, len(fixes) * 0.9)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -3,7 +3,10 @@ from unittest import mock
 from datetime import datetime as dt, timezone, timedelta
 from selfdrive.config import Conversions as CV
 from selfdrive.mapd.lib.WayRelation import is_osm_time_condition_active, speed_limit_for_osm_tag_limit_string, \
-  conditional_speed_limit_for_osm_tag_limit_string
+  conditional_speed_limit_for_osm_tag_limit_string, time_condition_schedule, minute_of_week, WayRelation
+from selfdrive.mapd.lib.WayStore import WayStore
+from selfdrive.mapd.lib.mock_data import MockOSM
+from selfdrive.mapd.lib.geo import DIRECTION
 
 
 class TestWayRelation(unittest.TestCase):
@@ -167,3 +170,40 @@ class TestWayRelation(unittest.TestCase):
     result = [conditional_speed_limit_for_osm_tag_limit_string(ls) for ls in values]
 
     self.assertEqual(result, expected)
+
+
+class TestWayRelationSpeedLimit(unittest.TestCase):
+  def _way_relation(self, tags):
+    ways = MockOSM.road_ways([[52.2, 13.87], [52.2, 13.871]], tags=tags)
+    return WayRelation(WayStore(ways), 0)
+
+  def test_time_condition_schedule(self):
+    schedule = time_condition_schedule("Tu-Th 10:00-10:30")
+    tue, thu = dt(2021, 8, 31), dt(2021, 9, 2)
+
+    self.assertTrue(schedule.is_active(minute_of_week(tue.replace(hour=10))))
+    self.assertTrue(schedule.is_active(minute_of_week(thu.replace(hour=10, minute=30))))
+    self.assertFalse(schedule.is_active(minute_of_week(thu.replace(hour=10, minute=31))))
+    self.assertFalse(schedule.is_active(minute_of_week(dt(2021, 9, 3, 10, 10))))
+    # Schedules are cached by condition string.
+    self.assertIs(time_condition_schedule("Tu-Th 10:00-10:30"), schedule)
+
+  @mock.patch('selfdrive.mapd.lib.WayRelation.dt')
+  def test_speed_limit_per_direction(self, mock_dt):
+    mock_dt.now.return_value = dt(2021, 9, 1, 10, 10, 0)
+    wr = self._way_relation({'highway': 'primary', 'maxspeed:forward': '50', 'maxspeed:backward': '70',
+                             'maxspeed:backward:conditional': '30 @ (Mo-Fr 07:00-11:00)'})
+
+    wr.direction = DIRECTION.FORWARD
+    self.assertEqual(wr.speed_limit, 50. * CV.KPH_TO_MS)
+    wr.direction = DIRECTION.BACKWARD
+    self.assertEqual(wr.speed_limit, 30. * CV.KPH_TO_MS)
+    mock_dt.now.return_value = dt(2021, 9, 1, 12, 0, 0)
+    self.assertEqual(wr.speed_limit, 70. * CV.KPH_TO_MS)
+
+    # Changing direction does not parse the tags again.
+    with mock.patch('selfdrive.mapd.lib.WayRelation.re') as mock_re:
+      for direction in [DIRECTION.FORWARD, DIRECTION.BACKWARD] * 2:
+        wr.direction = direction
+        wr.speed_limit
+      mock_re.match.assert_not_called()
@@ -0,0 +1,50 @@
+import gc
+import sys
+import types
+import unittest
+import numpy as np
+from selfdrive.mapd.lib.mock_data import MockOSM
+from selfdrive.mapd.lib.WayStore import WayStore
+
+
+def _deep_size(obj):
+  """Provides the size of `obj` and all the objects it references, other than types, modules and functions.
+  """
+  seen, size, pending = set(), 0, [obj]
+  while pending:
+    obj = pending.pop()
+    if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+      continue
+    seen.add(id(obj))
+    size += sys.getsizeof(obj)
+    pending.extend(gc.get_referents(obj))
+  return size
+
+
+class TestWayStore(unittest.TestCase):
+  def test_store_content(self):
+    ways = MockOSM.grid_ways([52.2, 13.87], 5, 100.)
+    store = WayStore(ways)
+
+    self.assertEqual(len(store), len(ways))
+    for idx, way in enumerate(ways):
+      nodes = way.nodes
+      self.assertEqual(store.way_ids[idx], way.id)
+      np.testing.assert_array_equal(store.node_ids[store.way_slice(idx)], [nd.id for nd in nodes])
+      np.testing.assert_array_equal(store.nodes_deg[store.way_slice(idx)], [[nd.lat, nd.lon] for nd in nodes])
+      self.assertEqual(store.way_tags(idx), way.tags)
+
+    # Ways with identical tags share the same dictionary.
+    self.assertIs(store.way_tags(1), store.way_tags(3))
+
+  def test_memory(self):
+    ways = MockOSM.grid_ways([52.2, 13.87], 60, 50.)
+    store = WayStore(ways)
+
+    # The arrays and the shared tag dictionaries against the overpy object graph.
+    store_size = store.nbytes + _deep_size(store._tags)
+    self.assertLess(store_size, _deep_size(ways) / 4)
+
+
+if __name__ == "__main__":
+  unittest.main()
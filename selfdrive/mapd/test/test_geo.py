@@ -1,6 +1,17 @@
 import unittest
+import numpy as np
+from selfdrive.mapd.lib.geo import point_at_distance, distance_to_points, bearing_to_points
 
 
 class TestMapsdGeoLibrary(unittest.TestCase):
   def test_vectors(self):
     pass
+
+  def test_point_at_distance(self):
+    point = np.radians(np.array([52.2, 13.87]))
+    for bearing in np.radians([0., 45., 90., 180., 270.]):
+      for distance in [10., 1000., 5000.]:
+        new_point = point_at_distance(point, bearing, distance)
+        self.assertAlmostEqual(distance_to_points(point, np.array([new_point]))[0], distance, places=3)
+        delta = bearing_to_points(point, np.array([new_point]))[0] - bearing
+        self.assertAlmostEqual(np.cos(delta), 1., places=6)
@@ -0,0 +1,139 @@
+import os
+import time
+import unittest
+import overpy
+from common.file_helpers import NamedTemporaryDir
+from selfdrive.mapd.lib.osm_cache import OSMTileCache
+from selfdrive.mapd.lib.dp_osm import DPOSM
+
+
+_LAT, _LON = 52.2, 13.87
+
+
+def _mock_ways(lat=_LAT, lon=_LON, count=10, step=0.002):
+  """Provides a set of parallel north bound ways around `lat`, `lon` as overpy Way objects.
+  """
+  elements = []
+  for i in range(count):
+    node_ids = []
+    for j in range(count):
+      node_id = i * count + j + 1
+      node_ids.append(node_id)
+      elements.append({'type': 'node', 'id': node_id, 'lat': lat + (j - count / 2) * step,
+                       'lon': lon + (i - count / 2) * step})
+    elements.append({'type': 'way', 'id': 1000 + i, 'nodes': node_ids, 'tags': {'highway': 'primary'}})
+  return overpy.Result.from_json({'elements': elements}).ways
+
+
+class MockOverpass():
+  def __init__(self, ways):
+    self.ways = ways
+    self.query_count = 0
+
+  def query(self, q):
+    self.query_count += 1
+    if self.ways is None:
+      raise Exception('Network down')
+    return overpy.Result.from_json({'elements': []}) if len(self.ways) == 0 else self.ways[0]._result
+
+
+class TestOSMTileCache(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = NamedTemporaryDir()
+
+  def tearDown(self):
+    self.tmp_dir.close()
+
+  def test_store_and_load(self):
+    cache = OSMTileCache(root=self.tmp_dir.name)
+    ways = _mock_ways()
+    cache.store(ways, _LAT, _LON, 3000)
+
+    loaded = cache.load(_LAT, _LON, 1000)
+    self.assertIsNotNone(loaded)
+    self.assertEqual(sorted(w.id for w in loaded), sorted(w.id for w in ways))
+    for way in loaded:
+      original = next(w for w in ways if w.id == way.id)
+      self.assertEqual([nd.id for nd in way.nodes], [nd.id for nd in original.nodes])
+      self.assertEqual(way.tags, original.tags)
+    self.assertEqual(cache.stats['hits'], 1)
+
+    # Area not covered by the stored query must miss.
+    self.assertIsNone(cache.load(_LAT + 1., _LON, 1000))
+    self.assertEqual(cache.stats['misses'], 1)
+
+    # A new cache instance reloads the index from disk.
+    cache = OSMTileCache(root=self.tmp_dir.name)
+    self.assertIsNotNone(cache.load(_LAT, _LON, 1000))
+
+  def test_ttl(self):
+    cache = OSMTileCache(root=self.tmp_dir.name, ttl=-1.)
+    cache.store(_mock_ways(), _LAT, _LON, 3000)
+
+    self.assertIsNone(cache.load(_LAT, _LON, 1000))
+    self.assertIsNotNone(cache.load(_LAT, _LON, 1000, allow_stale=True))
+    self.assertEqual(cache.stats['stale_hits'], 1)
+
+  def test_lru_eviction(self):
+    cache = OSMTileCache(root=self.tmp_dir.name)
+    cache.store(_mock_ways(), _LAT, _LON, 3000)
+    tile_count = len(os.listdir(self.tmp_dir.name))
+    size = cache.size
+
+    # Access the tiles on the center, then shrink budget to half. Center tiles must survive.
+    time.sleep(0.01)
+    self.assertIsNotNone(cache.load(_LAT, _LON, 500))
+    center_tiles = cache.tiles_for_circle(_LAT, _LON, 500)
+    cache.max_size = size // 2
+    cache._evict()
+
+    self.assertLessEqual(cache.size, size // 2)
+    self.assertGreater(cache.stats['evictions'], 0)
+    self.assertLess(len(os.listdir(self.tmp_dir.name)), tile_count)
+    self.assertIsNotNone(cache.load(_LAT, _LON, 500))
+    for tile in center_tiles:
+      self.assertTrue(os.path.exists(cache._tile_path(tile)))
+
+
+class TestDPOSMCache(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = NamedTemporaryDir()
+
+  def tearDown(self):
+    self.tmp_dir.close()
+
+  def test_cache_hit_skips_query(self):
+    osm = DPOSM(cache=OSMTileCache(root=self.tmp_dir.name))
+    osm.api = MockOverpass(_mock_ways())
+
+    ways = osm.fetch_road_ways_around_location(_LAT, _LON, 0., 1000)
+    self.assertEqual(len(ways), 10)
+    self.assertEqual(osm.api.query_count, 1)
+
+    ways = osm.fetch_road_ways_around_location(_LAT, _LON, 0., 1000)
+    self.assertEqual(len(ways), 10)
+    self.assertEqual(osm.api.query_count, 1)
+    self.assertEqual(osm.stats['hits'], 1)
+    self.assertEqual(osm.stats['queries'], 1)
+
+  def test_offline_fallback(self):
+    osm = DPOSM(cache=OSMTileCache(root=self.tmp_dir.name, ttl=-1.))
+    osm.api = MockOverpass(_mock_ways())
+    osm.fetch_road_ways_around_location(_LAT, _LON, 0., 1000)
+
+    # Network down, stale data is served.
+    osm.api.ways = None
+    ways = osm.fetch_road_ways_around_location(_LAT, _LON, 0., 1000)
+    self.assertEqual(len(ways), 10)
+    self.assertEqual(osm.stats['query_failures'], 1)
+    self.assertEqual(osm.stats['stale_hits'], 1)
+
+    # Offline mode never queries.
+    osm.offline = True
+    ways = osm.fetch_road_ways_around_location(_LAT, _LON, 0., 1000)
+    self.assertEqual(len(ways), 10)
+    self.assertEqual(osm.api.query_count, 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,109 @@
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+from selfdrive.mapd.lib.mock_data import MockOSM
+from selfdrive.mapd.lib.dp_osm import DPOSM
+from selfdrive.mapd.lib.osm_cache import OSMTileCache
+from selfdrive.mapd.lib.replay_data import FileOverpass, load_osm_fixture, load_trace, synthetic_scenario, \
+  synthetic_trace
+from selfdrive.mapd.lib.WayCollection import WayCollection
+
+
+_CENTER = [52.2, 13.87]
+
+
+class TestFileOverpass(unittest.TestCase):
+  def setUp(self):
+    self.ways = MockOSM.grid_ways(_CENTER, 20, 100.)
+    self.api = FileOverpass(self.ways)
+
+  def test_around_query(self):
+    osm = DPOSM(cache=OSMTileCache(root=tempfile.mkdtemp()))
+    osm.api = self.api
+    ways = osm.fetch_road_ways_around_location(_CENTER[0], _CENTER[1], 0., 300.)
+
+    self.assertEqual(self.api.query_count, 1)
+    self.assertGreater(len(ways), 0)
+    self.assertLess(len(ways), len(self.ways))
+    # All ways returned have a node within the query radius from the query center.
+    center = np.radians(osm.query_center(_CENTER[0], _CENTER[1], 0., 300.))
+    for way in ways:
+      nodes = np.radians(np.array([[nd.lat, nd.lon] for nd in way.nodes], dtype=float))
+      self.assertLessEqual(np.min(np.linalg.norm((nodes - center) * [1., np.cos(center[0])], axis=1)) * 6.371e6,
+                           301.)
+
+  def test_bbox_query(self):
+    result = self.api.query(f'way({_CENTER[0] - 0.001},{_CENTER[1] - 0.001},{_CENTER[0] + 0.001},'
+                            f'{_CENTER[1] + 0.001});out;')
+    self.assertGreater(len(result.ways), 0)
+    for way in result.ways:
+      self.assertTrue(any(abs(float(nd.lat) - _CENTER[0]) <= 0.001 and abs(float(nd.lon) - _CENTER[1]) <= 0.001
+                          for nd in way.nodes))
+
+  def test_fixture_round_trip(self):
+    result = self.api.query(f'way(around:100000,{_CENTER[0]},{_CENTER[1]});out;')
+    self.assertEqual(sorted(w.id for w in result.ways), sorted(w.id for w in self.ways))
+
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'fixture.json')
+      elements = [{'type': 'way', 'id': w.id, 'nodes': [nd.id for nd in w.nodes], 'tags': w.tags}
+                  for w in self.ways]
+      elements += [{'type': 'node', 'id': nd.id, 'lat': float(nd.lat), 'lon': float(nd.lon)}
+                   for w in self.ways for nd in w.nodes]
+      with open(path, 'w') as f:
+        json.dump({'elements': elements}, f)
+      self.assertEqual(len(load_osm_fixture(path)), len(self.ways))
+
+
+class TestTraces(unittest.TestCase):
+  def test_synthetic_trace(self):
+    fixes = synthetic_trace([_CENTER, [_CENTER[0], _CENTER[1] + 0.01]], speed=20., rate=1.)
+
+    self.assertGreater(len(fixes), 30)
+    np.testing.assert_allclose([f['speed'] for f in fixes[:-1]], 20., rtol=1e-3)
+    np.testing.assert_allclose([f['bearingDeg'] for f in fixes], 90., atol=0.1)
+    self.assertTrue(all(b['timestamp'] - a['timestamp'] == 1000 for a, b in zip(fixes[:-1], fixes[1:])))
+
+  def test_synthetic_scenario_on_street(self):
+    ways, fixes = synthetic_scenario()
+    wc = WayCollection(ways, np.radians(_CENTER))
+
+    # The trace runs along a street, so a single route is matched and never diverted from.
+    route = None
+    for fix in fixes:
+      location_rad = np.radians([fix['latitude'], fix['longitude']])
+      bearing_rad = np.radians(fix['bearingDeg'])
+      if route is None:
+        route = wc.get_route(location_rad, bearing_rad, fix['accuracy'])
+      else:
+        route.update(location_rad, bearing_rad, fix['accuracy'])
+      self.assertTrue(route.located)
+      self.assertFalse(route.current_wr.diverting)
+      self.assertLess(route.current_wr.distance_to_way, 1.)
+
+  def test_load_gpx(self):
+    gpx = '''<?xml version="1.0" encoding="utf-8"?>
+<gpx version="1.1" creator="dragonpilot https://github.com/dragonpilot-community/dragonpilot"
+     xmlns="http://www.topografix.com/GPX/1/1">
+<trk><trkseg>
+<trkpt lat="52.2" lon="13.87"><ele>10</ele><time>2021-05-01T10:00:00Z</time></trkpt>
+<trkpt lat="52.2001" lon="13.87"><ele>10</ele><time>2021-05-01T10:00:01Z</time></trkpt>
+<trkpt lat="52.2002" lon="13.87"><ele>10</ele><time>2021-05-01T10:00:02Z</time></trkpt>
+</trkseg></trk>
+</gpx>'''
+    with tempfile.TemporaryDirectory() as d:
+      path = os.path.join(d, 'trace.gpx')
+      with open(path, 'w') as f:
+        f.write(gpx)
+      fixes = load_trace(path)
+
+    self.assertEqual(len(fixes), 3)
+    self.assertAlmostEqual(fixes[0]['bearingDeg'], 0., places=3)
+    self.assertAlmostEqual(fixes[0]['speed'], 11.1, places=0)
+    self.assertEqual(fixes[1]['timestamp'] - fixes[0]['timestamp'], 1000)
+
+
+if __name__ == "__main__":
+  unittest.main()
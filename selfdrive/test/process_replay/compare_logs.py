@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+import bz2
+import sys
+import math
+from collections import defaultdict
+
+from tools.lib.logreader import LogReader
+
+
+def save_log(dest, log_msgs):
+  dat = b"".join(msg.as_builder().to_bytes() for msg in log_msgs)
+  if dest.endswith(".bz2"):
+    dat = bz2.compress(dat)
+
+  with open(dest, "wb") as f:
+    f.write(dat)
+
+
+def _flatten(d, prefix=""):
+  """Flattens a message dictionary to {dotted path: value}. Lists are flattened by index."""
+  items = d.items() if isinstance(d, dict) else enumerate(d)
+  flat = {}
+  for k, v in items:
+    path = f"{prefix}.{k}" if prefix else str(k)
+    if isinstance(v, (dict, list)) and len(v) > 0:
+      flat.update(_flatten(v, path))
+    else:
+      flat[path] = v
+  return flat
+
+
+def _ignored(path, ignore_fields):
+  return any(path == f or path.startswith(f + ".") for f in ignore_fields)
+
+
+def _values_differ(a, b, tolerance):
+  if tolerance is not None and isinstance(a, float) and isinstance(b, float):
+    return not (a == b or (math.isnan(a) and math.isnan(b)) or
+                abs(a - b) <= tolerance * max(abs(a), abs(b), 1.))
+  return a != b
+
+
+def compare_logs(log1, log2, ignore_fields=None, ignore_msgs=None, tolerance=None):
+  """Compares the messages of each service in order. Returns a list of (service, index, path, value1, value2), with
+  None values when a message or field is missing on one side."""
+  ignore_fields = [] if ignore_fields is None else ignore_fields
+  ignore_msgs = [] if ignore_msgs is None else ignore_msgs
+
+  by_service1, by_service2 = defaultdict(list), defaultdict(list)
+  for msgs, by_service in [(log1, by_service1), (log2, by_service2)]:
+    for msg in msgs:
+      if msg.which() not in ignore_msgs:
+        by_service[msg.which()].append(msg)
+
+  diff = []
+  for s in sorted(set(by_service1) | set(by_service2)):
+    msgs1, msgs2 = by_service1[s], by_service2[s]
+    for i in range(max(len(msgs1), len(msgs2))):
+      if i >= len(msgs1) or i >= len(msgs2):
+        diff.append((s, i, None, i < len(msgs1) or None, i < len(msgs2) or None))
+        continue
+
+      flat1 = _flatten(msgs1[i].to_dict(verbose=True))
+      flat2 = _flatten(msgs2[i].to_dict(verbose=True))
+      for path in sorted(set(flat1) | set(flat2)):
+        if _ignored(path, ignore_fields):
+          continue
+        v1, v2 = flat1.get(path), flat2.get(path)
+        if _values_differ(v1, v2, tolerance):
+          diff.append((s, i, path, v1, v2))
+  return diff
+
+
+def format_diff(diff, max_lines=50):
+  lines = []
+  for s, i, path, v1, v2 in diff[:max_lines]:
+    if path is None:
+      lines.append(f"  {s}[{i}]: message missing on {'new' if v1 else 'reference'} log")
+    else:
+      lines.append(f"  {s}[{i}] {path}: {v1} -> {v2}")
+  if len(diff) > max_lines:
+    lines.append(f"  ... {len(diff) - max_lines} more")
+  return "\n".join(lines)
+
+
+if __name__ == "__main__":
+  log1 = list(LogReader(sys.argv[1]))
+  log2 = list(LogReader(sys.argv[2]))
+  ignore_fields = sys.argv[3:] or ["logMonoTime"]
+  diff = compare_logs(log1, log2, ignore_fields)
+  print(format_diff(diff) if len(diff) else "logs match")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Deterministic replay of logged inputs through the python daemons.
+
+The daemon `main(sm, pm, ...)` runs on a thread with fake SubMaster, PubMaster and can socket. The replay loop feeds
+the logged input messages in logMonoTime order and only lets the daemon run until it blocks again waiting for input,
+so each loop iteration is run in lockstep with the log, as fast as the CPU allows. `sec_since_boot` returns the
+logMonoTime of the message being fed, so outputs do not depend on the speed of the machine replaying.
+"""
+import os
+import sys
+import time
+import queue
+import importlib
+import threading
+from collections import namedtuple, deque
+
+import cereal.messaging as messaging
+import common.realtime as realtime
+from common.params import Params
+from selfdrive.manager.process_config import managed_processes
+
+# pub_sub: input services -> output services.
+# trigger: input services that run a loop iteration when received. None for daemons looping on can.
+# rate: loop rate (Hz) of daemons looping on a Ratekeeper instead of on their inputs.
+# ignore: output fields that differ between runs. tolerance: of float fields in output diffs.
+# main_args: extra arguments of the daemon main, after sm, pm and the can socket.
+ProcessConfig = namedtuple('ProcessConfig', ['proc_name', 'pub_sub', 'trigger', 'rate', 'ignore', 'tolerance',
+                                             'main_args'])
+
+TIMEOUT = 15.  # s. Without the daemon blocking again on input.
+
+
+class ReplayError(Exception):
+  pass
+
+
+class ReplayChannel():
+  """Hand-off between the replay loop and the daemon thread, which only runs while the replay loop waits on it."""
+  def __init__(self):
+    self._blocked = queue.Queue()
+    self.exception = None
+
+  def block(self, where, ready):
+    """Called from the daemon thread when it waits on input at `where` until `ready` is set."""
+    self._blocked.put(where)
+    ready.wait()
+    ready.clear()
+
+  def exit(self, exception=None):
+    self.exception = exception
+    self._blocked.put('exit')
+
+  def wait_blocked(self):
+    """Waits for the daemon to block on input. Returns where, 'can' or 'sm'."""
+    try:
+      where = self._blocked.get(timeout=TIMEOUT)
+    except queue.Empty:
+      raise ReplayError(f'Daemon did not wait for input in {TIMEOUT} s') from None
+    if where == 'exit':
+      raise ReplayError('Daemon exited') from self.exception
+    return where
+
+
+class FakeSocket():
+  """Can socket receiving the messages sent by the replay loop."""
+  def __init__(self, channel):
+    self.channel = channel
+    self.data = deque()
+    self.ready = threading.Event()
+
+  def receive(self, non_blocking=False):
+    if len(self.data) == 0 and not non_blocking:
+      self.channel.block('can', self.ready)
+    return self.data.popleft() if len(self.data) > 0 else None
+
+  def receive_last(self, wait=False):
+    dat = self.receive(non_blocking=not wait)
+    while len(self.data) > 0:
+      dat = self.data.popleft()
+    return dat
+
+  def send(self, dat):
+    self.data.append(dat)
+    self.ready.set()
+
+
+class DumbSocket():
+  def __init__(self, s=None):
+    self.data = None
+    if s is not None:
+      try:
+        dat = messaging.new_message(s)
+      except Exception:  # lists
+        dat = messaging.new_message(s, 0)
+      self.data = dat.to_bytes()
+
+  def receive(self, non_blocking=False):
+    return self.data
+
+  def send(self, dat):
+    pass
+
+  def all_readers_updated(self):
+    return True
+
+
+class FakeSubMaster(messaging.SubMaster):
+  def __init__(self, services, channel):
+    super().__init__(services, addr=None, lazy=False)
+    self.sock = {s: DumbSocket(s) for s in services}
+    self.channel = channel
+    self.ready = threading.Event()
+
+  def update(self, timeout=1000):
+    self.channel.block('sm', self.ready)
+
+  def release(self, msgs):
+    """Runs the daemon with `msgs` as the result of the pending update."""
+    # Receive time 0 as all services are alive and at their average frequency on replay.
+    self.update_msgs(0, msgs)
+    self.ready.set()
+
+
+class FakePubMaster(messaging.PubMaster):
+  def __init__(self, services):  # pylint: disable=super-init-not-called
+    self.sock = {s: DumbSocket() for s in services}
+    self.sent = []
+
+  def send(self, s, dat):
+    # Outputs not replayed, e.g. profiles, are dropped.
+    if s in self.sock:
+      self.sent.append(dat if isinstance(dat, bytes) else dat.to_bytes())
+
+  def pop_sent(self):
+    sent, self.sent = self.sent, []
+    return [messaging.log_from_bytes(dat) for dat in sent]
+
+
+class ReplayClock():
+  """Replaces sec_since_boot in the loaded modules with the logMonoTime of the message being replayed, and removes
+  the Ratekeeper sleeps."""
+  def __init__(self):
+    self.t = 0.
+    self._patched = []
+    self._sec_since_boot = realtime.sec_since_boot
+    self._keep_time = realtime.Ratekeeper.keep_time
+
+  def __call__(self):
+    return self.t
+
+  def __enter__(self):
+    for module in list(sys.modules.values()):
+      if getattr(module, 'sec_since_boot', None) is self._sec_since_boot:
+        module.sec_since_boot = self
+        self._patched.append(module)
+    realtime.Ratekeeper.keep_time = realtime.Ratekeeper.monitor_time
+    return self
+
+  def __exit__(self, *args):
+    for module in self._patched:
+      module.sec_since_boot = self._sec_since_boot
+    realtime.Ratekeeper.keep_time = self._keep_time
+
+
+def _run_daemon(channel, main, args):
+  try:
+    main(*args)
+    channel.exit()
+  except BaseException as e:  # pylint: disable=broad-except
+    channel.exit(e)
+
+
+def _replay_mapd():
+  from selfdrive.mapd.mapd import MapD  # pylint: disable=import-outside-toplevel
+  from selfdrive.mapd.lib.dp_osm import DPOSM  # pylint: disable=import-outside-toplevel
+
+  class ReplayMapD(MapD):
+    """Served from the OSM tile cache only, and querying synchronously."""
+    def __init__(self):
+      super().__init__()
+      self.osm = DPOSM(offline=True)
+
+    def _query_osm_not_blocking(self, *args, **kwargs):
+      super()._query_osm_not_blocking(*args, **kwargs)
+      self._query_thread.join()
+
+  return (ReplayMapD(),)
+
+
+CONFIGS = [
+  ProcessConfig(
+    proc_name="controlsd",
+    pub_sub={
+      "can": ["controlsState", "carState", "carControl", "sendcan", "carEvents", "carParams"],
+      "deviceState": [], "pandaState": [], "liveCalibration": [], "driverMonitoringState": [], "longitudinalPlan": [],
+      "lateralPlan": [], "liveLocationKalman": [], "liveParameters": [], "radarState": [], "modelV2": [],
+      "driverCameraState": [], "roadCameraState": [], "managerState": [], "dragonConf": [],
+    },
+    trigger=None,
+    rate=None,
+    ignore=["logMonoTime", "valid", "controlsState.startMonoTime", "controlsState.cumLagMs"],
+    tolerance=None,
+    main_args=None,
+  ),
+  ProcessConfig(
+    proc_name="radard",
+    pub_sub={
+      "can": ["radarState", "liveTracks"],
+      "carState": [], "modelV2": [],
+    },
+    trigger=None,
+    rate=None,
+    ignore=["logMonoTime", "valid", "radarState.cumLagMs"],
+    tolerance=None,
+    main_args=None,
+  ),
+  ProcessConfig(
+    proc_name="plannerd",
+    pub_sub={
+      "modelV2": ["lateralPlan", "liveMpc"], "radarState": ["longitudinalPlan", "liveLongitudinalMpc"],
+      "carState": [], "controlsState": [], "dragonConf": [], "liveMapData": [],
+    },
+    trigger=["modelV2", "radarState"],
+    rate=None,
+    ignore=["logMonoTime", "valid", "longitudinalPlan.processingDelay", "longitudinalPlan.solverExecutionTime",
+            "lateralPlan.solverExecutionTime"],
+    tolerance=None,
+    main_args=None,
+  ),
+  ProcessConfig(
+    proc_name="mapd",
+    pub_sub={
+      "gpsLocationExternal": ["liveMapData"], "controlsState": [], "carState": [],
+    },
+    trigger=None,
+    rate=10.,
+    ignore=["logMonoTime", "valid"],
+    tolerance=None,
+    main_args=_replay_mapd,
+  ),
+]
+
+
+def setup_params(msgs):
+  """Sets the params read by the daemons on start, and the fingerprint of the logged car."""
+  params = Params()
+  params.clear_all()
+  params.put_bool("OpenpilotEnabledToggle", True)
+  params.put_bool("Passive", False)
+  params.put_bool("CommunityFeaturesToggle", True)
+
+  os.environ['NO_RADAR_SLEEP'] = "1"
+  os.environ['SKIP_FW_QUERY'] = "1"
+  for msg in msgs:
+    if msg.which() == 'carParams':
+      os.environ['FINGERPRINT'] = msg.carParams.carFingerprint
+      params.put("CarParams", msg.carParams.as_builder().to_bytes())
+      return msg.carParams
+  return None
+
+
+def replay_process(cfg, lr, timings=None):
+  """Replays the input messages of `cfg` in `lr` through the daemon. Returns the published messages.
+
+  When given, `timings` is extended with the wall time in seconds of each loop iteration, from the input being fed to
+  the daemon waiting on input again.
+  """
+  all_msgs = sorted(lr, key=lambda msg: msg.logMonoTime)
+  pub_msgs = [msg for msg in all_msgs if msg.which() in cfg.pub_sub]
+  if setup_params(all_msgs) is None and cfg.proc_name != "mapd":
+    raise ReplayError("No carParams in log")
+
+  channel = ReplayChannel()
+  fsm = FakeSubMaster([s for s in cfg.pub_sub if s != 'can'], channel)
+  fpm = FakePubMaster({s for outputs in cfg.pub_sub.values() for s in outputs})
+  can_sock = FakeSocket(channel)
+  args = (fsm, fpm, can_sock) if 'can' in cfg.pub_sub else (fsm, fpm)
+  if cfg.main_args is not None:
+    args += cfg.main_args()
+
+  outputs = []
+  with ReplayClock() as clock:
+    managed_processes[cfg.proc_name].prepare()
+    mod = importlib.import_module(managed_processes[cfg.proc_name].module)
+    if len(pub_msgs) > 0:
+      clock.t = pub_msgs[0].logMonoTime * 1e-9
+    thread = threading.Thread(target=_run_daemon, args=(channel, mod.main, args), daemon=True)
+    thread.start()
+
+    where = channel.wait_blocked()
+    msg_queue = []
+    next_tick = None
+    for msg in pub_msgs:
+      clock.t = msg.logMonoTime * 1e-9
+      if msg.which() == 'can':
+        t = time.perf_counter()
+        can_sock.send(msg.as_builder().to_bytes())
+        where = channel.wait_blocked()
+        while where == 'sm':
+          fsm.release(msg_queue)
+          msg_queue = []
+          where = channel.wait_blocked()
+      else:
+        msg_queue.append(msg)
+        if cfg.rate is not None:
+          next_tick = clock.t if next_tick is None else next_tick
+          if clock.t < next_tick:
+            continue
+          next_tick += 1. / cfg.rate
+        elif cfg.trigger is not None and msg.which() not in cfg.trigger:
+          continue
+        if where != 'sm':
+          continue
+
+        t = time.perf_counter()
+        fsm.release(msg_queue)
+        msg_queue = []
+        where = channel.wait_blocked()
+
+      if timings is not None:
+        timings.append(time.perf_counter() - t)
+      outputs += fpm.pop_sent()
+
+  return outputs
+
+
+def get_process_config(proc_name):
+  return [c for c in CONFIGS if c.proc_name == proc_name][0]
+
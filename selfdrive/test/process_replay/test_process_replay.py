@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import unittest
+
+import cereal.messaging as messaging
+from cereal import car
+from selfdrive.test.process_replay.compare_logs import compare_logs
+from selfdrive.test.process_replay.process_replay import get_process_config, replay_process
+
+_DT = int(0.05 * 1e9)  # ns. plannerd inputs are at the model rate.
+
+
+def _plannerd_log(frames=20):
+  """Synthetic log of the plannerd inputs, with a lead showing up half way."""
+  msgs = []
+
+  cp = messaging.new_message('carParams')
+  cp.carParams.carFingerprint = 'MOCK'
+  cp.carParams.steerRatio, cp.carParams.wheelbase = 15., 2.7
+  msgs.append(cp)
+
+  for frame in range(frames):
+    cs = messaging.new_message('carState')
+    cs.carState.vEgo = 20.
+    controls = messaging.new_message('controlsState')
+    controls.controlsState.longControlState = car.CarControl.Actuators.LongControlState.pid
+    controls.controlsState.vCruise = 90.
+    radar = messaging.new_message('radarState')
+    if frame >= frames // 2:
+      lead = radar.radarState.leadOne
+      lead.status = True
+      lead.dRel, lead.vLead, lead.aLeadK, lead.aLeadTau = 30., 15., 0., 1.5
+    msgs += [cs, controls, messaging.new_message('modelV2'), radar]
+
+  for i, msg in enumerate(msgs):
+    msg.logMonoTime = int(1e9) + i * _DT // 4
+  return [messaging.log_from_bytes(msg.to_bytes()) for msg in msgs]
+
+
+class TestProcessReplay(unittest.TestCase):
+  def test_plannerd(self):
+    cfg = get_process_config('plannerd')
+    lr = _plannerd_log()
+    timings = []
+    outputs = replay_process(cfg, lr, timings)
+
+    # One loop iteration and plan per modelV2 and radarState, in lockstep with the log.
+    frames = sum(msg.which() == 'modelV2' for msg in lr)
+    self.assertEqual(len(timings), 2 * frames)
+    self.assertEqual([msg.which() for msg in outputs], ['lateralPlan', 'longitudinalPlan'] * frames)
+    # The daemon clock is the one of the messages replayed
+    self.assertEqual([msg.logMonoTime for msg in outputs],
+                     [msg.logMonoTime for msg in lr if msg.which() in ['modelV2', 'radarState']])
+    plans = [msg.longitudinalPlan for msg in outputs if msg.which() == 'longitudinalPlan']
+    self.assertFalse(plans[0].hasLead)
+    self.assertTrue(plans[-1].hasLead)
+
+    # Replays are deterministic
+    self.assertEqual(compare_logs(outputs, replay_process(cfg, lr), cfg.ignore), [])
+
+
+if __name__ == "__main__":
+  unittest.main()
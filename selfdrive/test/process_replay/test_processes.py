@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Replays logs through controlsd, radard, plannerd and mapd, reporting loop iteration timing percentiles and the
+diff of the outputs against a reference.
+
+  ./test_processes.py rlog.ilog                                # diff against the outputs recorded on the log
+  ./test_processes.py rlog.ilog --update-refs refs/            # save the replay outputs as reference
+  ./test_processes.py rlog.ilog --refs refs/ -p controlsd      # diff against the saved reference
+
+The recorded outputs were computed live on the car, so only replays against a saved reference are expected to match.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+from selfdrive.test.process_replay.compare_logs import compare_logs, format_diff, save_log
+from selfdrive.test.process_replay.process_replay import CONFIGS, ReplayError, replay_process
+from tools.lib.logreader import LogReader
+
+
+def ref_path(refs_dir, log_path, proc_name):
+  return os.path.join(refs_dir, f"{os.path.basename(log_path)}_{proc_name}.bz2")
+
+
+def format_timings(timings):
+  if len(timings) == 0:
+    return "no iterations"
+  ms = np.array(timings) * 1e3
+  return (f"{len(ms)} iterations, ms: mean {np.mean(ms):.2f} p50 {np.percentile(ms, 50):.2f} "
+          f"p90 {np.percentile(ms, 90):.2f} p99 {np.percentile(ms, 99):.2f} max {np.max(ms):.2f}")
+
+
+def run_process(cfg, lr, log_path, refs_dir=None, update_refs=False):
+  """Replays `lr` through the process of `cfg`. Returns (timings, diff)."""
+  timings = []
+  outputs = replay_process(cfg, lr, timings)
+
+  if refs_dir is not None and update_refs:
+    os.makedirs(refs_dir, exist_ok=True)
+    save_log(ref_path(refs_dir, log_path, cfg.proc_name), outputs)
+    return timings, []
+
+  if refs_dir is not None:
+    ref = list(LogReader(ref_path(refs_dir, log_path, cfg.proc_name)))
+  else:
+    produces = {s for outs in cfg.pub_sub.values() for s in outs}
+    ref = [msg for msg in lr if msg.which() in produces]
+  return timings, compare_logs(ref, outputs, cfg.ignore, tolerance=cfg.tolerance)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Replay logs through the python daemons and diff their outputs.")
+  parser.add_argument("logs", nargs="+", help="logs to replay, indexed or rlog")
+  parser.add_argument("-p", "--procs", nargs="+", default=[c.proc_name for c in CONFIGS], help="processes to replay")
+  parser.add_argument("--refs", help="directory of the reference outputs. The outputs recorded on the log otherwise")
+  parser.add_argument("--update-refs", action="store_true", help="save the replay outputs as reference in --refs")
+  args = parser.parse_args()
+
+  if args.update_refs and args.refs is None:
+    parser.error("--update-refs requires --refs")
+
+  failed = False
+  for log_path in args.logs:
+    lr = list(LogReader(log_path))
+    for cfg in CONFIGS:
+      if cfg.proc_name not in args.procs:
+        continue
+
+      print(f"***** {os.path.basename(log_path)} {cfg.proc_name}")
+      try:
+        timings, diff = run_process(cfg, lr, log_path, args.refs, args.update_refs)
+      except ReplayError as e:
+        print(f"  replay failed: {e!r} {e.__cause__!r}")
+        failed = True
+        continue
+
+      print(f"  {format_timings(timings)}")
+      if len(diff) > 0:
+        print(f"  {len(diff)} differences\n{format_diff(diff)}")
+        failed |= args.refs is not None
+      else:
+        print("  outputs match")
+
+  sys.exit(int(failed))
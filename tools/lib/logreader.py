@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Readers of logs: indexed log segments (selfdrive/loggerd/indexed_log.py) and loggerd rlog/qlog files, plain or
+bz2 compressed.
+
+  for msg in LogReader('rlog.ilog', services=['carState']):
+    print(msg.logMonoTime, msg.carState.vEgo)
+"""
+import os
+import bz2
+import sys
+from typing import Iterator, List, Optional
+
+import cereal.messaging as messaging
+from cereal import log as capnp_log
+from selfdrive.loggerd.indexed_log import is_indexed_log, iter_records
+
+
+class LogReader():
+  """Iterates the events of a log file.
+
+  With `services`, only the events of these services are decoded, and on indexed logs the blocks without them are not
+  even decompressed. `start_time` and `end_time` filter by logMonoTime in ns. With `lazy`, events are decoded on first
+  field access, see cereal.messaging.LazyEvent.
+  """
+  def __init__(self, fn: str, sort_by_time: bool = False, services: Optional[List[str]] = None,
+               start_time: Optional[int] = None, end_time: Optional[int] = None, lazy: bool = False):
+    self.fn = fn
+    self.sort_by_time = sort_by_time
+    self.services = services
+    self.start_time = start_time
+    self.end_time = end_time
+    self.lazy = lazy
+
+  def _decode(self, dat):
+    return messaging.LazyEvent(dat) if self.lazy else messaging.log_from_bytes(dat)
+
+  def _events(self) -> Iterator:
+    with open(self.fn, 'rb') as f:
+      if is_indexed_log(f):
+        for _, _, dat in iter_records(f, self.services, self.start_time, self.end_time):
+          yield self._decode(dat)
+        return
+
+      f.seek(0)
+      dat = f.read()
+
+    if self.fn.endswith('.bz2'):
+      dat = bz2.decompress(dat)
+
+    # Concatenated capnp messages, every event is decoded.
+    for msg in capnp_log.Event.read_multiple_bytes(dat, traversal_limit_in_words=messaging.NO_TRAVERSAL_LIMIT):
+      if self.services is not None and msg.which() not in self.services:
+        continue
+      if (self.start_time is not None and msg.logMonoTime < self.start_time) or \
+         (self.end_time is not None and msg.logMonoTime > self.end_time):
+        continue
+      yield msg
+
+  def __iter__(self) -> Iterator:
+    if self.sort_by_time:
+      return iter(sorted(self._events(), key=lambda m: m.logMonoTime))
+    return self._events()
+
+
+class MultiLogIterator():
+  """Iterates the events of consecutive log files, e.g. the segments of a route. Missing segments (None) are
+  skipped. With `wraparound`, iteration starts over from the first log at the end."""
+  def __init__(self, log_paths: List[Optional[str]], wraparound: bool = True, **kwargs):
+    self.log_paths = [p for p in log_paths if p is not None]
+    self.wraparound = wraparound
+    self.kwargs = kwargs
+    self._idx = 0
+    self._it = None
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    while True:
+      if self._it is None:
+        if self._idx >= len(self.log_paths):
+          if not self.wraparound or len(self.log_paths) == 0:
+            raise StopIteration
+          self._idx = 0
+        self._it = iter(LogReader(self.log_paths[self._idx], **self.kwargs))
+        self._idx += 1
+
+      try:
+        return next(self._it)
+      except StopIteration:
+        self._it = None
+
+
+if __name__ == "__main__":
+  services = sys.argv[2:] if len(sys.argv) > 2 else None
+  for msg in LogReader(os.path.expanduser(sys.argv[1]), services=services):
+    print(msg)
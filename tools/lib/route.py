@@ -0,0 +1,42 @@
+import os
+import re
+from typing import List, Optional
+
+from selfdrive.loggerd.config import ROOT
+
+SEGMENT_RE = re.compile(r'^(?P<route>.+)--(?P<segment>\d+)$')
+RLOG_NAMES = ['rlog.ilog', 'rlog.bz2', 'rlog']
+QLOG_NAMES = ['qlog.ilog', 'qlog.bz2', 'qlog']
+
+
+class Route():
+  """A route recorded on this machine, as segment directories <route>--<segment> in `data_dir`."""
+  def __init__(self, route_name: str, data_dir: str = ROOT):
+    self.route_name = route_name.replace('|', '_')
+    self.data_dir = data_dir
+
+    self.segments = {}
+    for d in os.listdir(data_dir) if os.path.isdir(data_dir) else []:
+      m = SEGMENT_RE.match(d)
+      if m is not None and m.group('route') in (self.route_name, route_name):
+        self.segments[int(m.group('segment'))] = os.path.join(data_dir, d)
+
+    if len(self.segments) == 0:
+      raise ValueError(f'No segments of route {route_name} in {data_dir}')
+
+  def _paths(self, names: List[str]) -> List[Optional[str]]:
+    paths = []
+    for segment in range(max(self.segments) + 1):
+      path = None
+      for name in names if segment in self.segments else []:
+        if os.path.isfile(os.path.join(self.segments[segment], name)):
+          path = os.path.join(self.segments[segment], name)
+          break
+      paths.append(path)
+    return paths
+
+  def log_paths(self) -> List[Optional[str]]:
+    return self._paths(RLOG_NAMES)
+
+  def qlog_paths(self) -> List[Optional[str]]:
+    return self._paths(QLOG_NAMES)